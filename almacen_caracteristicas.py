@@ -0,0 +1,234 @@
+# almacen_caracteristicas.py
+# Almacén de características por símbolo y vela: columnar, mapeable en memoria y extendido de forma incremental
+import os
+import json
+import logging
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Columnas almacenadas y su tipo en disco (un archivo binario por columna)
+COLUMNAS = {
+    'time': '<i8',
+    'retorno_log': '<f8',
+    'dist_ema_9_atr': '<f8',
+    'dist_ema_20_atr': '<f8',
+    'dist_ema_200_atr': '<f8',
+    'cuerpo_atr': '<f8',
+    'atr': '<f8',
+    'es_vela_elefante': '|u1',
+}
+
+PERIODOS_EMA = (9, 20, 200)
+
+def _ewm_continuada(valores, span, previo):
+    """EMA (adjust=False, como calcular_ema) que continúa desde el último valor previo si existe."""
+    serie = pd.Series(valores, dtype=float)
+    if previo is None:
+        return serie.ewm(span=span, adjust=False).mean().to_numpy()
+    serie = pd.concat([pd.Series([previo]), serie], ignore_index=True)
+    return serie.ewm(span=span, adjust=False).mean().to_numpy()[1:]
+
+@contextmanager
+def _bloqueo_archivo(ruta):
+    """Bloqueo exclusivo entre procesos sobre el archivo 'ruta' (se crea si no existe)."""
+    with open(ruta, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK se rinde tras 10 s: seguir esperando
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class AlmacenCaracteristicas:
+    def __init__(self, directorio, atr_period=14, multi_vela_elefante=2.0, tamano_bloque=50000):
+        """
+        directorio: carpeta raíz; cada símbolo se guarda en su propia subcarpeta
+        atr_period, multi_vela_elefante: mismos parámetros que calcular_indicadores
+        tamano_bloque: velas procesadas por bloque al extender (limita la memoria usada)
+        """
+        self.directorio = directorio
+        self.atr_period = atr_period
+        self.multi_vela_elefante = multi_vela_elefante
+        self.tamano_bloque = tamano_bloque
+        self._metas = {}
+
+    # --- METADATOS Y ESTADO ---
+    def _ruta(self, simbolo, nombre):
+        return os.path.join(self.directorio, simbolo, nombre)
+
+    def _meta(self, simbolo):
+        meta = self._metas.get(simbolo)
+        if meta is not None:
+            return meta
+        ruta = self._ruta(simbolo, 'meta.json')
+        if os.path.isfile(ruta):
+            with open(ruta, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            meta = {'n': 0, 'ultimo_time': None, 'estado': None,
+                    'atr_period': self.atr_period, 'multi_vela_elefante': self.multi_vela_elefante}
+        if (meta['atr_period'], meta['multi_vela_elefante']) != (self.atr_period, self.multi_vela_elefante):
+            raise ValueError(f"El almacén de {simbolo} se creó con otros parámetros de indicadores.")
+        self._metas[simbolo] = meta
+        return meta
+
+    def _guardar_meta(self, simbolo, meta):
+        ruta = self._ruta(simbolo, 'meta.json')
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temporal, ruta)  # Los datos solo son visibles cuando el meta se actualiza
+
+    def __len__(self):
+        return sum(self._meta(s)['n'] for s in self.simbolos())
+
+    def simbolos(self):
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted(d for d in os.listdir(self.directorio) if os.path.isfile(self._ruta(d, 'meta.json')))
+
+    def longitud(self, simbolo):
+        return self._meta(simbolo)['n']
+
+    # --- CÁLCULO ---
+    def _calcular_bloque(self, bloque, estado):
+        """Calcula las características de un bloque de velas continuando el estado de las EMAs y el ATR."""
+        apertura = bloque['open'].astype(float)
+        alto = bloque['high'].astype(float)
+        bajo = bloque['low'].astype(float)
+        cierre = bloque['close'].astype(float)
+
+        cierre_previo = np.empty_like(cierre)
+        cierre_previo[1:] = cierre[:-1]
+        cierre_previo[0] = estado['cierre'] if estado else np.nan
+
+        # True range igual que calcular_atr: el máximo ignora el cierre previo inexistente
+        rango = np.fmax(alto - bajo, np.fmax(np.abs(alto - cierre_previo), np.abs(bajo - cierre_previo)))
+        atr = _ewm_continuada(rango, self.atr_period, estado['atr'] if estado else None)
+        emas = {p: _ewm_continuada(cierre, p, estado[f'ema_{p}'] if estado else None) for p in PERIODOS_EMA}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cuerpo = np.abs(cierre - apertura)
+            columnas = {
+                'time': bloque['time'].astype(np.int64),
+                'retorno_log': np.log(cierre / cierre_previo),
+                'dist_ema_9_atr': (cierre - emas[9]) / atr,
+                'dist_ema_20_atr': (cierre - emas[20]) / atr,
+                'dist_ema_200_atr': (cierre - emas[200]) / atr,
+                'cuerpo_atr': cuerpo / atr,
+                'atr': atr,
+                'es_vela_elefante': (cuerpo > atr * self.multi_vela_elefante).astype(np.uint8),
+            }
+
+        nuevo_estado = {'cierre': float(cierre[-1]), 'atr': float(atr[-1])}
+        nuevo_estado.update({f'ema_{p}': float(emas[p][-1]) for p in PERIODOS_EMA})
+        return columnas, nuevo_estado
+
+    def extender(self, simbolo, rates, incluir_ultima=False):
+        """
+        Añade las velas cerradas posteriores a la última almacenada.
+        rates: array estructurado de MT5 (time, open, high, low, close, ...) en orden cronológico
+        incluir_ultima: la última vela de copy_rates_* sigue abierta; por defecto no se almacena
+        Devuelve el número de velas añadidas.
+        Varios procesos pueden extender el mismo almacén: la escritura se hace bajo un bloqueo de archivo
+        y con el meta releído, nunca con el que esta instancia tenga en caché.
+        """
+        if rates is None or len(rates) == 0:
+            return 0
+        if not incluir_ultima:
+            rates = rates[:-1]
+        if len(rates) == 0:
+            return 0
+
+        os.makedirs(os.path.join(self.directorio, simbolo), exist_ok=True)
+        with _bloqueo_archivo(self._ruta(simbolo, 'meta.lock')):
+            self._metas.pop(simbolo, None)
+            return self._extender(simbolo, rates, self._meta(simbolo))
+
+    def _extender(self, simbolo, rates, meta):
+        """Cuerpo de extender(); se llama con el bloqueo del símbolo tomado y el meta recién leído."""
+        if meta['ultimo_time'] is not None:
+            nuevas = rates['time'] > meta['ultimo_time']
+            if len(rates) > 0 and nuevas.all():
+                # Sin solape con lo almacenado no se puede garantizar que no falten velas
+                logging.warning("Las velas de %s no se solapan con el almacén (última: %s, primera nueva: %s). Posible hueco.",
+                                simbolo, meta['ultimo_time'], rates['time'][0])
+            rates = rates[nuevas]
+        if len(rates) == 0:
+            return 0
+
+        # Descartar bytes escritos tras el último meta válido (p.ej. por un corte a mitad de escritura)
+        for columna, dtype in COLUMNAS.items():
+            ruta = self._ruta(simbolo, f'{columna}.bin')
+            if os.path.isfile(ruta):
+                with open(ruta, 'r+b') as f:
+                    f.truncate(meta['n'] * np.dtype(dtype).itemsize)
+
+        estado = meta['estado']
+        for inicio in range(0, len(rates), self.tamano_bloque):
+            bloque = rates[inicio:inicio + self.tamano_bloque]
+            columnas, estado = self._calcular_bloque(bloque, estado)
+            for columna, dtype in COLUMNAS.items():
+                with open(self._ruta(simbolo, f'{columna}.bin'), 'ab') as f:
+                    columnas[columna].astype(dtype).tofile(f)
+
+        meta['n'] += len(rates)
+        meta['ultimo_time'] = int(rates['time'][-1])
+        meta['estado'] = estado
+        self._guardar_meta(simbolo, meta)
+        return len(rates)
+
+    # --- LECTURA ---
+    def leer(self, simbolo, columnas=None, desde=None):
+        """
+        Devuelve {columna: array mapeado en memoria (solo lectura)}.
+        desde: timestamp opcional; se localiza por búsqueda binaria sobre 'time'
+        """
+        self._metas.pop(simbolo, None)  # Releer el meta por si otro proceso ha extendido el almacén
+        n = self._meta(simbolo)['n']
+        columnas = columnas or list(COLUMNAS)
+        if 'time' not in columnas and desde is not None:
+            columnas = ['time'] + list(columnas)
+        datos = {}
+        for columna in columnas:
+            dtype = np.dtype(COLUMNAS[columna])
+            if n == 0:
+                datos[columna] = np.empty(0, dtype=dtype)
+            else:
+                datos[columna] = np.memmap(self._ruta(simbolo, f'{columna}.bin'), dtype=dtype, mode='r', shape=(n,))
+        if desde is not None and n > 0:
+            inicio = int(np.searchsorted(datos['time'], desde, side='left'))
+            datos = {c: v[inicio:] for c, v in datos.items()}
+        return datos
+
+    def leer_dataframe(self, simbolo, columnas=None, desde=None):
+        """Copia a un DataFrame indexado por tiempo (para entrenamiento)."""
+        datos = self.leer(simbolo, columnas, desde)
+        tiempo = pd.to_datetime(np.asarray(datos.pop('time')), unit='s')
+        return pd.DataFrame({c: np.asarray(v) for c, v in datos.items()}, index=tiempo)
+
+    def ultima_fila(self, simbolo, columnas=None):
+        """Características de la última vela cerrada (para inferencia en vivo)."""
+        datos = self.leer(simbolo, columnas)
+        if self.longitud(simbolo) == 0:
+            return None
+        return {c: v[-1].item() for c, v in datos.items()}
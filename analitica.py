@@ -0,0 +1,234 @@
+# analitica.py
+# Exportación incremental del registro de operaciones a Parquet (particionado por mes) y métricas de rendimiento vectorizadas
+import os
+import io
+import json
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_DISPONIBLE = True
+except ImportError:
+    PYARROW_DISPONIBLE = False
+
+OPERACIONES_CSV = os.path.join(os.path.dirname(__file__), 'operaciones_trading.csv')
+ANALITICA_DIR = os.path.join(os.path.dirname(__file__), 'analitica')
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+COLUMNAS_TEXTO = ('simbolo', 'estrategia', 'tipo', 'comentario')
+COLUMNAS_NUMERICAS = ('precio_apertura', 'precio_cierre', 'resultado_dinero', 'resultado_pips',
+                      'stop_loss', 'take_profit', 'lote')
+MAX_PARTES_POR_MES = 20  # Al superarlo, las partes del mes se compactan en un solo archivo
+
+# --- LECTURA DEL CSV ---
+def _normalizar(df):
+    """Tipos fijos para que todas las partes compartan el mismo esquema."""
+    df['ticket_mt5'] = pd.to_numeric(df['ticket_mt5'], errors='coerce').fillna(0).astype(np.int64)
+    for columna in ('fecha_apertura', 'fecha_cierre'):
+        df[columna] = pd.to_datetime(df[columna], format=FORMATO_FECHA, errors='coerce')
+    for columna in COLUMNAS_NUMERICAS:
+        df[columna] = pd.to_numeric(df[columna], errors='coerce').astype(float)
+    for columna in COLUMNAS_TEXTO:
+        df[columna] = df[columna].fillna('').astype(str)
+    return df.dropna(subset=['fecha_cierre'])
+
+def leer_csv(ruta_csv=OPERACIONES_CSV):
+    """Lectura completa del CSV (camino lento, sin pyarrow)."""
+    return _normalizar(pd.read_csv(ruta_csv, dtype=str, on_bad_lines='skip', encoding_errors='replace'))
+
+# --- EXPORTACIÓN INCREMENTAL ---
+def _esquema():
+    campos = [('ticket_mt5', pa.int64()), ('fecha_apertura', pa.timestamp('ns')), ('fecha_cierre', pa.timestamp('ns'))]
+    campos += [(c, pa.float64()) for c in COLUMNAS_NUMERICAS]
+    campos += [(c, pa.string()) for c in COLUMNAS_TEXTO]
+    return pa.schema(campos)
+
+def _ruta_estado(directorio):
+    return os.path.join(directorio, 'estado.json')
+
+def _leer_estado(directorio):
+    ruta = _ruta_estado(directorio)
+    if os.path.isfile(ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'offset': 0, 'cabecera': None}
+
+def _guardar_estado(directorio, estado):
+    ruta = _ruta_estado(directorio)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(estado, f)
+    os.replace(temporal, ruta)
+
+def _partes(directorio, mes='*'):
+    return sorted(glob.glob(os.path.join(directorio, f'mes={mes}', 'parte-*.parquet')))
+
+def _compactar_mes(directorio, mes):
+    """Reescribe las partes de un mes en un solo archivo (con el nombre de la primera parte)."""
+    partes = _partes(directorio, mes)
+    if len(partes) <= MAX_PARTES_POR_MES:
+        return
+    tabla = pa.concat_tables([pq.read_table(p) for p in partes])
+    temporal = partes[0] + '.tmp'
+    pq.write_table(tabla, temporal)
+    os.replace(temporal, partes[0])
+    for parte in partes[1:]:
+        os.remove(parte)
+
+def exportar_incremental(ruta_csv=OPERACIONES_CSV, directorio=ANALITICA_DIR):
+    """
+    Convierte a Parquet solo las filas añadidas al CSV desde la última exportación.
+    La posición (en bytes) ya exportada se guarda en estado.json; cada parte se nombra con
+    el byte en que empieza, así repetir una exportación interrumpida sobrescribe la misma parte.
+    Si el CSV se ha truncado o ha cambiado de cabecera se reconstruye todo.
+    Devuelve el número de operaciones exportadas.
+    """
+    if not PYARROW_DISPONIBLE:
+        raise ImportError("La exportación a Parquet necesita pyarrow (pip install pyarrow).")
+    if not os.path.isfile(ruta_csv):
+        return 0
+
+    os.makedirs(directorio, exist_ok=True)
+    estado = _leer_estado(directorio)
+    with open(ruta_csv, 'rb') as f:
+        cabecera = f.readline()
+        tamano = os.fstat(f.fileno()).st_size
+        if estado['cabecera'] != cabecera.decode('utf-8', 'replace') or tamano < estado['offset']:
+            for parte in _partes(directorio):
+                os.remove(parte)
+            estado = {'offset': len(cabecera), 'cabecera': cabecera.decode('utf-8', 'replace')}
+        inicio = estado['offset']
+        f.seek(inicio)
+        nuevos = f.read(tamano - inicio)
+
+    # Solo líneas completas: una fila a medio escribir se exporta en la siguiente llamada
+    fin = nuevos.rfind(b'\n') + 1
+    if fin == 0:
+        return 0
+    df = _normalizar(pd.read_csv(io.BytesIO(cabecera + nuevos[:fin]), dtype=str,
+                                 on_bad_lines='skip', encoding_errors='replace'))
+
+    esquema = _esquema()
+    meses = df['fecha_cierre'].dt.strftime('%Y-%m')
+    for mes, grupo in df.groupby(meses):
+        carpeta = os.path.join(directorio, f'mes={mes}')
+        os.makedirs(carpeta, exist_ok=True)
+        tabla = pa.Table.from_pandas(grupo[esquema.names], schema=esquema, preserve_index=False)
+        pq.write_table(tabla, os.path.join(carpeta, f'parte-{inicio:012d}.parquet'))
+
+    estado['offset'] = inicio + fin
+    _guardar_estado(directorio, estado)
+    for mes in meses.unique():
+        _compactar_mes(directorio, mes)
+    return len(df)
+
+def cargar_operaciones(directorio=ANALITICA_DIR, ruta_csv=OPERACIONES_CSV, columnas=None, desde_mes=None):
+    """
+    Operaciones exportadas como DataFrame. desde_mes ('AAAA-MM') evita leer las particiones anteriores.
+    Sin pyarrow o sin exportación previa se lee el CSV completo.
+    """
+    if not PYARROW_DISPONIBLE or not _partes(directorio):
+        df = leer_csv(ruta_csv)
+        if desde_mes is not None:
+            df = df[df['fecha_cierre'] >= pd.Timestamp(desde_mes + '-01')]
+        return df if columnas is None else df[list(columnas)]
+    partes = [p for p in _partes(directorio)
+              if desde_mes is None or os.path.basename(os.path.dirname(p))[4:] >= desde_mes]
+    if not partes:
+        return pd.DataFrame(columns=columnas or _esquema().names)
+    tabla = pa.concat_tables([pq.read_table(p, columns=columnas) for p in partes])
+    return tabla.to_pandas()
+
+# --- MÉTRICAS ---
+def _columnas_base(df):
+    resultado = df['resultado_dinero'].to_numpy(dtype=float)
+    return pd.DataFrame({
+        'operaciones': 1,
+        'ganadas': (resultado > 0).astype(int),
+        'pnl': resultado,
+        'ganancia_bruta': np.where(resultado > 0, resultado, 0.0),
+        'perdida_bruta': np.where(resultado < 0, -resultado, 0.0),
+        'pips': df['resultado_pips'].to_numpy(dtype=float),
+    }, index=df.index)
+
+def _derivar(sumas):
+    """Win rate, esperanza y profit factor a partir de las sumas por grupo o por ventana."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sumas['win_rate'] = sumas['ganadas'] / sumas['operaciones']
+        sumas['esperanza'] = sumas['pnl'] / sumas['operaciones']
+        sumas['profit_factor'] = sumas['ganancia_bruta'] / sumas['perdida_bruta']
+        sumas['pips_medios'] = sumas['pips'] / sumas['operaciones']
+    return sumas
+
+def rendimiento_por(df, claves):
+    """
+    Tabla de rendimiento agrupada por una o varias claves ('estrategia', 'simbolo', 'hora', 'dia_semana', 'mes').
+    Todas las agregaciones son sumas vectorizadas; las métricas se derivan después.
+    """
+    claves = [claves] if isinstance(claves, str) else list(claves)
+    base = _columnas_base(df)
+    agrupadores = []
+    for clave in claves:
+        if clave == 'hora':
+            agrupadores.append(df['fecha_apertura'].dt.hour.rename('hora'))
+        elif clave == 'dia_semana':
+            agrupadores.append(df['fecha_apertura'].dt.dayofweek.rename('dia_semana'))
+        elif clave == 'mes':
+            agrupadores.append(df['fecha_cierre'].dt.strftime('%Y-%m').rename('mes'))
+        else:
+            agrupadores.append(df[clave])
+    sumas = base.groupby(agrupadores, sort=True).sum()
+    return _derivar(sumas).sort_values('pnl', ascending=False)
+
+def metricas_moviles(df, ventana=50, por='estrategia'):
+    """
+    Métricas sobre las últimas 'ventana' operaciones de cada grupo, en orden de cierre,
+    más el P&L acumulado y el drawdown de cada grupo.
+    """
+    df = df.sort_values('fecha_cierre', kind='stable')
+    base = _columnas_base(df)
+    grupos = df[por]
+    sumas = base.groupby(grupos).rolling(ventana, min_periods=1).sum().reset_index(level=0, drop=True)
+    moviles = _derivar(sumas.loc[df.index])[['win_rate', 'esperanza', 'profit_factor']]
+    acumulado = base['pnl'].groupby(grupos).cumsum()
+    moviles.insert(0, 'fecha_cierre', df['fecha_cierre'])
+    moviles.insert(1, por, grupos)
+    moviles['pnl_acumulado'] = acumulado
+    moviles['drawdown'] = acumulado.groupby(grupos).cummax() - acumulado
+    return moviles
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el registro de operaciones a Parquet y muestra su rendimiento.")
+    parser.add_argument('--csv', default=OPERACIONES_CSV)
+    parser.add_argument('--dir', default=ANALITICA_DIR, help="Carpeta de las particiones Parquet")
+    parser.add_argument('--por', nargs='+', default=['estrategia', 'simbolo', 'hora'],
+                        help="Tablas a mostrar (cada valor una tabla; 'estrategia,simbolo' agrupa por ambas)")
+    parser.add_argument('--ventana', type=int, default=50, help="Operaciones de la ventana móvil")
+    parser.add_argument('--desde', help="Primer mes a analizar (AAAA-MM)")
+    parser.add_argument('--sin-exportar', action='store_true', help="No actualizar el Parquet antes de analizar")
+    args = parser.parse_args(argv)
+
+    if not args.sin_exportar:
+        if PYARROW_DISPONIBLE:
+            print(f"📦 {exportar_incremental(args.csv, args.dir)} operaciones nuevas exportadas a '{args.dir}'.")
+        else:
+            print("⚠️ pyarrow no está instalado: se analiza el CSV directamente.")
+
+    operaciones = cargar_operaciones(args.dir, args.csv, desde_mes=args.desde)
+    if operaciones.empty:
+        print("No hay operaciones registradas.")
+    else:
+        with pd.option_context('display.max_rows', 200, 'display.max_columns', 20, 'display.width', 200):
+            for claves in args.por:
+                print(f"\n--- Rendimiento por {claves} ---")
+                print(rendimiento_por(operaciones, claves.split(',')).round(3))
+            moviles = metricas_moviles(operaciones, args.ventana)
+            print(f"\n--- Últimas {args.ventana} operaciones por estrategia ---")
+            print(moviles.groupby('estrategia').tail(1).set_index(['estrategia', 'fecha_cierre']).round(3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# api_estado.py
+# API HTTP local de solo lectura con el estado del agente (riesgo, posiciones, tiempos de ciclo)
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class PublicadorEstado:
+    """
+    El bucle publica una instantánea nueva por ciclo sustituyendo la referencia (asignación atómica),
+    de modo que el bucle nunca espera a los lectores ni toma locks. Las secciones publicadas
+    no deben modificarse después de publicarlas.
+    """
+    def __init__(self):
+        self._instantanea = {'estado': 'iniciando', 'publicado': time.time()}
+
+    def publicar(self, detenido=None, **secciones):
+        """detenido: motivo por el que el agente no busca señales en este ciclo (None = activo)."""
+        instantanea = {'estado': 'detenido' if detenido else 'activo', 'motivo_detencion': detenido,
+                       'publicado': time.time()}
+        instantanea.update(secciones)
+        self._instantanea = instantanea
+
+    def instantanea(self):
+        return self._instantanea
+
+class _ManejadorEstado(BaseHTTPRequestHandler):
+    publicador = None
+    _cache = (None, {})  # (instantánea, {ruta: bytes}) para no serializar dos veces la misma
+
+    def _cuerpo(self, ruta):
+        instantanea = self.publicador.instantanea()
+        cache_instantanea, serializados = _ManejadorEstado._cache
+        if cache_instantanea is not instantanea:
+            serializados = {}
+            _ManejadorEstado._cache = (instantanea, serializados)
+        if ruta not in serializados:
+            if ruta == 'estado':
+                datos = instantanea
+            elif ruta in instantanea:
+                datos = {'publicado': instantanea['publicado'], ruta: instantanea[ruta]}
+            else:
+                return None
+            serializados[ruta] = json.dumps(datos, ensure_ascii=False, default=str).encode('utf-8')
+        return serializados[ruta]
+
+    def do_GET(self):
+        ruta = self.path.split('?', 1)[0].strip('/') or 'estado'
+        cuerpo = self._cuerpo(ruta)
+        if cuerpo is None:
+            cuerpo = json.dumps({'error': f"Ruta desconocida: /{ruta}"}).encode('utf-8')
+            self.send_response(404)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        # Las consultas del panel no deben llenar el log del agente
+        pass
+
+def iniciar_servidor_estado(publicador, puerto, host='127.0.0.1'):
+    """
+    Arranca el servidor en un hilo en segundo plano, enlazado solo a localhost.
+    Rutas: /estado (todo), /riesgo, /posiciones, /ciclo, /planificador. Devuelve el servidor (llamar a shutdown() al salir).
+    """
+    manejador = type('ManejadorEstado', (_ManejadorEstado,), {'publicador': publicador})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    hilo = threading.Thread(target=servidor.serve_forever, name='api_estado', daemon=True)
+    hilo.start()
+    logging.info("API de estado escuchando en http://%s:%s", host, servidor.server_address[1])
+    return servidor
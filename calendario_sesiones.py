@@ -0,0 +1,111 @@
+# calendario_sesiones.py
+# Calendario de sesiones por símbolo para no analizar ni gestionar mercados cerrados.
+# Las sesiones se definen en la hora local de una zona (por defecto Nueva York, la referencia de forex),
+# así que los cambios de horario de verano desplazan la apertura en UTC automáticamente
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytz
+
+MINUTOS_DIA = 24 * 60
+MINUTOS_SEMANA = 7 * MINUTOS_DIA
+HORIZONTE_DIAS = 15  # Máximo que se busca hacia delante la próxima apertura
+
+def sesiones_forex(apertura="17:00", cierre="17:00"):
+    """
+    Semana de forex: del domingo a la hora de apertura al viernes a la hora de cierre (hora de Nueva York).
+    Devuelve la lista de sesiones (dia, "HH:MM", "HH:MM") con dia 0 = lunes.
+    """
+    sesiones = [(6, apertura, "24:00")]
+    sesiones += [(dia, "00:00", "24:00") for dia in range(4)]
+    sesiones.append((4, "00:00", cierre))
+    return sesiones
+
+def _minutos(hora):
+    horas, minutos = hora.split(":")
+    return int(horas) * 60 + int(minutos)
+
+def _mascara_semanal(sesiones, pausas_diarias=()):
+    """Un booleano por minuto de la semana (empezando el lunes 00:00 local): True si el mercado está abierto."""
+    mascara = np.zeros(MINUTOS_SEMANA, dtype=bool)
+    for dia, inicio, fin in sesiones:
+        mascara[dia * MINUTOS_DIA + _minutos(inicio):dia * MINUTOS_DIA + _minutos(fin)] = True
+    for inicio, fin in pausas_diarias:
+        for dia in range(7):
+            desde, hasta = dia * MINUTOS_DIA + _minutos(inicio), dia * MINUTOS_DIA + _minutos(fin)
+            if hasta < desde:  # La pausa cruza la medianoche
+                hasta += MINUTOS_DIA
+            indices = np.arange(desde, hasta) % MINUTOS_SEMANA
+            mascara[indices] = False
+    return mascara
+
+class CalendarioSesiones:
+    def __init__(self, sesiones_simbolos=None, sesion_por_defecto=None, pausas_diarias=(), festivos=(), zona="America/New_York"):
+        """
+        sesiones_simbolos: {simbolo: [(dia, "HH:MM", "HH:MM"), ...]} en hora local de 'zona', dia 0 = lunes
+        sesion_por_defecto: sesiones de los símbolos no configurados (por defecto, la semana de forex)
+        pausas_diarias: [("HH:MM", "HH:MM"), ...] cierres diarios de todos los símbolos (rollover), hora local
+        festivos: fechas locales "AAAA-MM-DD" sin mercado en todo el día
+        zona: zona horaria (pytz) de las sesiones, pausas y festivos
+        """
+        self.zona = pytz.timezone(zona)
+        self.pausas_diarias = tuple(pausas_diarias)
+        self._por_defecto = _mascara_semanal(sesion_por_defecto or sesiones_forex(), self.pausas_diarias)
+        self._mascaras = {simbolo: _mascara_semanal(sesiones, self.pausas_diarias)
+                          for simbolo, sesiones in (sesiones_simbolos or {}).items()}
+        self.festivos = {datetime.strptime(f, "%Y-%m-%d").date() for f in festivos}
+
+    def _mascara(self, simbolo):
+        return self._mascaras.get(simbolo, self._por_defecto)
+
+    @staticmethod
+    def _ahora(ahora):
+        if ahora is None:
+            return datetime.now(timezone.utc)
+        if ahora.tzinfo is None:
+            return ahora.replace(tzinfo=timezone.utc)
+        return ahora.astimezone(timezone.utc)
+
+    def abierto(self, simbolo, ahora=None):
+        local = self._ahora(ahora).astimezone(self.zona)
+        if local.date() in self.festivos:
+            return False
+        return bool(self._mascara(simbolo)[local.weekday() * MINUTOS_DIA + local.hour * 60 + local.minute])
+
+    def abiertos(self, simbolos, ahora=None):
+        ahora = self._ahora(ahora)
+        return {simbolo for simbolo in simbolos if self.abierto(simbolo, ahora)}
+
+    def proxima_apertura(self, simbolo, ahora=None):
+        """Instante (UTC) de la próxima apertura; el propio 'ahora' si ya está abierto, None si no hay ninguna en el horizonte."""
+        ahora = self._ahora(ahora)
+        if self.abierto(simbolo, ahora):
+            return ahora
+        base = ahora.replace(second=0, microsecond=0)
+        horizonte = HORIZONTE_DIAS * MINUTOS_DIA
+        # Hora local de cada hora UTC del horizonte: los cambios de horario ocurren en horas UTC exactas
+        origen = base.replace(minute=0)
+        locales = [(origen + timedelta(hours=h)).astimezone(self.zona) for h in range(horizonte // 60 + 2)]
+        desfases = np.repeat([int(l.utcoffset().total_seconds()) // 60 for l in locales], 60)
+        minutos_utc = origen.weekday() * MINUTOS_DIA + origen.hour * 60 + np.arange(len(desfases))
+        mascara = self._mascara(simbolo)[(minutos_utc + desfases) % MINUTOS_SEMANA]
+        if self.festivos:
+            # Anular los festivos (días locales) dentro del horizonte
+            mascara &= ~np.repeat([l.date() in self.festivos for l in locales], 60)
+        mascara = mascara[base.minute:base.minute + horizonte]
+        aperturas = np.flatnonzero(mascara[1:] & ~mascara[:-1])
+        if len(aperturas) == 0:
+            return None
+        return base + timedelta(minutes=int(aperturas[0]) + 1)
+
+    def segundos_hasta_apertura(self, simbolos, ahora=None):
+        """Segundos hasta que abra el primero de los símbolos (0 si alguno está abierto, None si ninguno abre)."""
+        ahora = self._ahora(ahora)
+        aperturas = [a for a in (self.proxima_apertura(s, ahora) for s in simbolos) if a is not None]
+        if not aperturas:
+            return None
+        return max((min(aperturas) - ahora).total_seconds(), 0.0)
+
+# Ejemplo de uso:
+# calendario = CalendarioSesiones(pausas_diarias=[("16:55", "17:05")], festivos=["2026-12-25"])
+# calendario.abierto("EURUSD")                     # False el sábado
+# calendario.proxima_apertura("EURUSD")            # domingo 17:05 en Nueva York (22:05 UTC en invierno, 21:05 en verano)
@@ -0,0 +1,171 @@
+# calidad_ejecucion.py
+# Registro compacto de la calidad de ejecución (latencia, deslizamiento, recotizaciones) y desviación adaptativa
+import os
+import json
+import argparse
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import MetaTrader5 as mt5
+
+CALIDAD_EJECUCION_PATH = os.path.join(os.path.dirname(__file__), 'calidad_ejecucion.bin')
+
+# Acciones registradas
+APERTURA = 0
+MODIFICACION = 1
+CIERRE = 2
+NOMBRES_ACCIONES = {APERTURA: 'apertura', MODIFICACION: 'modificacion', CIERRE: 'cierre'}
+
+# Un registro por order_send (32 bytes)
+DTYPE_EJECUCION = np.dtype([
+    ('tiempo', '<f8'),          # Timestamp del envío
+    ('latencia_ms', '<f4'),     # Ida y vuelta de order_send
+    ('deslizamiento', '<f4'),   # Puntos en contra (+) o a favor (-) respecto al precio solicitado; NaN si no aplica
+    ('retcode', '<i4'),
+    ('desviacion', '<u2'),      # Desviación enviada (puntos)
+    ('simbolo', '<i2'),         # Índice del símbolo (ver archivo .simbolos)
+    ('hora', 'u1'),
+    ('accion', 'u1'),
+    ('recotizacion', 'u1'),
+    ('reservado', 'u1', (5,)),
+])
+
+RETCODES_RECOTIZACION = (mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED, mt5.TRADE_RETCODE_PRICE_OFF)
+
+class RegistroEjecucion:
+    def __init__(self, ruta=None, ventana=50, factor_atr=0.1, desviacion_min=5, desviacion_max=100, percentil=90):
+        """
+        ruta: archivo binario donde se añaden los registros (None = solo en memoria)
+        ventana: número de ejecuciones recientes por símbolo usadas para la desviación adaptativa
+        factor_atr: multiplicador del ATR para la desviación base (config.DEVIATION_ATR_FACTOR)
+        desviacion_min, desviacion_max: límites de la desviación en puntos
+        percentil: percentil del deslizamiento reciente que la desviación debe cubrir
+        """
+        self.ruta = ruta
+        self.ventana = ventana
+        self.factor_atr = factor_atr
+        self.desviacion_min = desviacion_min
+        self.desviacion_max = desviacion_max
+        self.percentil = percentil
+
+        self._simbolos = []
+        self._indices_simbolos = {}
+        self._recientes = {}  # simbolo -> deque de deslizamientos (puntos)
+        if ruta:
+            self._cargar()
+
+    # --- PERSISTENCIA ---
+    def _ruta_simbolos(self):
+        return self.ruta + '.simbolos'
+
+    def _cargar(self):
+        if os.path.isfile(self._ruta_simbolos()):
+            with open(self._ruta_simbolos(), 'r', encoding='utf-8') as f:
+                self._simbolos = json.load(f)
+            self._indices_simbolos = {s: i for i, s in enumerate(self._simbolos)}
+        # Recuperar la ventana reciente de cada símbolo
+        registros = self.leer()
+        if len(registros) == 0:
+            return
+        validos = registros[~np.isnan(registros['deslizamiento'])]
+        for indice, simbolo in enumerate(self._simbolos):
+            ultimos = validos['deslizamiento'][validos['simbolo'] == indice][-self.ventana:]
+            self._recientes[simbolo] = deque(ultimos.tolist(), maxlen=self.ventana)
+
+    def leer(self):
+        """Todos los registros persistidos (mapeados en memoria)."""
+        if not self.ruta or not os.path.isfile(self.ruta):
+            return np.empty(0, dtype=DTYPE_EJECUCION)
+        n = os.path.getsize(self.ruta) // DTYPE_EJECUCION.itemsize
+        if n == 0:
+            return np.empty(0, dtype=DTYPE_EJECUCION)
+        return np.memmap(self.ruta, dtype=DTYPE_EJECUCION, mode='r', shape=(n,))
+
+    def _indice_simbolo(self, simbolo):
+        indice = self._indices_simbolos.get(simbolo)
+        if indice is None:
+            indice = len(self._simbolos)
+            self._simbolos.append(simbolo)
+            self._indices_simbolos[simbolo] = indice
+            if self.ruta:
+                with open(self._ruta_simbolos(), 'w', encoding='utf-8') as f:
+                    json.dump(self._simbolos, f)
+        return indice
+
+    # --- REGISTRO ---
+    def registrar(self, simbolo, accion, resultado, latencia_ms, desviacion=0, precio_solicitado=None, es_compra=True, punto=None):
+        """
+        Registra un order_send. resultado puede ser None (sin respuesta del terminal).
+        El deslizamiento solo se calcula para órdenes ejecutadas con precio solicitado.
+        """
+        ahora = datetime.now()
+        retcode = resultado.retcode if resultado is not None else -1
+        deslizamiento = np.nan
+        if (resultado is not None and retcode == mt5.TRADE_RETCODE_DONE and precio_solicitado
+                and punto and getattr(resultado, 'price', 0)):
+            diferencia = resultado.price - precio_solicitado
+            deslizamiento = (diferencia if es_compra else -diferencia) / punto
+            self._recientes.setdefault(simbolo, deque(maxlen=self.ventana)).append(deslizamiento)
+
+        registro = np.zeros(1, dtype=DTYPE_EJECUCION)
+        registro['tiempo'] = ahora.timestamp()
+        registro['latencia_ms'] = latencia_ms
+        registro['deslizamiento'] = deslizamiento
+        registro['retcode'] = retcode
+        registro['desviacion'] = min(int(desviacion), 65535)
+        registro['simbolo'] = self._indice_simbolo(simbolo)
+        registro['hora'] = ahora.hour
+        registro['accion'] = accion
+        registro['recotizacion'] = retcode in RETCODES_RECOTIZACION
+        if self.ruta:
+            with open(self.ruta, 'ab') as f:
+                registro.tofile(f)
+        return deslizamiento
+
+    # --- DESVIACIÓN ADAPTATIVA ---
+    def desviacion(self, simbolo, atr_value, punto):
+        """
+        Desviación (en puntos) para la próxima orden: la mayor entre el ATR escalado y el
+        percentil del deslizamiento en contra reciente, limitada a [desviacion_min, desviacion_max].
+        """
+        base = 0.0
+        if atr_value and punto:
+            base = atr_value * self.factor_atr / punto
+        recientes = self._recientes.get(simbolo)
+        if recientes:
+            base = max(base, float(np.percentile(np.fromiter(recientes, float), self.percentil)))
+        return int(min(max(round(base), self.desviacion_min), self.desviacion_max))
+
+    # --- INFORME ---
+    def reporte(self):
+        """Estadísticas por símbolo y hora ordenadas por el deslizamiento acumulado en contra."""
+        registros = self.leer()
+        if len(registros) == 0:
+            return pd.DataFrame()
+        df = pd.DataFrame({
+            'simbolo': np.asarray(self._simbolos, dtype=object)[registros['simbolo']],
+            'hora': registros['hora'],
+            'accion': pd.Series(registros['accion']).map(NOMBRES_ACCIONES),
+            'latencia_ms': registros['latencia_ms'],
+            'deslizamiento': registros['deslizamiento'],
+            'recotizacion': registros['recotizacion'].astype(bool),
+            'fallo': registros['retcode'] != mt5.TRADE_RETCODE_DONE,
+        })
+        df['coste_puntos'] = df['deslizamiento'].clip(lower=0)
+        return df.groupby(['simbolo', 'hora']).agg(
+            envios=('latencia_ms', 'size'),
+            latencia_media_ms=('latencia_ms', 'mean'),
+            latencia_p95_ms=('latencia_ms', lambda x: np.percentile(x, 95)),
+            deslizamiento_medio=('deslizamiento', 'mean'),
+            coste_puntos=('coste_puntos', 'sum'),
+            recotizaciones=('recotizacion', 'sum'),
+            tasa_fallo=('fallo', 'mean'),
+        ).sort_values(['coste_puntos', 'latencia_p95_ms'], ascending=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Informe de calidad de ejecución por símbolo y hora.")
+    parser.add_argument('--ruta', default=CALIDAD_EJECUCION_PATH)
+    args = parser.parse_args()
+    with pd.option_context('display.max_rows', 200, 'display.width', 160):
+        print(RegistroEjecucion(args.ruta).reporte().round(2))
@@ -0,0 +1,349 @@
+# captura_ticks.py
+# Captura masiva de ticks históricos por símbolo en bloques comprimidos, particionados por día e indexados por tiempo
+import os
+import json
+import glob
+import time
+import zlib
+import logging
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+
+try:
+    import MetaTrader5 as mt5
+    MT5_DISPONIBLE = True
+except ImportError:
+    # La lectura de lo capturado no necesita MT5 (p.ej. para reproducir ticks fuera de Windows)
+    MT5_DISPONIBLE = False
+
+TICKS_DIR = os.path.join(os.path.dirname(__file__), 'ticks')
+TICKS_POR_BLOQUE = 16384    # Tamaño fijo de los bloques (menores solo al cerrar el día o al vaciar)
+LOTE_DESCARGA = 100000      # Ticks por petición a copy_ticks_from
+MS_DIA = 86400 * 1000
+
+# Tick almacenado: el 'time' en segundos de MT5 se deduce de time_msc
+DTYPE_TICK = np.dtype([
+    ('time_msc', '<i8'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('last', '<f8'),
+    ('volume_real', '<f8'),
+    ('flags', '<u4'),
+])
+# Una fila por bloque en el índice del día: rango de tiempo y posición en el archivo de datos
+DTYPE_INDICE = np.dtype([
+    ('desde', '<i8'),
+    ('hasta', '<i8'),
+    ('offset', '<i8'),
+    ('bytes', '<u4'),
+    ('n', '<u4'),
+])
+
+# --- CODIFICACIÓN DE BLOQUES ---
+def _comprimir(ticks, nivel):
+    """Bloque en columnas (el tiempo como diferencias con el tick anterior) comprimido con zlib."""
+    tiempos = ticks['time_msc']
+    columnas = [np.diff(tiempos, prepend=tiempos[0]).astype('<u4')]
+    columnas += [np.ascontiguousarray(ticks[campo]) for campo in DTYPE_TICK.names[1:]]
+    return zlib.compress(b''.join(c.tobytes() for c in columnas), nivel)
+
+def _descomprimir(datos, fila):
+    crudo = zlib.decompress(datos)
+    n = int(fila['n'])
+    ticks = np.empty(n, dtype=DTYPE_TICK)
+    diferencias = np.frombuffer(crudo, dtype='<u4', count=n)
+    ticks['time_msc'] = fila['desde'] + np.cumsum(diferencias, dtype=np.int64)
+    posicion = diferencias.nbytes
+    for campo in DTYPE_TICK.names[1:]:
+        dtype = DTYPE_TICK.fields[campo][0]
+        ticks[campo] = np.frombuffer(crudo, dtype=dtype, count=n, offset=posicion)
+        posicion += n * dtype.itemsize
+    return ticks
+
+def _a_msc(valor):
+    """datetime (sin zona = UTC), "AAAA-MM-DD[ HH:MM[:SS]]" o milisegundos -> milisegundos."""
+    if valor is None or isinstance(valor, (int, np.integer)):
+        return valor
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return int(valor.timestamp() * 1000)
+
+def _dia(msc):
+    return datetime.fromtimestamp(msc // 1000, timezone.utc).strftime('%Y-%m-%d')
+
+# --- CAPTURA ---
+class CapturaTicks:
+    """
+    Descarga los ticks de MT5 desde el cursor persistente de cada símbolo y los guarda en
+    <directorio>/<simbolo>/AAAA-MM-DD.ticks (bloques zlib) + AAAA-MM-DD.idx (DTYPE_INDICE).
+    Los días son los de time_msc, es decir, los del horario del servidor de MT5.
+    Solo se escriben bloques completos; el resto queda en memoria hasta completar un bloque,
+    cambiar de día o llamar a vaciar(). Si el proceso se corta, lo no escrito se vuelve a
+    descargar desde el cursor en la siguiente ejecución.
+    """
+    def __init__(self, directorio=TICKS_DIR, ticks_por_bloque=TICKS_POR_BLOQUE, lote=LOTE_DESCARGA, nivel_compresion=6):
+        """
+        directorio: carpeta raíz; cada símbolo se guarda en su propia subcarpeta
+        ticks_por_bloque: ticks de cada bloque comprimido (unidad mínima de lectura)
+        lote: ticks por petición a copy_ticks_from
+        nivel_compresion: nivel de zlib (1 = más rápido, 9 = más pequeño)
+        """
+        self.directorio = directorio
+        self.ticks_por_bloque = ticks_por_bloque
+        self.lote = lote
+        self.nivel_compresion = nivel_compresion
+        self._cursores = {}
+        self._pendientes = {}   # simbolo -> ticks descargados que aún no completan un bloque
+        self._ultimos = {}      # simbolo -> (último time_msc descargado, ticks con ese time_msc)
+
+    # --- CURSOR ---
+    def _ruta(self, simbolo, nombre):
+        return os.path.join(self.directorio, simbolo, nombre)
+
+    def _cursor(self, simbolo):
+        cursor = self._cursores.get(simbolo)
+        if cursor is not None:
+            return cursor
+        ruta = self._ruta(simbolo, 'cursor.json')
+        if os.path.isfile(ruta):
+            with open(ruta, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+        else:
+            # dia/bytes/bloques: tamaño confirmado de los archivos del último día escrito
+            cursor = {'ultimo_msc': None, 'repetidos': 0, 'dia': None, 'bytes': 0, 'bloques': 0, 'total': 0}
+        self._cursores[simbolo] = cursor
+        return cursor
+
+    def _guardar_cursor(self, simbolo, cursor):
+        ruta = self._ruta(simbolo, 'cursor.json')
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(cursor, f)
+        os.replace(temporal, ruta)  # Los bloques solo cuentan como escritos cuando el cursor se actualiza
+
+    def _ultimo(self, simbolo):
+        if simbolo not in self._ultimos:
+            cursor = self._cursor(simbolo)
+            self._ultimos[simbolo] = (cursor['ultimo_msc'], cursor['repetidos'])
+        return self._ultimos[simbolo]
+
+    def total(self, simbolo):
+        return self._cursor(simbolo)['total']
+
+    # --- ESCRITURA ---
+    def _nuevos(self, simbolo, ticks):
+        """Convierte los ticks de MT5 y descarta los ya descargados (las peticiones se solapan en el último segundo)."""
+        nuevos = np.empty(len(ticks), dtype=DTYPE_TICK)
+        for campo in DTYPE_TICK.names:
+            nuevos[campo] = ticks[campo]
+        ultimo, repetidos = self._ultimo(simbolo)
+        if ultimo is not None:
+            tiempos = nuevos['time_msc']
+            mascara = tiempos > ultimo
+            mascara[np.flatnonzero(tiempos == ultimo)[repetidos:]] = True
+            nuevos = nuevos[mascara]
+        if len(nuevos):
+            fin = nuevos['time_msc'][-1]
+            iguales = int(np.count_nonzero(nuevos['time_msc'] == fin))
+            self._ultimos[simbolo] = (int(fin), iguales + (repetidos if fin == ultimo else 0))
+        return nuevos
+
+    def _anadir(self, simbolo, ticks):
+        """Acumula los ticks nuevos y escribe los bloques completos y los días cerrados. Devuelve los ticks nuevos."""
+        if ticks is None or len(ticks) == 0:
+            return 0
+        nuevos = self._nuevos(simbolo, ticks)
+        total_nuevos = len(nuevos)
+        pendientes = self._pendientes.get(simbolo)
+        if pendientes is not None:
+            nuevos = np.concatenate([pendientes, nuevos])
+        dias = nuevos['time_msc'] // MS_DIA
+        while len(nuevos):
+            fin_dia = int(np.searchsorted(dias, dias[0], side='right'))
+            if fin_dia == len(nuevos):
+                # Día en curso: solo los bloques completos
+                fin_dia -= fin_dia % self.ticks_por_bloque
+                if fin_dia == 0:
+                    break
+            self._escribir(simbolo, nuevos[:fin_dia])
+            nuevos, dias = nuevos[fin_dia:], dias[fin_dia:]
+        self._pendientes[simbolo] = nuevos if len(nuevos) else None
+        return total_nuevos
+
+    def _escribir(self, simbolo, ticks):
+        """Escribe ticks de un mismo día en bloques de ticks_por_bloque y confirma con el cursor."""
+        os.makedirs(os.path.join(self.directorio, simbolo), exist_ok=True)
+        cursor = self._cursor(simbolo)
+        dia = _dia(int(ticks['time_msc'][0]))
+        if cursor['dia'] != dia:
+            cursor['dia'], cursor['bytes'], cursor['bloques'] = dia, 0, 0
+        ruta_datos = self._ruta(simbolo, f'{dia}.ticks')
+        ruta_indice = self._ruta(simbolo, f'{dia}.idx')
+        # Descartar lo escrito tras el último cursor válido (p.ej. por un corte a mitad de escritura)
+        for ruta, tamano in ((ruta_datos, cursor['bytes']), (ruta_indice, cursor['bloques'] * DTYPE_INDICE.itemsize)):
+            if os.path.isfile(ruta):
+                with open(ruta, 'r+b') as f:
+                    f.truncate(tamano)
+
+        filas = np.zeros((len(ticks) + self.ticks_por_bloque - 1) // self.ticks_por_bloque, dtype=DTYPE_INDICE)
+        offset = cursor['bytes']
+        with open(ruta_datos, 'ab') as f:
+            for i, inicio in enumerate(range(0, len(ticks), self.ticks_por_bloque)):
+                bloque = ticks[inicio:inicio + self.ticks_por_bloque]
+                datos = _comprimir(bloque, self.nivel_compresion)
+                f.write(datos)
+                filas[i] = (bloque['time_msc'][0], bloque['time_msc'][-1], offset, len(datos), len(bloque))
+                offset += len(datos)
+        with open(ruta_indice, 'ab') as f:
+            f.write(filas.tobytes())
+
+        fin = int(ticks['time_msc'][-1])
+        iguales = int(np.count_nonzero(ticks['time_msc'] == fin))
+        cursor['repetidos'] = iguales + (cursor['repetidos'] if fin == cursor['ultimo_msc'] else 0)
+        cursor['ultimo_msc'] = fin
+        cursor['bytes'] = offset
+        cursor['bloques'] += len(filas)
+        cursor['total'] += len(ticks)
+        self._guardar_cursor(simbolo, cursor)
+
+    def vaciar(self, simbolo=None):
+        """Escribe los ticks pendientes (bloque incompleto) de un símbolo o de todos, p.ej. al detener la captura."""
+        for s in ([simbolo] if simbolo else list(self._pendientes)):
+            pendientes = self._pendientes.pop(s, None)
+            if pendientes is not None:
+                self._escribir(s, pendientes)
+
+    # --- DESCARGA ---
+    def capturar(self, simbolo, desde=None):
+        """
+        Descarga los ticks de un símbolo desde su cursor (o desde 'desde' si aún no tiene) hasta ahora.
+        Los días anteriores a hoy se piden con copy_ticks_range, un día por petición; el día en curso
+        con copy_ticks_from en lotes. Devuelve los ticks nuevos descargados.
+        """
+        if not MT5_DISPONIBLE:
+            raise RuntimeError("MetaTrader5 no está instalado: no se pueden descargar ticks.")
+        ultimo = self._ultimo(simbolo)[0]
+        if ultimo is None and desde is None:
+            raise ValueError(f"{simbolo} no tiene cursor: indica la fecha 'desde' de la primera captura.")
+        inicio = ultimo // 1000 if ultimo is not None else _a_msc(desde) // 1000
+        hoy = int(time.time()) // 86400 * 86400
+        nuevos = 0
+
+        while inicio < hoy:
+            fin = min((inicio // 86400 + 1) * 86400, hoy)
+            ticks = mt5.copy_ticks_range(simbolo, datetime.fromtimestamp(inicio, timezone.utc),
+                                         datetime.fromtimestamp(fin, timezone.utc), mt5.COPY_TICKS_ALL)
+            if ticks is None:
+                # No se avanza sobre un hueco: se reintenta desde el cursor en la siguiente captura
+                logging.warning("copy_ticks_range falló para %s (%s): %s", simbolo, _dia(inicio * 1000), mt5.last_error())
+                return nuevos
+            nuevos += self._anadir(simbolo, ticks)
+            inicio = fin
+
+        while True:
+            ticks = mt5.copy_ticks_from(simbolo, datetime.fromtimestamp(inicio, timezone.utc), self.lote, mt5.COPY_TICKS_ALL)
+            if ticks is None:
+                logging.warning("copy_ticks_from falló para %s: %s", simbolo, mt5.last_error())
+                break
+            anadidos = self._anadir(simbolo, ticks)
+            nuevos += anadidos
+            if len(ticks) < self.lote:
+                break
+            if anadidos == 0:
+                logging.warning("Más de %d ticks de %s en el mismo segundo: aumentar el lote de descarga.", self.lote, simbolo)
+                break
+            inicio = self._ultimo(simbolo)[0] // 1000
+        return nuevos
+
+# --- LECTURA ---
+def leer_ticks(simbolo, desde=None, hasta=None, directorio=TICKS_DIR):
+    """
+    Generador de bloques de ticks (arrays estructurados DTYPE_TICK) en orden temporal.
+    Solo se descomprime un bloque a la vez, así que un mes entero se recorre con memoria acotada.
+    desde/hasta: datetime (sin zona = UTC), "AAAA-MM-DD[ HH:MM]" o milisegundos; el índice
+    de cada día localiza el primer bloque sin leer los anteriores.
+    """
+    desde, hasta = _a_msc(desde), _a_msc(hasta)
+    for ruta_datos in sorted(glob.glob(os.path.join(directorio, simbolo, '*.ticks'))):
+        dia = os.path.basename(ruta_datos)[:-len('.ticks')]
+        if desde is not None and dia < _dia(desde):
+            continue
+        if hasta is not None and dia > _dia(hasta):
+            return
+        ruta_indice = ruta_datos[:-len('.ticks')] + '.idx'
+        if not os.path.isfile(ruta_indice):
+            continue
+        # Un índice a medio escribir se lee hasta su última fila completa
+        indice = np.fromfile(ruta_indice, dtype=DTYPE_INDICE, count=os.path.getsize(ruta_indice) // DTYPE_INDICE.itemsize)
+        primero = int(np.searchsorted(indice['hasta'], desde, side='left')) if desde is not None else 0
+        with open(ruta_datos, 'rb') as f:
+            for fila in indice[primero:]:
+                if hasta is not None and fila['desde'] > hasta:
+                    return
+                f.seek(int(fila['offset']))
+                ticks = _descomprimir(f.read(int(fila['bytes'])), fila)
+                # Recortar los bloques de los extremos del rango
+                if desde is not None and fila['desde'] < desde:
+                    ticks = ticks[ticks['time_msc'] >= desde]
+                if hasta is not None and fila['hasta'] > hasta:
+                    ticks = ticks[ticks['time_msc'] <= hasta]
+                if len(ticks):
+                    yield ticks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Captura de ticks de MT5 y lectura de lo capturado.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    captura = subparsers.add_parser('capturar', help="Descarga los ticks desde el cursor de cada símbolo")
+    captura.add_argument('--simbolos', nargs='+', help="Por defecto, PARES_A_OPERAR de config.py")
+    captura.add_argument('--desde', help="Inicio (AAAA-MM-DD) de los símbolos sin cursor")
+    captura.add_argument('--continuo', action='store_true', help="Repetir la captura cada --intervalo segundos")
+    captura.add_argument('--intervalo', type=int, default=60)
+    captura.add_argument('--dir', default=TICKS_DIR)
+    lectura = subparsers.add_parser('leer', help="Recorre los ticks capturados de un símbolo")
+    lectura.add_argument('simbolo')
+    lectura.add_argument('--desde')
+    lectura.add_argument('--hasta')
+    lectura.add_argument('--dir', default=TICKS_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.comando == 'leer':
+        inicio = time.perf_counter()
+        n, bloques, primero, ultimo = 0, 0, None, None
+        for ticks in leer_ticks(args.simbolo, args.desde, args.hasta, args.dir):
+            n += len(ticks)
+            bloques += 1
+            primero = primero if primero is not None else int(ticks['time_msc'][0])
+            ultimo = int(ticks['time_msc'][-1])
+        if n == 0:
+            print("No hay ticks capturados en ese rango.")
+        else:
+            print(f"📈 {args.simbolo}: {n} ticks en {bloques} bloques, "
+                  f"{datetime.fromtimestamp(primero / 1000, timezone.utc)} → {datetime.fromtimestamp(ultimo / 1000, timezone.utc)} "
+                  f"({time.perf_counter() - inicio:.2f} s)")
+    else:
+        if not MT5_DISPONIBLE:
+            raise SystemExit("MetaTrader5 no está instalado: la captura solo funciona junto al terminal.")
+        import config
+        if not mt5.initialize():
+            raise SystemExit(f"Fallo al inicializar MetaTrader 5: {mt5.last_error()}")
+        captura_ticks = CapturaTicks(args.dir)
+        try:
+            while True:
+                for simbolo in args.simbolos or config.PARES_A_OPERAR:
+                    try:
+                        nuevos = captura_ticks.capturar(simbolo, args.desde)
+                        print(f"📥 {simbolo}: {nuevos} ticks nuevos ({captura_ticks.total(simbolo)} almacenados).")
+                    except ValueError as e:
+                        print(f"⚠️ {e}")
+                if not args.continuo:
+                    break
+                time.sleep(args.intervalo)
+        except KeyboardInterrupt:
+            print("\n🛑 Captura detenida.")
+        finally:
+            captura_ticks.vaciar()
+            mt5.shutdown()
@@ -10,30 +10,80 @@ MONEDA_DE_CUENTA = "USD"
 # --- CONFIGURACIÓN DE LOGS Y ARCHIVOS ---
 directorio_documentos = os.path.join(os.path.expanduser("~"), "Documents")
 LOG_FILE_PATH = os.path.join(directorio_documentos, "trading_agent.log")
+LOG_FORMATO_JSON = True             # Una línea JSON por evento (símbolo, estrategia, fase, latencia)
+LOG_ROTACION = "tamano"             # "tamano" (LOG_MAX_BYTES) o "tiempo" (LOG_ROTACION_CUANDO)
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+LOG_ROTACION_CUANDO = "midnight"
+MODO_SILENCIOSO = True              # Agrupa los pares sin señal en una sola línea por ciclo
 OPERACIONES_CSV = os.path.join(os.path.dirname(__file__), 'operaciones_trading.csv')
+CALIDAD_EJECUCION_PATH = os.path.join(os.path.dirname(__file__), 'calidad_ejecucion.bin')
+OPERACIONES_SOMBRA_CSV = os.path.join(os.path.dirname(__file__), 'operaciones_sombra.csv')  # Estrategias con "sombra": True
 
 # --- PARÁMETROS DE TRADING ---
 PARES_A_OPERAR = ["EURUSD", "GBPUSD", "USDJPY"]
 NUM_VELAS = 200
 MAX_OPERACIONES_SIMULTANEAS = 5
+NUMERO_MAGICO = 770000  # "magic" de las órdenes del agente; cada trabajador usa NUMERO_MAGICO + 1 + índice salvo "magico"
 
 # --- PARÁMETROS DE GESTIÓN DE RIESGO GLOBAL ---
 CAPITAL_INICIAL = 11000
 RIESGO_PORCENTAJE = 1.0  # Riesgo por operación como porcentaje del capital
 PERDIDA_MAXIMA_DIARIA = 0.02  # 2% del capital
 
+# --- PARÁMETROS DE LA CURVA DE EQUIDAD ---
+CURVA_EQUIDAD_PATH = os.path.join(os.path.dirname(__file__), 'curva_equidad.bin')
+VENTANA_DRAWDOWN_HORAS = 24
+CURVA_EQUIDAD_INTERVALO_GUARDADO_SEG = 30  # Escrituras del P&L flotante como mucho cada N s (siempre al cerrar una operación)
+LIMITE_DRAWDOWN_VENTANA = 0.03  # 3% del capital en la ventana móvil (None para desactivar)
+
 # --- PARÁMETROS DE LOTE Y SPREAD ---
 MAX_LOTE = 0.1
 MIN_LOTE = 0.01
 VALIDAR_SPREAD = False
 MAX_SPREAD_PORCENTAJE_BENEFICIO = 0.05 # 5%
 
+# --- PREFILTRO DE MERCADO (al inicio de cada ciclo, antes de pedir velas) ---
+PREFILTRO_ACTIVO = True
+MAX_SPREAD_PUNTOS = 30                 # Spread máximo para analizar un símbolo
+MAX_SPREAD_PUNTOS_POR_SIMBOLO = {}     # Excepciones por símbolo, p.ej. {"USDJPY": 20}
+MAX_ANTIGUEDAD_COTIZACION_SEG = 120    # Segundos sin cotizar respecto a la hora actual del servidor
+DESFASE_SERVIDOR_SEG = None            # Hora del servidor del broker menos UTC (p.ej. 7200 en UTC+2);
+                                       # None = se mide al arrancar con la cotización más reciente
+
+# --- PLANIFICADOR DEL CICLO ---
+INTERVALO_CICLO_SEG = 60       # Periodo entre inicios de ciclo
+PRESUPUESTO_CICLO_SEG = 45     # Tiempo máximo por ciclo; los análisis pendientes pasan al siguiente ciclo
+                               # (orden: "prioridad" de la estrategia, mayor primero, y luego el más atrasado)
+
+# --- CALENDARIO DE SESIONES (la API de Python de MT5 no expone las sesiones del símbolo) ---
+SESIONES_ACTIVO = True
+SESIONES_ZONA = "America/New_York"     # Horas y fechas del calendario en hora local de esta zona (sigue su horario de verano)
+SESIONES_SIMBOLOS = {}                 # {"XAUUSD": [(0, "00:00", "16:55"), ...]} con día 0 = lunes; el resto usa la semana de forex
+FOREX_APERTURA_DOMINGO = "17:00"       # 22:00 UTC en invierno, 21:00 UTC con el horario de verano
+FOREX_CIERRE_VIERNES = "17:00"
+PAUSAS_DIARIAS = [("16:55", "17:05")]  # Rollover diario
+FESTIVOS = ["2026-12-25", "2027-01-01"]
+LATIDO_MERCADO_CERRADO_SEG = 900       # Ciclo lento cuando todos los mercados están cerrados
+PRECALENTAMIENTO_SEG = 30              # Se reconecta y se seleccionan los símbolos este tiempo antes de la apertura
+
+# --- PERFILADOR BAJO DEMANDA (kill -USR1 <pid>, o crear el archivo de control; su contenido opcional = nº de ciclos) ---
+PERFILADOR_ACTIVO = True
+PERFILADOR_ARCHIVO_CONTROL = os.path.join(os.path.dirname(__file__), 'perfilar.ctl')
+PERFILADOR_DIR = os.path.join(os.path.dirname(__file__), 'perfiles')  # Pilas colapsadas (.folded), resumen y memoria
+PERFILADOR_FRECUENCIA_HZ = 100
+PERFILADOR_CICLOS = 3
+PERFILADOR_MEMORIA = True              # Instantánea de tracemalloc por ciclo (ralentiza el ciclo mientras se perfila)
+
 # --- PARÁMETROS DE GESTIÓN EN OPERACIÓN (TRAILING, BREAK-EVEN) ---
 TRAILING_ACTIVO = True
 BREAK_EVEN_ACTIVO = True
 BREAK_EVEN_ATR_FACTOR = 0.5  # Mover a BE cuando el beneficio es 0.5 * ATR
 TRAILING_ATR_FACTOR = 1.0    # Mantener el trailing a 1.0 * ATR
 DEVIATION_ATR_FACTOR = 0.1   # Multiplicador del ATR para la desviación de la orden
+DESVIACION_MIN_PUNTOS = 5     # Límites de la desviación adaptativa (ATR y deslizamiento reciente)
+DESVIACION_MAX_PUNTOS = 100
+TIEMPO_LIMITE_IA = 0.05      # Segundos máximos del modelo IA por lote; si se superan se usa el stop por reglas
 
 # --- PARÁMETROS DE REDUCCIÓN DE POSICIÓN ---
 REDUCIR_POSICION_ACTIVO = True
@@ -44,6 +94,10 @@ FACTOR_REDUCCION_LOTE = 0.75         # Reducir el lote al 75%
 ATR_PERIOD = 14
 MULTI_VELA_ELEFANTE = 2.0
 
+# --- ALMACÉN DE CARACTERÍSTICAS (ML) ---
+ALMACEN_CARACTERISTICAS_ACTIVO = False
+ALMACEN_CARACTERISTICAS_DIR = os.path.join(os.path.dirname(__file__), 'caracteristicas')
+
 ESTRATEGIAS = [
     {
         "nombre": "Cruce EMA + Vela Elefante",
@@ -58,9 +112,26 @@ ESTRATEGIAS = [
     {
         "nombre": "Reversión a la Media",
         "activa": True,
+        # "sombra": True simula las operaciones sin enviar órdenes (registro en OPERACIONES_SOMBRA_CSV)
         "criterios": { # Criterios específicos que no están en config
             "usar_filtro_tendencia_200_ema": True
         },
         "pares": ["EURUSD", "USDJPY", "AUDUSD", "NZDUSD"]
     }
-]
\ No newline at end of file
+]
+
+# --- API DE ESTADO (solo lectura, localhost) ---
+API_ESTADO_ACTIVA = True
+API_ESTADO_PUERTO = 8765  # Los trabajadores usan API_ESTADO_PUERTO + 1 + índice salvo "puerto_api"
+
+# --- MODO COORDINADOR / TRABAJADORES (python coordinador.py) ---
+COORDINADOR_DIRECCION = ("127.0.0.1", 50555)  # Solo escucha en localhost
+COORDINADOR_CLAVE = os.getenv("COORDINADOR_CLAVE", "tradingbot").encode()
+COORDINADOR_TTL_RESERVA_SEG = 120  # Una reserva sin confirmar ni liberar (trabajador caído) caduca y devuelve su hueco
+TRABAJADORES = [
+    # "terminal": ruta al terminal64.exe de cada trabajador (None = terminal por defecto)
+    # "pares": opcional, restringe los pares de sus estrategias
+    # Los trabajadores pueden compartir terminal: cada uno solo gestiona y cuenta las posiciones con su "magic"
+    {"nombre": "trabajador_1", "terminal": None, "estrategias": ["Cruce EMA + Vela Elefante"]},
+    {"nombre": "trabajador_2", "terminal": None, "estrategias": ["Rompimiento de la EMA 20", "Reversión a la Media"]},
+]
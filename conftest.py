@@ -0,0 +1,12 @@
+# conftest.py
+import sys
+
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:
+    # Sin el paquete de MetaTrader5 (Linux, CI) las pruebas usan el terminal simulado
+    import mt5_simulado
+    sys.modules['MetaTrader5'] = mt5_simulado
+
+# Script de comprobación contra un terminal real, no una prueba
+collect_ignore = ["test_conexion.py"]
@@ -0,0 +1,287 @@
+# coordinador.py
+# Modo coordinador / trabajadores: reparte estrategias y pares entre varios procesos y terminales MT5
+# manteniendo un único gestor de riesgo global y un único presupuesto de posiciones simultáneas.
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from multiprocessing.managers import BaseManager
+
+import config
+from gestion_riesgo import GestionRiesgo
+from curva_equidad import CurvaEquidad
+from registro_operaciones import escribir_operacion_cerrada
+
+def posiciones_propias(posiciones, numero_magico):
+    """Posiciones abiertas por un trabajador: su terminal puede tener también las de otros trabajadores."""
+    return [p for p in posiciones if p.magic == numero_magico]
+
+class GestionRiesgoCompartida:
+    """
+    Estado de riesgo autoritativo del coordinador. Todas las operaciones se serializan con un lock,
+    de modo que el límite diario y MAX_OPERACIONES_SIMULTANEAS se respetan exactamente entre procesos.
+    """
+    def __init__(self, gestion_riesgo, max_operaciones, ruta_csv=None, ttl_reserva=120):
+        """
+        gestion_riesgo: GestionRiesgo con los límites globales
+        max_operaciones: posiciones simultáneas entre todos los trabajadores
+        ruta_csv: registro de operaciones cerradas; solo escribe el coordinador (None = no se escribe)
+        ttl_reserva: segundos tras los que una reserva sin confirmar ni liberar caduca (trabajador caído)
+        """
+        self.riesgo = gestion_riesgo
+        self.max_operaciones = max_operaciones
+        self.ruta_csv = ruta_csv
+        self.ttl_reserva = ttl_reserva
+        self._lock = threading.Lock()
+        self._reservas = {}     # id_reserva -> (trabajador, simbolo, estrategia, caducidad en time.monotonic())
+        self._posiciones = {}   # trabajador -> set(tickets abiertos en su terminal)
+        self._flotantes = {}    # trabajador -> P&L flotante
+
+    def slots_en_uso(self):
+        return len(self._reservas) + sum(len(t) for t in self._posiciones.values())
+
+    def _purgar_reservas(self, trabajador=None):
+        """Descarta las reservas caducadas o, con 'trabajador', todas las suyas. Llamar con el lock tomado."""
+        ahora = time.monotonic()
+        for reserva, (dueno, simbolo, estrategia, caducidad) in list(self._reservas.items()):
+            if dueno == trabajador or caducidad <= ahora:
+                del self._reservas[reserva]
+                logging.warning("Reserva de %s (%s, %s) descartada sin confirmar: se devuelve su hueco.", dueno, simbolo, estrategia)
+
+    def puede_operar(self, nombre_estrategia=None):
+        with self._lock:
+            return self.riesgo.puede_operar(nombre_estrategia)
+
+    def motivo_bloqueo(self, nombre_estrategia=None):
+        with self._lock:
+            return self.riesgo.motivo_bloqueo(nombre_estrategia)
+
+    def factor_posicion(self, nombre_estrategia):
+        with self._lock:
+            return self.riesgo.factor_posicion(nombre_estrategia)
+
+    def registrar_operacion(self, nombre_estrategia, resultado):
+        with self._lock:
+            self.riesgo.registrar_operacion(nombre_estrategia, resultado)
+
+    def registrar_operacion_cerrada(self, operacion_cerrada):
+        """Escribe la fila en el CSV compartido y registra su resultado, serializado entre trabajadores."""
+        with self._lock:
+            if self.ruta_csv:
+                escribir_operacion_cerrada(operacion_cerrada, self.ruta_csv)
+            self.riesgo.registrar_operacion(operacion_cerrada['estrategia'], operacion_cerrada['resultado_dinero'])
+
+    def actualizar_flotante(self, trabajador, flotante):
+        with self._lock:
+            self._flotantes[trabajador] = flotante
+            self.riesgo.actualizar_flotante(sum(self._flotantes.values()))
+
+    def reservar_slot(self, trabajador, simbolo, nombre_estrategia):
+        """Reserva atómicamente un hueco de posición. Devuelve el id de la reserva o None si no se puede operar."""
+        with self._lock:
+            if not self.riesgo.puede_operar(nombre_estrategia):
+                return None
+            self._purgar_reservas()
+            if self.slots_en_uso() >= self.max_operaciones:
+                return None
+            reserva = uuid.uuid4().hex
+            self._reservas[reserva] = (trabajador, simbolo, nombre_estrategia, time.monotonic() + self.ttl_reserva)
+            return reserva
+
+    def confirmar_slot(self, reserva, ticket):
+        """La orden se ejecutó: la reserva pasa a ser una posición abierta del trabajador."""
+        with self._lock:
+            datos = self._reservas.pop(reserva, None)
+            if datos is not None:
+                self._posiciones.setdefault(datos[0], set()).add(ticket)
+
+    def liberar_slot(self, reserva):
+        """La orden no se ejecutó: se devuelve el hueco."""
+        with self._lock:
+            self._reservas.pop(reserva, None)
+
+    def sincronizar_posiciones(self, trabajador, tickets_abiertos):
+        """
+        Sustituye las posiciones del trabajador por las que su terminal reporta abiertas.
+        El trabajador sincroniza al inicio del ciclo, sin órdenes en curso: las reservas que aún tenga
+        son de un proceso anterior que cayó entre reservar y confirmar, y se descartan.
+        """
+        with self._lock:
+            self._posiciones[trabajador] = set(tickets_abiertos)
+            self._purgar_reservas(trabajador)
+
+    def resumen(self):
+        with self._lock:
+            self._purgar_reservas()
+            resumen = self.riesgo.resumen()
+            resumen['slots_en_uso'] = self.slots_en_uso()
+            resumen['max_operaciones'] = self.max_operaciones
+            resumen['posiciones_por_trabajador'] = {t: len(p) for t, p in self._posiciones.items()}
+            return resumen
+
+class VistaTrabajador:
+    """
+    Interfaz de GestionRiesgo que ve un trabajador: las llamadas van al estado compartido
+    identificándose con el nombre del trabajador.
+    """
+    def __init__(self, compartida, trabajador):
+        self._compartida = compartida
+        self.trabajador = trabajador
+
+    def puede_operar(self, nombre_estrategia=None):
+        return self._compartida.puede_operar(nombre_estrategia)
+
+    def motivo_bloqueo(self, nombre_estrategia=None):
+        return self._compartida.motivo_bloqueo(nombre_estrategia)
+
+    def factor_posicion(self, nombre_estrategia):
+        return self._compartida.factor_posicion(nombre_estrategia)
+
+    def registrar_operacion(self, nombre_estrategia, resultado):
+        self._compartida.registrar_operacion(nombre_estrategia, resultado)
+
+    def registrar_operacion_cerrada(self, operacion_cerrada):
+        self._compartida.registrar_operacion_cerrada(operacion_cerrada)
+
+    def actualizar_flotante(self, flotante):
+        self._compartida.actualizar_flotante(self.trabajador, flotante)
+
+    def reservar_slot(self, simbolo, nombre_estrategia):
+        return self._compartida.reservar_slot(self.trabajador, simbolo, nombre_estrategia)
+
+    def confirmar_slot(self, reserva, ticket):
+        self._compartida.confirmar_slot(reserva, ticket)
+
+    def liberar_slot(self, reserva):
+        self._compartida.liberar_slot(reserva)
+
+    def sincronizar_posiciones(self, tickets_abiertos):
+        self._compartida.sincronizar_posiciones(self.trabajador, tickets_abiertos)
+
+    def resumen(self):
+        return self._compartida.resumen()
+
+class AdministradorRiesgo(BaseManager):
+    """Servidor local (socket TCP en localhost) que expone el riesgo compartido a los trabajadores."""
+
+AdministradorRiesgo.register('vista_trabajador')
+
+def crear_gestion_riesgo():
+    """Gestor de riesgo global con la misma configuración que el modo de un solo proceso."""
+    curva_equidad = CurvaEquidad(
+        ruta=config.CURVA_EQUIDAD_PATH,
+        capital_inicial=config.CAPITAL_INICIAL,
+        ventana_horas=config.VENTANA_DRAWDOWN_HORAS,
+        intervalo_guardado=config.CURVA_EQUIDAD_INTERVALO_GUARDADO_SEG
+    )
+    gestion = GestionRiesgo(
+        limite_global=config.PERDIDA_MAXIMA_DIARIA,
+        modo_porcentaje=True,
+        capital_inicial=config.CAPITAL_INICIAL,
+        reducir_posicion_activo=config.REDUCIR_POSICION_ACTIVO,
+        perdidas_consecutivas_reduccion=config.PERDIDAS_CONSECUTIVAS_REDUCCION,
+        factor_reduccion=config.FACTOR_REDUCCION_LOTE,
+        curva_equidad=curva_equidad,
+        limite_drawdown=config.LIMITE_DRAWDOWN_VENTANA
+    )
+    # Cargar el historial del CSV para saber si los límites de pérdidas se han alcanzado
+    gestion.cargar_desde_csv(config.OPERACIONES_CSV)
+    return gestion
+
+def crear_servidor(compartida, direccion=None, clave=None):
+    """Crea (sin arrancar) el servidor del coordinador sobre un estado compartido."""
+    class Administrador(AdministradorRiesgo):
+        pass
+    Administrador.register('vista_trabajador', callable=lambda trabajador: VistaTrabajador(compartida, trabajador),
+                           exposed=('puede_operar', 'motivo_bloqueo', 'factor_posicion', 'registrar_operacion',
+                                    'registrar_operacion_cerrada', 'actualizar_flotante', 'reservar_slot', 'confirmar_slot', 'liberar_slot', 'sincronizar_posiciones', 'resumen'))
+    administrador = Administrador(address=direccion or config.COORDINADOR_DIRECCION,
+                                  authkey=clave or config.COORDINADOR_CLAVE)
+    return administrador.get_server()
+
+def conectar_coordinador(trabajador, direccion=None, clave=None):
+    """Conecta con el coordinador y devuelve la vista (proxy) de riesgo de este trabajador."""
+    administrador = AdministradorRiesgo(address=direccion or config.COORDINADOR_DIRECCION,
+                                        authkey=clave or config.COORDINADOR_CLAVE)
+    administrador.connect()
+    return administrador.vista_trabajador(trabajador)
+
+def estrategias_del_trabajador(definicion):
+    """Filtra config.ESTRATEGIAS por las estrategias y pares asignados al trabajador."""
+    nombres = definicion.get("estrategias")
+    pares = definicion.get("pares")
+    estrategias = []
+    for estrategia in config.ESTRATEGIAS:
+        if not estrategia.get("activa", False):
+            continue
+        if nombres is not None and estrategia["nombre"] not in nombres:
+            continue
+        estrategia = dict(estrategia)
+        if pares is not None:
+            estrategia["pares"] = [p for p in estrategia.get("pares", config.PARES_A_OPERAR) if p in pares]
+        estrategias.append(estrategia)
+    return estrategias
+
+def ejecutar_trabajador(indice, direccion=None, clave=None):
+    """Proceso trabajador: conecta con su terminal y ejecuta el bucle de trading con el riesgo compartido."""
+    import trading_agent
+
+    definicion = config.TRABAJADORES[indice]
+    nombre = definicion["nombre"]
+    coordinador = conectar_coordinador(nombre, direccion, clave)
+    trading_agent.main(
+        estrategias=estrategias_del_trabajador(definicion),
+        coordinador=coordinador,
+        ruta_terminal=definicion.get("terminal"),
+        nombre_trabajador=nombre,  # Cada trabajador escribe sus propios archivos de log y de ejecución
+        numero_magico=definicion.get("magico", config.NUMERO_MAGICO + 1 + indice),
+        puerto_api=definicion.get("puerto_api", config.API_ESTADO_PUERTO + 1 + indice)
+    )
+
+def ejecutar_coordinador(direccion=None, clave=None, lanzar_trabajadores=True):
+    """Arranca el servidor de riesgo y, opcionalmente, un proceso por cada entrada de config.TRABAJADORES."""
+    from log_estructurado import configurar_logging
+    configurar_logging(
+        f"{config.LOG_FILE_PATH}.coordinador",
+        formato_json=config.LOG_FORMATO_JSON,
+        rotacion=config.LOG_ROTACION,
+        max_bytes=config.LOG_MAX_BYTES,
+        backups=config.LOG_BACKUPS,
+        cuando=config.LOG_ROTACION_CUANDO
+    )
+    compartida = GestionRiesgoCompartida(crear_gestion_riesgo(), config.MAX_OPERACIONES_SIMULTANEAS, config.OPERACIONES_CSV,
+                                         ttl_reserva=config.COORDINADOR_TTL_RESERVA_SEG)
+    servidor = crear_servidor(compartida, direccion, clave)
+    logging.info("Coordinador escuchando en %s con %d trabajadores.", servidor.address, len(config.TRABAJADORES))
+    print(f"🧭 Coordinador escuchando en {servidor.address}.")
+
+    procesos = []
+    if lanzar_trabajadores:
+        contexto = multiprocessing.get_context("spawn")
+        for indice in range(len(config.TRABAJADORES)):
+            proceso = contexto.Process(target=ejecutar_trabajador, args=(indice, direccion, clave),
+                                       name=config.TRABAJADORES[indice]["nombre"], daemon=True)
+            proceso.start()
+            procesos.append(proceso)
+
+    try:
+        servidor.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        print("\n🛑 Coordinador detenido.")
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+        compartida.riesgo.guardar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coordinador de riesgo y trabajadores del agente de trading.")
+    parser.add_argument('--trabajador', type=int, help="Ejecuta solo el trabajador con este índice de config.TRABAJADORES")
+    parser.add_argument('--sin-trabajadores', action='store_true', help="Arranca solo el coordinador")
+    args = parser.parse_args()
+
+    if args.trabajador is not None:
+        ejecutar_trabajador(args.trabajador)
+    else:
+        ejecutar_coordinador(lanzar_trabajadores=not args.sin_trabajadores)
@@ -0,0 +1,281 @@
+# curva_equidad.py
+# Curva de equidad realizada y flotante en arrays, con drawdown y P&L móvil en tiempo constante
+import os
+import json
+from collections import deque
+from datetime import datetime
+import numpy as np
+
+# Registro binario de cada operación cerrada (26 bytes por operación)
+DTYPE_REGISTRO = np.dtype([
+    ('tiempo', '<f8'),      # Timestamp de cierre (segundos)
+    ('resultado', '<f8'),   # Resultado en dinero de la operación
+    ('equidad', '<f8'),     # Equidad realizada acumulada tras la operación
+    ('estrategia', '<i2'),  # Índice de la estrategia (ver archivo .estrategias)
+])
+
+class CurvaEquidad:
+    def __init__(self, ruta=None, capital_inicial=0.0, ventana_horas=24, capacidad_inicial=1024, intervalo_guardado=30.0):
+        """
+        ruta: archivo binario donde se añaden las operaciones (None = solo en memoria)
+        capital_inicial: equidad de partida de la curva
+        ventana_horas: ventana para el P&L y el drawdown móviles
+        capacidad_inicial: tamaño inicial del array (se duplica al llenarse)
+        intervalo_guardado: segundos mínimos entre escrituras del estado flotante; se escribe siempre
+                            al registrar una operación cerrada y con guardar()
+        """
+        self.ruta = ruta
+        self.capital_inicial = capital_inicial
+        self.ventana_segundos = ventana_horas * 3600
+        self.intervalo_guardado = intervalo_guardado
+
+        self._datos = np.zeros(capacidad_inicial, dtype=DTYPE_REGISTRO)
+        self._n = 0
+        self._estrategias = []
+        self._indices_estrategias = {}
+
+        # Estados dinámicos
+        self.realizada = capital_inicial
+        self.flotante = 0.0
+        self.pico = capital_inicial
+        self.max_drawdown = 0.0
+        self.rachas = {}
+        self._inicio_ventana = 0
+        self._maximos_ventana = deque()  # (tiempo, equidad) con equidad decreciente
+        self._flotante_pendiente = False  # Estado flotante cambiado y aún sin escribir
+        self._ultimo_guardado = float('-inf')
+
+        if ruta:
+            self._cargar()
+
+    # --- PERSISTENCIA ---
+    def _ruta_estrategias(self):
+        return self.ruta + '.estrategias'
+
+    def _ruta_flotante(self):
+        return self.ruta + '.flotante'
+
+    def _cargar(self):
+        """Carga el registro binario y reconstruye el estado con operaciones vectorizadas (un paso por estrategia para las rachas)."""
+        if os.path.isfile(self._ruta_estrategias()):
+            with open(self._ruta_estrategias(), 'r', encoding='utf-8') as f:
+                self._estrategias = json.load(f)
+            self._indices_estrategias = {nombre: i for i, nombre in enumerate(self._estrategias)}
+
+        if os.path.isfile(self.ruta):
+            self._cargar_registros()
+        self._cargar_flotante()
+
+    def _cargar_registros(self):
+        # Ignorar un posible registro incompleto al final del archivo
+        n = os.path.getsize(self.ruta) // DTYPE_REGISTRO.itemsize
+        registros = np.fromfile(self.ruta, dtype=DTYPE_REGISTRO, count=n)
+        if n == 0:
+            return
+        self._asegurar_capacidad(n)
+        self._datos[:n] = registros
+        self._n = n
+
+        # Misma suma secuencial que registrar(), para que la equidad recargada sea idéntica
+        equidad = np.cumsum(np.concatenate(([self.capital_inicial], registros['resultado'])))[1:]
+        picos = np.maximum.accumulate(np.concatenate(([self.capital_inicial], equidad)))
+        self.realizada = float(equidad[-1])
+        self.pico = float(picos[-1])
+        self.max_drawdown = float(np.max(picos[1:] - equidad))
+
+        # Racha final de cada estrategia: longitud del último tramo de resultados del mismo signo
+        for indice in np.unique(registros['estrategia']):
+            negativos = registros['resultado'][registros['estrategia'] == indice] < 0
+            cambios = np.flatnonzero(negativos != negativos[-1])
+            longitud = len(negativos) - (int(cambios[-1]) + 1 if len(cambios) else 0)
+            self.rachas[self._estrategias[indice]] = -longitud if negativos[-1] else longitud
+
+        # Máximos de la ventana: las operaciones dentro de ella con equidad mayor que todas las posteriores
+        # (lo que dejaría _empujar_ventana tras recorrerlas una a una)
+        dentro = int(np.searchsorted(registros['tiempo'], datetime.now().timestamp() - self.ventana_segundos, side='left'))
+        tiempos, equidades = registros['tiempo'][dentro:], equidad[dentro:]
+        if len(equidades):
+            maximo_posterior = np.append(np.maximum.accumulate(equidades[::-1])[::-1][1:], -np.inf)
+            conservar = equidades > maximo_posterior
+            self._maximos_ventana = deque(zip(tiempos[conservar].tolist(), equidades[conservar].tolist()))
+
+    def _cargar_flotante(self):
+        """Restaura el último P&L flotante y el pico que incluía flotante (las posiciones siguen abiertas tras reiniciar)."""
+        if not os.path.isfile(self._ruta_flotante()):
+            return
+        with open(self._ruta_flotante(), 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+        self.flotante = estado['flotante']
+        self.pico = max(self.pico, estado['pico'])
+        self.max_drawdown = max(self.max_drawdown, estado['max_drawdown'])
+
+    def _guardar_flotante(self, ahora=None):
+        self._flotante_pendiente = False
+        self._ultimo_guardado = ahora if ahora is not None else datetime.now().timestamp()
+        if not self.ruta:
+            return
+        temporal = self._ruta_flotante() + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'flotante': self.flotante, 'pico': self.pico, 'max_drawdown': self.max_drawdown}, f)
+        os.replace(temporal, self._ruta_flotante())
+
+    def _guardar_registro(self, registro, estrategia_nueva):
+        if not self.ruta:
+            return
+        if estrategia_nueva:
+            with open(self._ruta_estrategias(), 'w', encoding='utf-8') as f:
+                json.dump(self._estrategias, f, ensure_ascii=False)
+        with open(self.ruta, 'ab') as f:
+            registro.tofile(f)
+
+    # --- ACTUALIZACIÓN ---
+    def _asegurar_capacidad(self, n):
+        if n <= len(self._datos):
+            return
+        capacidad = len(self._datos)
+        while capacidad < n:
+            capacidad *= 2
+        nuevos = np.zeros(capacidad, dtype=DTYPE_REGISTRO)
+        nuevos[:self._n] = self._datos[:self._n]
+        self._datos = nuevos
+
+    def _indice_estrategia(self, nombre):
+        indice = self._indices_estrategias.get(nombre)
+        if indice is not None:
+            return indice, False
+        indice = len(self._estrategias)
+        self._estrategias.append(nombre)
+        self._indices_estrategias[nombre] = indice
+        return indice, True
+
+    def _actualizar_racha(self, nombre, resultado):
+        """Racha con signo: positiva = ganancias seguidas, negativa = pérdidas seguidas."""
+        racha = self.rachas.get(nombre, 0)
+        if resultado < 0:
+            self.rachas[nombre] = racha - 1 if racha < 0 else -1
+        else:
+            self.rachas[nombre] = racha + 1 if racha > 0 else 1
+
+    def _empujar_ventana(self, tiempo, equidad):
+        while self._maximos_ventana and self._maximos_ventana[-1][1] <= equidad:
+            self._maximos_ventana.pop()
+        self._maximos_ventana.append((tiempo, equidad))
+
+    def _actualizar_drawdown(self):
+        equidad = self.equidad
+        if equidad > self.pico:
+            self.pico = equidad
+        drawdown = self.pico - equidad
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+
+    def registrar(self, nombre_estrategia, resultado, tiempo=None):
+        """Añade una operación cerrada a la curva y al archivo binario."""
+        tiempo = tiempo if tiempo is not None else datetime.now().timestamp()
+        indice, estrategia_nueva = self._indice_estrategia(nombre_estrategia)
+
+        self.realizada += resultado
+        self._asegurar_capacidad(self._n + 1)
+        registro = self._datos[self._n:self._n + 1]
+        registro['tiempo'] = tiempo
+        registro['resultado'] = resultado
+        registro['equidad'] = self.realizada
+        registro['estrategia'] = indice
+        self._n += 1
+
+        self._actualizar_racha(nombre_estrategia, resultado)
+        self._empujar_ventana(tiempo, self.realizada)
+        self._actualizar_drawdown()
+        self._guardar_registro(registro, estrategia_nueva)
+        self.guardar()
+
+    def actualizar_flotante(self, flotante, ahora=None):
+        """
+        Actualiza el P&L flotante de las posiciones abiertas. Si cambia el estado se persiste,
+        como mucho una vez cada intervalo_guardado segundos.
+        """
+        anterior = (self.flotante, self.pico, self.max_drawdown)
+        self.flotante = flotante
+        self._actualizar_drawdown()
+        if (self.flotante, self.pico, self.max_drawdown) != anterior:
+            self._flotante_pendiente = True
+        ahora = ahora if ahora is not None else datetime.now().timestamp()
+        if self._flotante_pendiente and ahora - self._ultimo_guardado >= self.intervalo_guardado:
+            self._guardar_flotante(ahora)
+
+    def guardar(self):
+        """Escribe el estado flotante pendiente (al cerrar una operación y al detener el agente)."""
+        if self._flotante_pendiente:
+            self._guardar_flotante()
+
+    # --- CONSULTAS ---
+    @property
+    def equidad(self):
+        return self.realizada + self.flotante
+
+    @property
+    def drawdown_actual(self):
+        return self.pico - self.equidad
+
+    def __len__(self):
+        return self._n
+
+    def operaciones(self):
+        """Vista (sin copia) de las operaciones registradas."""
+        return self._datos[:self._n]
+
+    def pnl_ultimas(self, n):
+        """P&L realizado de las últimas n operaciones."""
+        n = min(n, self._n)
+        if n <= 0:
+            return 0.0
+        previa = self._datos['equidad'][self._n - n - 1] if self._n > n else self.capital_inicial
+        return float(self.realizada - previa)
+
+    def pnl_ventana(self, ahora=None):
+        """P&L realizado dentro de la ventana móvil (el puntero solo avanza)."""
+        ahora = ahora if ahora is not None else datetime.now().timestamp()
+        limite = ahora - self.ventana_segundos
+        tiempos = self._datos['tiempo']
+        while self._inicio_ventana < self._n and tiempos[self._inicio_ventana] < limite:
+            self._inicio_ventana += 1
+        return self.pnl_ultimas(self._n - self._inicio_ventana)
+
+    def pnl_ultimas_horas(self, horas, ahora=None):
+        """P&L realizado en las últimas 'horas' arbitrarias (búsqueda binaria)."""
+        ahora = ahora if ahora is not None else datetime.now().timestamp()
+        inicio = np.searchsorted(self._datos['tiempo'][:self._n], ahora - horas * 3600, side='left')
+        return self.pnl_ultimas(self._n - int(inicio))
+
+    def drawdown_ventana(self, ahora=None):
+        """Caída de la equidad actual respecto al máximo realizado dentro de la ventana móvil."""
+        ahora = ahora if ahora is not None else datetime.now().timestamp()
+        limite = ahora - self.ventana_segundos
+        while self._maximos_ventana and self._maximos_ventana[0][0] < limite:
+            self._maximos_ventana.popleft()
+        pico = self.realizada
+        if self._maximos_ventana and self._maximos_ventana[0][1] > pico:
+            pico = self._maximos_ventana[0][1]
+        return max(0.0, float(pico - self.equidad))
+
+    def racha(self, nombre_estrategia):
+        return self.rachas.get(nombre_estrategia, 0)
+
+    def resumen(self):
+        return {
+            'equidad': self.equidad,
+            'realizada': self.realizada,
+            'flotante': self.flotante,
+            'drawdown_actual': self.drawdown_actual,
+            'max_drawdown': self.max_drawdown,
+            'drawdown_ventana': self.drawdown_ventana(),
+            'pnl_ventana': self.pnl_ventana(),
+            'operaciones': self._n,
+            'rachas': self.rachas.copy()
+        }
+
+# Ejemplo de uso:
+# curva = CurvaEquidad(ruta='curva_equidad.bin', capital_inicial=10000, ventana_horas=24)
+# curva.registrar('estrategia1', -50)
+# curva.actualizar_flotante(-20)
+# curva.drawdown_ventana()
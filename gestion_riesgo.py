@@ -7,12 +7,15 @@ class GestionRiesgo:
     def __init__(self, limite_global=None, limites_estrategias=None, modo_porcentaje=False, capital_inicial=10000,
                  cooldown_activo=False, cooldown_minutos=60,
                  reducir_posicion_activo=False, perdidas_consecutivas_reduccion=3, factor_reduccion=0.5,
-                 limite_perdidas_consecutivas_activo=False, limite_perdidas_consecutivas=3):
+                 limite_perdidas_consecutivas_activo=False, limite_perdidas_consecutivas=3,
+                 curva_equidad=None, limite_drawdown=None):
         """
         limite_global: float (valor absoluto o porcentaje)
         limites_estrategias: dict {nombre_estrategia: limite}
         modo_porcentaje: bool (True si los límites son porcentajes)
         capital_inicial: float (para cálculo de porcentajes)
+        curva_equidad: CurvaEquidad opcional donde se registran las operaciones cerradas
+        limite_drawdown: float (drawdown máximo en la ventana móvil de la curva, mismo modo que limite_global)
         """
         self.limite_global = limite_global
         self.limites_estrategias = limites_estrategias or {}
@@ -25,6 +28,8 @@ class GestionRiesgo:
         self.factor_reduccion = factor_reduccion
         self.limite_perdidas_consecutivas_activo = limite_perdidas_consecutivas_activo
         self.limite_perdidas_consecutivas = limite_perdidas_consecutivas
+        self.curva_equidad = curva_equidad
+        self.limite_drawdown = limite_drawdown
 
         # Estados dinámicos
         self.perdida_global = 0.0
@@ -64,6 +69,10 @@ class GestionRiesgo:
         # Actualiza las pérdidas globales
         self.perdida_global += resultado
 
+        # La curva de equidad persiste su propio historial, no se recarga desde el CSV
+        if self.curva_equidad is not None and not cargar:
+            self.curva_equidad.registrar(nombre_estrategia, resultado)
+
         # Actualiza las pérdidas por estrategia
         if nombre_estrategia in self.limites_estrategias:
             self.perdidas_estrategias[nombre_estrategia] = self.perdidas_estrategias.get(nombre_estrategia, 0) + resultado
@@ -89,9 +98,16 @@ class GestionRiesgo:
         Verifica si se puede abrir una nueva operación.
         Si nombre_estrategia es None, verifica el límite global.
         """
+        return self.motivo_bloqueo(nombre_estrategia) is None
+
+    def motivo_bloqueo(self, nombre_estrategia=None):
+        """
+        Motivo por el que no se puede operar: "cooldown", "limite_diario", "drawdown_ventana",
+        "limite_estrategia", o None si se puede operar.
+        """
         # Cooldown
         if self.cooldown_activo and nombre_estrategia in self.cooldowns and self.cooldowns[nombre_estrategia] > datetime.now():
-            return False
+            return "cooldown"
             
         # Límite global
         if self.limite_global:
@@ -99,7 +115,15 @@ class GestionRiesgo:
             if self.modo_porcentaje:
                 limite = self.capital_inicial * self.limite_global
             if self.perdida_global <= -abs(limite): # Si la pérdida es mayor que el límite
-                return False
+                return "limite_diario"
+
+        # Drawdown en la ventana móvil de la curva de equidad
+        if self.limite_drawdown and self.curva_equidad is not None:
+            limite = self.limite_drawdown
+            if self.modo_porcentaje:
+                limite = self.capital_inicial * self.limite_drawdown
+            if self.curva_equidad.drawdown_ventana() >= abs(limite):
+                return "drawdown_ventana"
 
         # Por estrategia
         if nombre_estrategia in self.limites_estrategias:
@@ -107,9 +131,19 @@ class GestionRiesgo:
             if self.modo_porcentaje:
                 limite = self.capital_inicial * limite / 100
             if self.perdidas_estrategias.get(nombre_estrategia, 0) <= -abs(limite):
-                return False
+                return "limite_estrategia"
         
-        return True
+        return None
+
+    def actualizar_flotante(self, flotante):
+        """Actualiza el P&L flotante de las posiciones abiertas en la curva de equidad."""
+        if self.curva_equidad is not None:
+            self.curva_equidad.actualizar_flotante(flotante)
+
+    def guardar(self):
+        """Escribe el estado pendiente de la curva de equidad (llamar al detener el agente)."""
+        if self.curva_equidad is not None:
+            self.curva_equidad.guardar()
 
     def factor_posicion(self, nombre_estrategia):
         """Devuelve el factor de reducción de posición para la estrategia (1.0 = normal, <1.0 = reducir)"""
@@ -119,13 +153,16 @@ class GestionRiesgo:
         return 1.0
 
     def resumen(self):
-        return {
+        resumen = {
             'perdida_global': self.perdida_global,
             'perdidas_estrategias': self.perdidas_estrategias.copy(),
             'fecha': str(self.fecha_actual),
             'cooldowns': {k: str(v) for k, v in self.cooldowns.items() if v > datetime.now()},
-            'perdidas_consecutivas': self.perdidas_consecutivas
+            'perdidas_consecutivas': self.perdidas_consecutivas.copy()
         }
+        if self.curva_equidad is not None:
+            resumen['curva_equidad'] = self.curva_equidad.resumen()
+        return resumen
 
 # Ejemplo de uso:
 # riesgo = GestionRiesgo(limite_global=500, limites_estrategias={'estrategia1': 200, 'estrategia2': 150}, modo_porcentaje=False)
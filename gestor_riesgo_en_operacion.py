@@ -1,40 +1,57 @@
 # gestor_riesgo_en_operacion.py
 # Gestión activa del riesgo durante la operación (stop loss dinámico, break-even, trailing stop, IA)
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime
+import numpy as np
 
 class GestorRiesgoEnOperacion:
-    def __init__(self, modo_trailing=True, break_even_activo=True, atr_factor_trailing=1.0, atr_factor_break_even=0.5, modelo_ia=None):
+    def __init__(self, modo_trailing=True, break_even_activo=True, atr_factor_trailing=1.0, atr_factor_break_even=0.5, modelo_ia=None,
+                 modelo_ia_lote=None, tiempo_limite_ia=0.05, num_retornos=5):
         """
         modo_trailing: activa el trailing stop
         break_even_activo: mueve el stop al punto de entrada tras cierto beneficio
         atr_factor_trailing: multiplicador del ATR para el trailing stop
         atr_factor_break_even: multiplicador del ATR para el umbral de break-even
         modelo_ia: función o modelo que puede sugerir mover el stop o cerrar la operación
+        modelo_ia_lote: función que recibe la matriz de características de todas las posiciones y devuelve
+                        (stops, cerrar); un stop NaN significa sin sugerencia
+        tiempo_limite_ia: segundos máximos de espera al modelo por lote; si se superan se usa el stop por reglas
+        num_retornos: número de retornos logarítmicos recientes incluidos como características
         """
         self.modo_trailing = modo_trailing
         self.break_even_activo = break_even_activo
         self.atr_factor_trailing = atr_factor_trailing
         self.atr_factor_break_even = atr_factor_break_even
         self.modelo_ia = modelo_ia
+        self.modelo_ia_lote = modelo_ia_lote
+        self.tiempo_limite_ia = tiempo_limite_ia
+        self.num_retornos = num_retornos
 
-    def actualizar_stop(self, precio_entrada, stop_actual, precio_actual, tipo='compra', atr_value=0.0):
-        """
-        Devuelve el nuevo stop loss sugerido según la lógica activa.
-        atr_value: El valor actual del ATR para el par de la operación.
-        tipo: 'compra' o 'venta'
-        """
+        self.columnas_caracteristicas = (
+            ['precio_actual', 'precio_entrada', 'stop_actual', 'atr']
+            + [f'retorno_{i}' for i in range(1, num_retornos + 1)]
+            + ['minutos_en_operacion', 'es_compra']
+        )
+        self._cache_retornos = {}  # ticket -> (tiempo_ultima_vela, retornos)
+        self._ejecutor_ia = None
+        self._tarea_ia = None
+        self.plazos_incumplidos = 0
+
+    def _stop_por_reglas(self, precio_entrada, stop_actual, precio_actual, tipo, atr_value):
         nuevo_stop = stop_actual
         ganancia = (precio_actual - precio_entrada) if tipo == 'compra' else (precio_entrada - precio_actual)
-        
+
         # Calcular los valores dinámicos basados en el ATR
         umbral_break_even = self.atr_factor_break_even * atr_value
         trailing_distancia = self.atr_factor_trailing * atr_value
-        
+
         # Break-even
         if self.break_even_activo and ganancia >= umbral_break_even:
             # Mover el stop al precio de entrada si aún no lo ha alcanzado
             if (tipo == 'compra' and stop_actual < precio_entrada) or (tipo == 'venta' and stop_actual > precio_entrada):
                 nuevo_stop = precio_entrada
-        
+
         # Trailing stop
         if self.modo_trailing:
             if tipo == 'compra':
@@ -45,15 +62,127 @@ class GestorRiesgoEnOperacion:
                 trailing = precio_actual + trailing_distancia
                 if trailing < nuevo_stop:
                     nuevo_stop = trailing
-        
+
+        return nuevo_stop
+
+    def actualizar_stop(self, precio_entrada, stop_actual, precio_actual, tipo='compra', atr_value=0.0):
+        """
+        Devuelve el nuevo stop loss sugerido según la lógica activa.
+        atr_value: El valor actual del ATR para el par de la operación.
+        tipo: 'compra' o 'venta'
+        """
+        nuevo_stop = self._stop_por_reglas(precio_entrada, stop_actual, precio_actual, tipo, atr_value)
+        return self._aplicar_modelo_ia(nuevo_stop, precio_entrada, stop_actual, precio_actual, tipo)
+
+    def _aplicar_modelo_ia(self, nuevo_stop, precio_entrada, stop_actual, precio_actual, tipo):
         # Lógica de IA (si está implementada)
         if self.modelo_ia:
             sugerencia = self.modelo_ia(precio_entrada, stop_actual, precio_actual, tipo)
             if sugerencia is not None:
                 nuevo_stop = sugerencia
-        
         return nuevo_stop
 
+    # --- GESTIÓN POR LOTES ---
+    def _retornos(self, ticket, tiempo_vela, cierres):
+        """Retornos logarítmicos recientes, recalculados solo cuando cierra una vela nueva."""
+        cacheado = self._cache_retornos.get(ticket)
+        if cacheado is not None and cacheado[0] == tiempo_vela:
+            return cacheado[1]
+        retornos = np.zeros(self.num_retornos)
+        cierres = np.asarray(cierres, dtype=float)[-(self.num_retornos + 1):]
+        if len(cierres) > 1:
+            recientes = np.diff(np.log(cierres))[::-1]  # retorno_1 = el más reciente
+            retornos[:len(recientes)] = recientes
+        self._cache_retornos[ticket] = (tiempo_vela, retornos)
+        return retornos
+
+    def construir_caracteristicas(self, posiciones, ahora=None):
+        """
+        Matriz (posiciones x columnas_caracteristicas) para el modelo por lotes.
+        posiciones: lista de dicts con ticket, precio_entrada, stop_actual, precio_actual, tipo, atr_value,
+                    cierres (cierres recientes), tiempo_vela (de la última vela) y tiempo_apertura (timestamp)
+        """
+        ahora = ahora if ahora is not None else datetime.now().timestamp()
+        X = np.empty((len(posiciones), len(self.columnas_caracteristicas)))
+        for i, p in enumerate(posiciones):
+            X[i, 0] = p['precio_actual']
+            X[i, 1] = p['precio_entrada']
+            X[i, 2] = p['stop_actual']
+            X[i, 3] = p['atr_value']
+            X[i, 4:4 + self.num_retornos] = self._retornos(p['ticket'], p.get('tiempo_vela'), p.get('cierres', ()))
+            X[i, -2] = (ahora - p.get('tiempo_apertura', ahora)) / 60.0
+            X[i, -1] = 1.0 if p['tipo'] == 'compra' else 0.0
+
+        # Olvidar posiciones que ya no están abiertas
+        vigentes = {p['ticket'] for p in posiciones}
+        for ticket in [t for t in self._cache_retornos if t not in vigentes]:
+            del self._cache_retornos[ticket]
+        return X
+
+    def _consultar_modelo_lote(self, X):
+        """Ejecuta el modelo fuera del hilo de trading con plazo estricto. Devuelve None si no responde a tiempo."""
+        if self._tarea_ia is not None and not self._tarea_ia.done():
+            # La consulta anterior sigue en curso: no se encolan más, se usa el stop por reglas
+            self.plazos_incumplidos += 1
+            return None
+        if self._ejecutor_ia is None:
+            self._ejecutor_ia = ThreadPoolExecutor(max_workers=1, thread_name_prefix="modelo_ia")
+
+        self._tarea_ia = self._ejecutor_ia.submit(self.modelo_ia_lote, X)
+        try:
+            stops, cerrar = self._tarea_ia.result(timeout=self.tiempo_limite_ia)
+        except TimeoutError:
+            self.plazos_incumplidos += 1
+            logging.warning("El modelo IA superó el plazo de %ss. Usando el stop por reglas.", self.tiempo_limite_ia)
+            return None
+        except Exception as e:
+            logging.error("Error en el modelo IA por lotes: %s. Usando el stop por reglas.", e)
+            return None
+
+        stops = np.asarray(stops, dtype=float).reshape(-1)
+        cerrar = np.asarray(cerrar, dtype=bool).reshape(-1)
+        if len(stops) != len(X) or len(cerrar) != len(X):
+            logging.error("El modelo IA devolvió un tamaño incorrecto. Usando el stop por reglas.")
+            return None
+        return stops, cerrar
+
+    def actualizar_stops_lote(self, posiciones, ahora=None):
+        """
+        Calcula el stop de todas las posiciones abiertas en una sola pasada.
+        Sin modelo_ia_lote se aplica modelo_ia posición a posición, igual que actualizar_stop.
+        Devuelve una lista de (nuevo_stop, cerrar) en el mismo orden que 'posiciones'.
+        """
+        resultados = [
+            (self._stop_por_reglas(p['precio_entrada'], p['stop_actual'], p['precio_actual'], p['tipo'], p['atr_value']), False)
+            for p in posiciones
+        ]
+        if not posiciones:
+            return resultados
+        if not self.modelo_ia_lote:
+            if self.modelo_ia:
+                resultados = [
+                    (self._aplicar_modelo_ia(stop, p['precio_entrada'], p['stop_actual'], p['precio_actual'], p['tipo']), False)
+                    for p, (stop, _) in zip(posiciones, resultados)
+                ]
+            return resultados
+
+        X = self.construir_caracteristicas(posiciones, ahora)
+        sugerencias = self._consultar_modelo_lote(X)
+        if sugerencias is None:
+            return resultados
+
+        stops, cerrar = sugerencias
+        return [
+            (stop_reglas if np.isnan(stops[i]) else float(stops[i]), bool(cerrar[i]))
+            for i, (stop_reglas, _) in enumerate(resultados)
+        ]
+
+    def cerrar(self):
+        """Libera el hilo del modelo IA sin esperar a una consulta en curso."""
+        if self._ejecutor_ia is not None:
+            self._ejecutor_ia.shutdown(wait=False)
+            self._ejecutor_ia = None
+
 # Ejemplo de uso:
 # gestor = GestorRiesgoEnOperacion(modo_trailing=True, trailing_distancia=15, break_even_activo=True, umbral_break_even=8)
 # stop = gestor.actualizar_stop(precio_entrada=100, stop_actual=95, precio_actual=112, tipo='compra')
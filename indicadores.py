@@ -50,4 +50,63 @@ def calcular_indicadores(datos, atr_period=14, multi_vela_elefante=2.0):
     # Calcular si es una vela elefante
     df = es_vela_elefante(df, multi=multi_vela_elefante)
     
-    return df
\ No newline at end of file
+    return df
+
+# --- CÁLCULO POR LOTES (símbolos x velas) ---
+def _ema_matriz(valores, periodo):
+    """
+    EMA (adjust=False, como calcular_ema) de cada fila de una matriz símbolos x velas.
+    El bucle recorre las velas y opera sobre todos los símbolos a la vez; los NaN iniciales
+    (símbolos con menos velas) se saltan y la EMA arranca en la primera vela válida.
+    """
+    alfa = 2.0 / (periodo + 1.0)
+    ema = np.empty_like(valores)
+    ema[:, 0] = valores[:, 0]
+    for t in range(1, valores.shape[1]):
+        previo = ema[:, t - 1]
+        actual = valores[:, t]
+        nuevo = alfa * actual + (1.0 - alfa) * previo
+        ema[:, t] = np.where(np.isnan(previo), actual, np.where(np.isnan(actual), previo, nuevo))
+    return ema
+
+def matrices_desde_rates(rates_por_simbolo, num_velas=None):
+    """
+    Alinea las velas de varios símbolos por la derecha (la última vela de cada uno en la última columna).
+    rates_por_simbolo: {simbolo: array estructurado de MT5}
+    Devuelve (lista de símbolos, {'time', 'open', 'high', 'low', 'close': matriz símbolos x velas});
+    los huecos de los símbolos con menos velas se rellenan con NaN (time con 0).
+    """
+    simbolos = [s for s, rates in rates_por_simbolo.items() if rates is not None and len(rates) > 0]
+    if num_velas is None:
+        num_velas = max((len(rates_por_simbolo[s]) for s in simbolos), default=0)
+    matrices = {c: np.full((len(simbolos), num_velas), np.nan) for c in ('open', 'high', 'low', 'close')}
+    matrices['time'] = np.zeros((len(simbolos), num_velas), dtype=np.int64)
+    for fila, simbolo in enumerate(simbolos):
+        rates = rates_por_simbolo[simbolo][-num_velas:]
+        for columna, matriz in matrices.items():
+            matriz[fila, num_velas - len(rates):] = rates[columna]
+    return simbolos, matrices
+
+def calcular_indicadores_lote(apertura, alto, bajo, cierre, atr_period=14, multi_vela_elefante=2.0):
+    """
+    Mismos indicadores que calcular_indicadores para todos los símbolos en una sola pasada.
+    Entradas: matrices símbolos x velas alineadas (ver matrices_desde_rates).
+    Devuelve un dict de matrices: close, EMA_9, EMA_20, EMA_200, ATR, es_vela_elefante y velas_validas (por símbolo).
+    """
+    apertura, alto, bajo, cierre = (np.asarray(m, dtype=float) for m in (apertura, alto, bajo, cierre))
+
+    cierre_previo = np.full_like(cierre, np.nan)
+    cierre_previo[:, 1:] = cierre[:, :-1]
+    # np.fmax ignora el NaN del cierre previo inexistente, igual que max(axis=1) en calcular_atr
+    rango = np.fmax(alto - bajo, np.fmax(np.abs(alto - cierre_previo), np.abs(bajo - cierre_previo)))
+    atr = _ema_matriz(rango, atr_period)
+
+    return {
+        'close': cierre,
+        'EMA_9': _ema_matriz(cierre, 9),
+        'EMA_20': _ema_matriz(cierre, 20),
+        'EMA_200': _ema_matriz(cierre, 200),
+        'ATR': atr,
+        'es_vela_elefante': np.abs(cierre - apertura) > atr * multi_vela_elefante,
+        'velas_validas': np.count_nonzero(~np.isnan(cierre), axis=1),
+    }
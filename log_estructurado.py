@@ -0,0 +1,140 @@
+# log_estructurado.py
+# Registro asíncrono y estructurado: cola + hilo escritor, JSON, rotación y resumen por ciclo
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+# Campos estructurados que se pueden pasar en 'extra'
+CAMPOS_ESTRUCTURADOS = ('simbolo', 'estrategia', 'fase', 'latencia_ms')
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos estructurados presentes."""
+    def format(self, record):
+        evento = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'mensaje': record.getMessage(),
+        }
+        for campo in CAMPOS_ESTRUCTURADOS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                evento[campo] = valor
+        if record.exc_info:
+            evento['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+class ManejadorColaPerezoso(QueueHandler):
+    """
+    Encola el registro sin formatearlo: el mensaje (con sus argumentos %) se construye
+    en el hilo escritor, no en el bucle de trading.
+    """
+    def prepare(self, record):
+        return record
+
+class EscritorCola(QueueListener):
+    """QueueListener que lleva su propio estado: stop() se puede llamar más de una vez (p.ej. a mano y en atexit)."""
+    def __init__(self, cola, *manejadores, respect_handler_level=False):
+        super().__init__(cola, *manejadores, respect_handler_level=respect_handler_level)
+        self.activo = False
+
+    def start(self):
+        super().start()
+        self.activo = True
+
+    def stop(self):
+        if not self.activo:
+            return
+        self.activo = False
+        super().stop()  # Vacía la cola antes de terminar el hilo
+
+def configurar_logging(ruta, nivel=logging.INFO, formato_json=True, rotacion="tamano",
+                       max_bytes=10 * 1024 * 1024, backups=5, cuando="midnight"):
+    """
+    Configura el logger raíz con una cola y un hilo escritor en segundo plano.
+    rotacion: "tamano" (max_bytes) o "tiempo" (cuando, p.ej. "midnight")
+    Devuelve el EscritorCola (se detiene automáticamente al salir).
+    """
+    if rotacion == "tiempo":
+        manejador_archivo = TimedRotatingFileHandler(ruta, when=cuando, backupCount=backups, encoding='utf-8')
+    else:
+        manejador_archivo = RotatingFileHandler(ruta, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+
+    if formato_json:
+        manejador_archivo.setFormatter(FormateadorJSON())
+    else:
+        manejador_archivo.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+    cola = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    for manejador in list(raiz.handlers):
+        raiz.removeHandler(manejador)
+    raiz.addHandler(ManejadorColaPerezoso(cola))
+    raiz.setLevel(nivel)
+
+    escritor = EscritorCola(cola, manejador_archivo, respect_handler_level=True)
+    escritor.start()
+    atexit.register(escritor.stop)
+    return escritor
+
+def log_evento(nivel, mensaje, *args, simbolo=None, estrategia=None, fase=None, latencia_ms=None):
+    """Registra un evento con campos estructurados. No construye nada si el nivel está desactivado."""
+    logger = logging.getLogger()
+    if not logger.isEnabledFor(nivel):
+        return
+    logger.log(nivel, mensaje, *args, extra={
+        'simbolo': simbolo, 'estrategia': estrategia, 'fase': fase, 'latencia_ms': latencia_ms
+    })
+
+class ResumenCiclo:
+    """
+    Acumula los mensajes repetitivos de un ciclo (pares sin señal, símbolos descartados por el prefiltro)
+    y los emite en una sola línea.
+    En modo no silencioso cada mensaje se registra individualmente, como antes.
+    """
+    def __init__(self, silencioso=True):
+        self.silencioso = silencioso
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.sin_senal = {}
+        self.descartes = {}
+        self.analisis = 0
+        self.senales = 0
+
+    def registrar_analisis(self, simbolo, estrategia, senal, latencia_ms=None):
+        self.analisis += 1
+        if senal:
+            self.senales += 1
+            return
+        if self.silencioso:
+            self.sin_senal[simbolo] = self.sin_senal.get(simbolo, 0) + 1
+        else:
+            log_evento(logging.INFO, "No se detectó ninguna señal para %s con esta estrategia.", simbolo,
+                       simbolo=simbolo, estrategia=estrategia, fase="senales", latencia_ms=latencia_ms)
+            print(f"❌ No se encontró señal para {simbolo}.")
+
+    def registrar_descarte(self, simbolo, motivo):
+        """Símbolo descartado por el prefiltro antes de pedir velas."""
+        if self.silencioso:
+            self.descartes[simbolo] = motivo
+        else:
+            log_evento(logging.INFO, "%s descartado por el prefiltro: %s", simbolo, motivo,
+                       simbolo=simbolo, fase="prefiltro")
+            print(f"⏭️ {simbolo} descartado: {motivo}.")
+
+    def emitir(self, latencias_fases=None):
+        """Emite la línea de resumen del ciclo y reinicia los contadores."""
+        latencias_fases = latencias_fases or {}
+        if self.silencioso and self.sin_senal:
+            detalle = ", ".join(f"{s}x{n}" if n > 1 else s for s, n in self.sin_senal.items())
+        else:
+            detalle = "-"
+        descartes = ", ".join(f"{s} ({m})" for s, m in self.descartes.items()) or "-"
+        log_evento(logging.INFO, "Ciclo: %d análisis, %d señales, sin señal: %s, descartados: %s | %s",
+                   self.analisis, self.senales, detalle, descartes,
+                   " ".join(f"{fase}={ms:.1f}ms" for fase, ms in latencias_fases.items()),
+                   fase="ciclo", latencia_ms=round(sum(latencias_fases.values()), 3))
+        self.reiniciar()
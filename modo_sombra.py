@@ -0,0 +1,234 @@
+# modo_sombra.py
+# Estrategias en modo sombra: operaciones simuladas con los datos del ciclo real, sin enviar órdenes a MT5
+import os
+import csv
+import time
+import logging
+from datetime import datetime
+from order_calculations import calcular_riesgo_dinamico
+
+OPERACIONES_SOMBRA_CSV = os.path.join(os.path.dirname(__file__), 'operaciones_sombra.csv')
+
+# Mismas columnas que operaciones_trading.csv (el registro se puede analizar con analitica.py)
+COLUMNAS = [
+    'ticket_mt5', 'simbolo', 'estrategia', 'fecha_apertura', 'fecha_cierre', 'tipo', 'precio_apertura',
+    'precio_cierre', 'resultado_dinero', 'resultado_pips', 'stop_loss', 'take_profit', 'lote', 'comentario'
+]
+
+class PosicionSombra:
+    __slots__ = ('ticket', 'simbolo', 'estrategia', 'tipo', 'precio_apertura', 'stop_loss', 'take_profit',
+                 'lote', 'punto', 'valor_tick', 'fecha_apertura', 'vela_revisada', 'maximo_revisado', 'minimo_revisado')
+
+    def __init__(self, ticket, simbolo, estrategia, tipo, precio_apertura, stop_loss, take_profit, lote, punto, valor_tick, fecha_apertura,
+                 vela_revisada=None, maximo_revisado=None, minimo_revisado=None):
+        self.ticket = ticket
+        self.simbolo = simbolo
+        self.estrategia = estrategia
+        self.tipo = tipo
+        self.precio_apertura = precio_apertura
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.lote = lote
+        self.punto = punto
+        self.valor_tick = valor_tick
+        self.fecha_apertura = fecha_apertura  # timestamp
+        # Última vela revisada y sus extremos en ese momento: solo los precios posteriores cuentan para SL/TP
+        self.vela_revisada = vela_revisada
+        self.maximo_revisado = maximo_revisado
+        self.minimo_revisado = minimo_revisado
+
+    def extremos_desde_revision(self, df, precio):
+        """
+        (mínimo, máximo) del precio desde la última revisión y marca la última vela de df como revisada.
+        De la vela revisada solo cuentan los extremos que la superan (se imprimieron después); las
+        velas posteriores, incluidas las que cerraron entre dos ciclos, cuentan enteras. Sin revisión
+        previa se usa la última vela.
+        """
+        tiempos = df.index
+        maximos = df['high'].to_numpy()
+        minimos = df['low'].to_numpy()
+        minimo = maximo = precio
+        if self.vela_revisada is None:
+            minimo, maximo = min(precio, minimos[-1]), max(precio, maximos[-1])
+        else:
+            posteriores = tiempos > self.vela_revisada
+            if posteriores.any():
+                minimo = min(minimo, minimos[posteriores].min())
+                maximo = max(maximo, maximos[posteriores].max())
+            misma_vela = tiempos == self.vela_revisada
+            if misma_vela.any():
+                # La vela revisada siguió formándose: solo un nuevo extremo se imprimió después de la revisión
+                minimo_vela, maximo_vela = minimos[misma_vela][-1], maximos[misma_vela][-1]
+                if minimo_vela < self.minimo_revisado:
+                    minimo = min(minimo, minimo_vela)
+                if maximo_vela > self.maximo_revisado:
+                    maximo = max(maximo, maximo_vela)
+        self.vela_revisada = tiempos[-1]
+        self.maximo_revisado = maximos[-1]
+        self.minimo_revisado = minimos[-1]
+        return minimo, maximo
+
+class CarteraSombra:
+    """
+    Posiciones simuladas de las estrategias con "sombra": True.
+    Entradas al bid/ask de la instantánea del ciclo, stops gestionados con las reglas de
+    GestorRiesgoEnOperacion y cierres por SL/TP escritos en un CSV propio. Nunca llama a order_send.
+    Las posiciones abiertas solo viven en memoria: al reiniciar el agente se descartan.
+    """
+    def __init__(self, gestor_riesgo_op, ruta_csv=OPERACIONES_SOMBRA_CSV, capital=10000, riesgo_porcentaje=1.0,
+                 min_lote=0.01, max_lote=0.1):
+        """
+        gestor_riesgo_op: instancia propia de GestorRiesgoEnOperacion con la misma configuración que la real
+                          (no compartirla: su caché de retornos se poda con las posiciones de cada lote)
+        ruta_csv: registro de las operaciones simuladas cerradas
+        capital, riesgo_porcentaje, min_lote, max_lote: cálculo del lote igual que en las órdenes reales
+        """
+        self.gestor_riesgo_op = gestor_riesgo_op
+        self.ruta_csv = ruta_csv
+        self.capital = capital
+        self.riesgo_porcentaje = riesgo_porcentaje
+        self.min_lote = min_lote
+        self.max_lote = max_lote
+
+        self.posiciones = {}      # (estrategia, simbolo) -> PosicionSombra
+        self._nuevas = set()      # Abiertas desde la última gestión (su vela actual incluye precios anteriores a la entrada)
+        self.cerradas = 0
+        self.resultados = {}      # estrategia -> P&L acumulado de las cerradas
+        # Tickets negativos: nunca coinciden con los de MT5 en la caché del gestor de riesgo
+        self._siguiente_ticket = -int(time.time())
+
+    def abierta(self, estrategia, simbolo):
+        return (estrategia, simbolo) in self.posiciones
+
+    def abrir(self, estrategia, simbolo, senal, df, instantanea):
+        """Simula la entrada de una señal. Una posición como máximo por estrategia y símbolo."""
+        if instantanea is None or self.abierta(estrategia, simbolo):
+            return None
+        es_compra = senal == "compra"
+        precio = instantanea.ask if es_compra else instantanea.bid
+        stop_loss, take_profit = calcular_riesgo_dinamico(df, senal)
+        # El broker rechazaría niveles del lado equivocado del precio de entrada
+        if (es_compra and not stop_loss < precio < take_profit) or (not es_compra and not take_profit < precio < stop_loss):
+            logging.warning("[SOMBRA] %s: SL/TP no válidos para %s en %s a %s. Señal descartada.", estrategia, senal, simbolo, precio)
+            return None
+
+        distancia_puntos = abs(precio - stop_loss) / instantanea.punto
+        lote = self.min_lote
+        if distancia_puntos > 0 and instantanea.valor_tick > 0:
+            lote = self.capital * (self.riesgo_porcentaje / 100) / (distancia_puntos * instantanea.valor_tick)
+        lote = round(max(self.min_lote, min(lote, self.max_lote)), 2)
+
+        posicion = PosicionSombra(
+            ticket=self._siguiente_ticket,
+            simbolo=simbolo,
+            estrategia=estrategia,
+            tipo='compra' if es_compra else 'venta',
+            precio_apertura=precio,
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+            lote=lote,
+            punto=instantanea.punto,
+            valor_tick=instantanea.valor_tick,
+            fecha_apertura=time.time(),
+            # La vela actual incluye precios anteriores a la entrada
+            vela_revisada=df.index[-1],
+            maximo_revisado=df['high'].iloc[-1],
+            minimo_revisado=df['low'].iloc[-1]
+        )
+        self._siguiente_ticket -= 1
+        self.posiciones[(estrategia, simbolo)] = posicion
+        self._nuevas.add((estrategia, simbolo))
+        logging.info("[SOMBRA] %s abre %s en %s a %s | SL: %s | TP: %s", estrategia, posicion.tipo, simbolo, precio, stop_loss, take_profit)
+        return posicion
+
+    def gestionar(self, instantaneas, indicadores):
+        """
+        Cierra por SL/TP y actualiza los stops de las posiciones simuladas.
+        instantaneas: {simbolo: InstantaneaSimbolo} del ciclo
+        indicadores: {simbolo: DataFrame de calcular_indicadores} ya calculados en el ciclo; los máximos y
+                     mínimos posteriores a la última revisión detectan los toques entre dos ciclos. Los
+                     símbolos sin DataFrame en este ciclo solo se comprueban con el precio de la instantánea.
+        """
+        posiciones = []
+        abiertas = []
+        nuevas, self._nuevas = self._nuevas, set()
+        for clave, posicion in list(self.posiciones.items()):
+            instantanea = instantaneas.get(posicion.simbolo)
+            if instantanea is None or clave in nuevas:
+                continue
+            df = indicadores.get(posicion.simbolo)
+            es_compra = posicion.tipo == 'compra'
+            precio = instantanea.bid if es_compra else instantanea.ask
+            minimo, maximo = posicion.extremos_desde_revision(df, precio) if df is not None else (precio, precio)
+
+            # Si en la misma vela se tocan el SL y el TP se asume el SL (peor caso)
+            if es_compra and minimo <= posicion.stop_loss or not es_compra and maximo >= posicion.stop_loss:
+                self._cerrar(clave, posicion.stop_loss, "sombra: stop loss")
+                continue
+            if es_compra and maximo >= posicion.take_profit or not es_compra and minimo <= posicion.take_profit:
+                self._cerrar(clave, posicion.take_profit, "sombra: take profit")
+                continue
+
+            if df is None:
+                continue
+            posiciones.append({
+                'ticket': posicion.ticket,
+                'precio_entrada': posicion.precio_apertura,
+                'stop_actual': posicion.stop_loss,
+                'precio_actual': precio,
+                'tipo': posicion.tipo,
+                'atr_value': df['ATR'].iloc[-1],
+                'cierres': df['close'].to_numpy(),
+                'tiempo_vela': df.index[-1],
+                'tiempo_apertura': posicion.fecha_apertura,
+            })
+            abiertas.append((clave, posicion, precio))
+
+        if not posiciones:
+            return
+        for (clave, posicion, precio), (nuevo_stop, cerrar) in zip(abiertas, self.gestor_riesgo_op.actualizar_stops_lote(posiciones)):
+            if cerrar:
+                self._cerrar(clave, precio, "sombra: cierre sugerido por IA")
+            else:
+                posicion.stop_loss = nuevo_stop
+
+    def _cerrar(self, clave, precio_cierre, comentario):
+        posicion = self.posiciones.pop(clave)
+        diferencia = precio_cierre - posicion.precio_apertura
+        if posicion.tipo == 'venta':
+            diferencia = -diferencia
+        resultado_pips = diferencia / posicion.punto
+        resultado_dinero = resultado_pips * posicion.valor_tick * posicion.lote
+
+        operacion_cerrada = {
+            'ticket_mt5': posicion.ticket,
+            'simbolo': posicion.simbolo,
+            'estrategia': posicion.estrategia,
+            'fecha_apertura': datetime.fromtimestamp(posicion.fecha_apertura).strftime('%Y-%m-%d %H:%M:%S'),
+            'fecha_cierre': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'tipo': posicion.tipo,
+            'precio_apertura': posicion.precio_apertura,
+            'precio_cierre': precio_cierre,
+            'resultado_dinero': resultado_dinero,
+            'resultado_pips': resultado_pips,
+            'stop_loss': posicion.stop_loss,
+            'take_profit': posicion.take_profit,
+            'lote': posicion.lote,
+            'comentario': comentario
+        }
+        with open(self.ruta_csv, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNAS)
+            if f.tell() == 0:
+                writer.writeheader()
+            writer.writerow(operacion_cerrada)
+
+        self.cerradas += 1
+        self.resultados[posicion.estrategia] = self.resultados.get(posicion.estrategia, 0.0) + resultado_dinero
+        logging.info("[SOMBRA] %s cierra %s en %s (%s): %.2f", posicion.estrategia, posicion.tipo, posicion.simbolo, comentario, resultado_dinero)
+
+    def resumen(self):
+        return {
+            'abiertas': len(self.posiciones),
+            'cerradas': self.cerradas,
+            'resultado_por_estrategia': dict(self.resultados),
+        }
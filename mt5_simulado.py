@@ -0,0 +1,182 @@
+# mt5_simulado.py
+# Terminal MetaTrader5 simulado para las pruebas: implementa la parte de la API que usa el agente
+# (símbolos, ticks, órdenes a mercado, posiciones con "magic" y deals de cierre).
+# conftest.py lo instala como módulo 'MetaTrader5' cuando el paquete real no está disponible.
+import time
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_H1 = 16385
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TIME_GTC = 0
+ORDER_FILLING_IOC = 1
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_SLTP = 6
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_PRICE_OFF = 10021
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_ENTRY_OUT_BY = 3
+SYMBOL_TRADE_MODE_DISABLED = 0
+SYMBOL_TRADE_MODE_LONGONLY = 1
+SYMBOL_TRADE_MODE_SHORTONLY = 2
+SYMBOL_TRADE_MODE_CLOSEONLY = 3
+SYMBOL_TRADE_MODE_FULL = 4
+COPY_TICKS_ALL = -1
+
+_simbolos = {}
+_ticks = {}
+_historial_ticks = {}
+_posiciones = {}
+_deals = []
+_ordenes_enviadas = []
+_siguiente_ticket = 1000
+
+def reiniciar():
+    """Vacía el terminal: símbolos, historial de ticks, posiciones, deals y órdenes enviadas."""
+    global _siguiente_ticket
+    _simbolos.clear()
+    _ticks.clear()
+    _historial_ticks.clear()
+    _posiciones.clear()
+    _deals.clear()
+    _ordenes_enviadas.clear()
+    _siguiente_ticket = 1000
+
+def _nuevo_ticket():
+    global _siguiente_ticket
+    _siguiente_ticket += 1
+    return _siguiente_ticket
+
+def definir_simbolo(simbolo, bid, ask, point=0.00001, tiempo=None, **campos):
+    """Da de alta (o actualiza) un símbolo con su último tick."""
+    tiempo = int(time.time()) if tiempo is None else tiempo
+    info = dict(name=simbolo, point=point, digits=5, visible=True, trade_mode=SYMBOL_TRADE_MODE_FULL,
+                volume_min=0.01, volume_max=100.0, volume_step=0.01, trade_tick_value_profit=1.0,
+                trade_stops_level=0, bid=bid, ask=ask, spread=round((ask - bid) / point), time=tiempo)
+    info.update(campos)
+    _simbolos[simbolo] = SimpleNamespace(**info)
+    _ticks[simbolo] = SimpleNamespace(time=tiempo, time_msc=tiempo * 1000, bid=bid, ask=ask, last=0.0, volume=0)
+
+def cerrar_posicion(ticket, precio, tiempo=None):
+    """Cierra una posición abierta generando su deal de salida."""
+    posicion = _posiciones.pop(ticket)
+    _deals.append(SimpleNamespace(
+        ticket=_nuevo_ticket(), position_id=ticket, symbol=posicion.symbol, entry=DEAL_ENTRY_OUT,
+        type=DEAL_TYPE_SELL if posicion.type == ORDER_TYPE_BUY else DEAL_TYPE_BUY,
+        price=precio, volume=posicion.volume, magic=posicion.magic, comment=posicion.comment,
+        time=int(time.time()) if tiempo is None else tiempo, profit=0.0
+    ))
+
+# Ticks históricos con el dtype de copy_ticks_from/copy_ticks_range
+DTYPE_TICK = np.dtype([('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+                       ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')])
+
+def definir_ticks(simbolo, time_msc, bid, ask, flags=6):
+    """Añade ticks al historial del símbolo (time_msc ordenado, en milisegundos)."""
+    nuevos = np.zeros(len(time_msc), dtype=DTYPE_TICK)
+    nuevos['time_msc'] = time_msc
+    nuevos['time'] = nuevos['time_msc'] // 1000
+    nuevos['bid'] = bid
+    nuevos['ask'] = ask
+    nuevos['flags'] = flags
+    previos = _historial_ticks.get(simbolo)
+    _historial_ticks[simbolo] = nuevos if previos is None else np.concatenate([previos, nuevos])
+
+def _msc(fecha):
+    return int(fecha.timestamp() * 1000) if isinstance(fecha, datetime) else int(fecha) * 1000
+
+def ordenes_enviadas():
+    return list(_ordenes_enviadas)
+
+# --- API de MetaTrader5 ---
+def initialize(*args, **kwargs):
+    return True
+
+def shutdown():
+    pass
+
+def last_error():
+    return (1, 'Success')
+
+def account_info():
+    return SimpleNamespace(balance=10000.0, equity=10000.0, currency='USD')
+
+def symbol_info(simbolo):
+    return _simbolos.get(simbolo)
+
+def symbol_select(simbolo, habilitar=True):
+    return simbolo in _simbolos
+
+def symbol_info_tick(simbolo):
+    return _ticks.get(simbolo)
+
+def positions_total():
+    return len(_posiciones)
+
+def positions_get(symbol=None, ticket=None):
+    # Como el terminal real, devuelve copias: no reflejan cambios posteriores a la consulta
+    posiciones = [SimpleNamespace(**vars(p)) for p in _posiciones.values()]
+    if symbol is not None:
+        posiciones = [p for p in posiciones if p.symbol == symbol]
+    if ticket is not None:
+        posiciones = [p for p in posiciones if p.ticket == ticket]
+    return tuple(posiciones)
+
+def history_deals_get(desde=None, hasta=None):
+    return tuple(_deals)
+
+def order_send(request):
+    _ordenes_enviadas.append(dict(request))
+    if request["action"] == TRADE_ACTION_SLTP:
+        posicion = _posiciones.get(request["position"])
+        if posicion is None:
+            return SimpleNamespace(retcode=10013, order=0, deal=0, price=0.0, volume=0.0, comment='Invalid request')
+        posicion.sl = request.get("sl", posicion.sl)
+        posicion.tp = request.get("tp", posicion.tp)
+        return SimpleNamespace(retcode=TRADE_RETCODE_DONE, order=0, deal=0, price=0.0, volume=0.0, comment='Request executed')
+
+    tick = _ticks[request["symbol"]]
+    precio = tick.ask if request["type"] == ORDER_TYPE_BUY else tick.bid
+    if "position" in request:  # Orden de cierre de una posición existente
+        cerrar_posicion(request["position"], precio)
+        return SimpleNamespace(retcode=TRADE_RETCODE_DONE, order=_nuevo_ticket(), deal=_nuevo_ticket(), price=precio,
+                               volume=request["volume"], comment='Request executed', bid=tick.bid, ask=tick.ask)
+    ticket = _nuevo_ticket()
+    _posiciones[ticket] = SimpleNamespace(
+        ticket=ticket, identifier=ticket, symbol=request["symbol"], type=request["type"], volume=request["volume"],
+        price_open=precio, price_current=precio, sl=request.get("sl", 0.0), tp=request.get("tp", 0.0),
+        magic=request.get("magic", 0), comment=request.get("comment", ''), profit=0.0, time=tick.time
+    )
+    return SimpleNamespace(retcode=TRADE_RETCODE_DONE, order=ticket, deal=_nuevo_ticket(), price=precio,
+                           volume=request["volume"], comment='Request executed', bid=tick.bid, ask=tick.ask)
+
+def copy_rates_from_pos(simbolo, marco, inicio, cantidad):
+    return None
+
+def copy_rates_from(simbolo, marco, desde, cantidad):
+    return None
+
+def copy_ticks_from(simbolo, desde, cantidad, flags):
+    ticks = _historial_ticks.get(simbolo)
+    if ticks is None:
+        return None
+    inicio = np.searchsorted(ticks['time_msc'], _msc(desde), side='left')
+    return ticks[inicio:inicio + cantidad].copy()
+
+def copy_ticks_range(simbolo, desde, hasta, flags):
+    ticks = _historial_ticks.get(simbolo)
+    if ticks is None:
+        return None
+    inicio = np.searchsorted(ticks['time_msc'], _msc(desde), side='left')
+    fin = np.searchsorted(ticks['time_msc'], _msc(hasta), side='right')
+    return ticks[inicio:fin].copy()
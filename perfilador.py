@@ -0,0 +1,205 @@
+# perfilador.py
+# Perfilador por muestreo activable en caliente (señal SIGUSR1 o archivo de control) para el bucle de trading
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+class PerfiladorMuestreo:
+    def __init__(self, directorio, archivo_control=None, frecuencia_hz=100, ciclos=3, memoria=True, prefijo="perfil"):
+        """
+        directorio: carpeta de salida de los perfiles
+        archivo_control: si aparece este archivo se perfila; su contenido opcional es el número de ciclos
+        frecuencia_hz: muestras de la pila por segundo mientras un ciclo está en curso
+        ciclos: número de ciclos perfilados por activación
+        memoria: captura además una instantánea de tracemalloc por ciclo
+        prefijo: inicio del nombre de los archivos generados (p.ej. con el nombre del trabajador)
+        """
+        self.directorio = directorio
+        self.archivo_control = archivo_control
+        self.intervalo = 1.0 / frecuencia_hz
+        self.ciclos = ciclos
+        self.memoria = memoria
+        self.prefijo = prefijo
+
+        self._hilo_objetivo = threading.get_ident()  # Se crea desde el hilo del bucle de trading
+        self._solicitud = None        # Ciclos pedidos (lo escribe el manejador de la señal)
+        self._restantes = 0
+        self._en_ciclo = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._pilas = Counter()
+        self._muestras = 0
+        self._memoria_ciclos = []
+        self._instantanea_previa = None
+        self._inicio_tracemalloc = False
+        self._activaciones = 0
+
+    # --- ACTIVACIÓN ---
+    def solicitar(self, ciclos=None):
+        """Pide perfilar los próximos ciclos. Solo marca la petición: es seguro llamarlo desde una señal."""
+        self._solicitud = ciclos or self.ciclos
+
+    def instalar_senal(self):
+        """Activa el perfilado con SIGUSR1 donde exista (no en Windows: usar el archivo de control)."""
+        if not hasattr(signal, 'SIGUSR1'):
+            return False
+        signal.signal(signal.SIGUSR1, lambda numero, marco: self.solicitar())
+        return True
+
+    def activo(self):
+        return self._restantes > 0
+
+    def _revisar_control(self):
+        if not self.archivo_control or not os.path.exists(self.archivo_control):
+            return
+        try:
+            with open(self.archivo_control, 'r', encoding='utf-8') as f:
+                contenido = f.read().strip()
+            os.remove(self.archivo_control)
+            self.solicitar(int(contenido) if contenido.isdigit() else None)
+        except OSError as e:
+            logging.error("No se pudo leer el archivo de control del perfilador: %s", e)
+
+    # --- CICLO ---
+    def inicio_ciclo(self):
+        """Llamar al empezar cada ciclo. Sin petición pendiente solo cuesta comprobar si existe el archivo de control."""
+        if self._en_ciclo.is_set():
+            self.fin_ciclo()
+        self._revisar_control()
+        if self._solicitud and not self.activo():
+            self._arrancar(self._solicitud)
+        self._solicitud = None
+        if self.activo():
+            if self._inicio_tracemalloc:
+                # La instantánea del ciclo solo contiene lo asignado en él que sigue vivo: su coste no crece con el proceso
+                tracemalloc.clear_traces()
+            self._en_ciclo.set()
+
+    def fin_ciclo(self):
+        """
+        Llamar al terminar el trabajo del ciclo (antes de dormir), también en las salidas anticipadas:
+        el muestreo se pausa durante la espera. Una segunda llamada en el mismo ciclo no hace nada.
+        """
+        if not self.activo() or not self._en_ciclo.is_set():
+            return
+        self._en_ciclo.clear()
+        if self.memoria:
+            self._capturar_memoria()
+        self._restantes -= 1
+        if self._restantes == 0:
+            self._terminar()
+
+    # --- MUESTREO ---
+    def _arrancar(self, ciclos):
+        logging.info("Perfilador activado durante %d ciclos (%.0f Hz).", ciclos, 1.0 / self.intervalo)
+        self._restantes = ciclos
+        self._activaciones += 1
+        self._pilas = Counter()
+        self._muestras = 0
+        self._memoria_ciclos = []
+        if self.memoria:
+            self._inicio_tracemalloc = not tracemalloc.is_tracing()
+            if self._inicio_tracemalloc:
+                tracemalloc.start()
+            else:
+                # Otro componente ya traza: no se borran sus trazas, se compara con la instantánea anterior
+                self._instantanea_previa = tracemalloc.take_snapshot()
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._muestrear, name='perfilador', daemon=True)
+        self._hilo.start()
+
+    def _muestrear(self):
+        while not self._detener.is_set():
+            if not self._en_ciclo.wait(0.5):
+                continue
+            marco = sys._current_frames().get(self._hilo_objetivo)
+            if marco is not None:
+                pila = []
+                while marco is not None:
+                    codigo = marco.f_code
+                    pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                    marco = marco.f_back
+                self._pilas[tuple(reversed(pila))] += 1
+                self._muestras += 1
+            time.sleep(self.intervalo)
+
+    def _capturar_memoria(self):
+        actual, pico = tracemalloc.get_traced_memory()
+        instantanea = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, threading.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        if self._instantanea_previa is None:
+            estadisticas = instantanea.statistics('lineno')[:15]
+        else:
+            estadisticas = instantanea.compare_to(self._instantanea_previa, 'lineno')[:15]
+            self._instantanea_previa = instantanea
+        self._memoria_ciclos.append((actual, pico, estadisticas))
+        tracemalloc.reset_peak()
+
+    def _terminar(self):
+        self._detener.set()
+        self._hilo.join(timeout=2)
+        if self.memoria and self._inicio_tracemalloc:
+            tracemalloc.stop()
+        self._instantanea_previa = None
+        try:
+            rutas = self.escribir()
+            logging.info("Perfil escrito: %s", ", ".join(rutas))
+            print(f"🔬 Perfil escrito en {self.directorio}")
+        except OSError as e:
+            logging.error("No se pudo escribir el perfil: %s", e)
+
+    # --- SALIDA ---
+    def resumen_funciones(self, limite=25):
+        """[(funcion, muestras propias, muestras inclusivas)] ordenado por muestras propias."""
+        propias = Counter()
+        inclusivas = Counter()
+        for pila, n in self._pilas.items():
+            propias[pila[-1]] += n
+            for funcion in set(pila):
+                inclusivas[funcion] += n
+        return [(f, n, inclusivas[f]) for f, n in propias.most_common(limite)]
+
+    def escribir(self):
+        """Escribe las pilas colapsadas (formato de flamegraph.pl / speedscope), el resumen y la memoria."""
+        os.makedirs(self.directorio, exist_ok=True)
+        base = os.path.join(self.directorio, f"{self.prefijo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self._activaciones}")
+        rutas = [base + '.folded', base + '_resumen.txt']
+
+        with open(rutas[0], 'w', encoding='utf-8') as f:
+            for pila, n in self._pilas.most_common():
+                f.write(f"{';'.join(pila)} {n}\n")
+
+        total = max(self._muestras, 1)
+        with open(rutas[1], 'w', encoding='utf-8') as f:
+            f.write(f"Muestras: {self._muestras} ({1.0 / self.intervalo:.0f} Hz)\n\n")
+            f.write(f"{'propias':>8} {'%':>6} {'inclusivas':>10} {'%':>6}  función\n")
+            for funcion, propias, inclusivas in self.resumen_funciones():
+                f.write(f"{propias:>8} {100 * propias / total:>6.1f} {inclusivas:>10} {100 * inclusivas / total:>6.1f}  {funcion}\n")
+
+        if self._memoria_ciclos:
+            rutas.append(base + '_memoria.txt')
+            with open(rutas[2], 'w', encoding='utf-8') as f:
+                for numero, (actual, pico, estadisticas) in enumerate(self._memoria_ciclos, 1):
+                    f.write(f"--- Ciclo {numero}: retenido {actual / 1024:.1f} KiB, pico {pico / 1024:.1f} KiB ---\n")
+                    for estadistica in estadisticas:
+                        f.write(f"{estadistica}\n")
+                    f.write("\n")
+        return rutas
+
+# Ejemplo de uso:
+# perfilador = PerfiladorMuestreo("perfiles", archivo_control="perfilar.ctl")
+# perfilador.instalar_senal()           # kill -USR1 <pid>  |  echo 5 > perfilar.ctl
+# while True:
+#     perfilador.inicio_ciclo()
+#     ...                                # trabajo del ciclo
+#     perfilador.fin_ciclo()
+#     time.sleep(60)
@@ -0,0 +1,92 @@
+# planificador.py
+# Planificador del ciclo con presupuesto de tiempo: la gestión de posiciones va primero y
+# el análisis de señales se ordena por prioridad y continúa en el ciclo siguiente si no hay tiempo
+import time
+import logging
+
+class PlanificadorCiclo:
+    def __init__(self, presupuesto_segundos=45, intervalo_segundos=60):
+        """
+        presupuesto_segundos: tiempo máximo de trabajo por ciclo
+        intervalo_segundos: periodo entre inicios de ciclo
+        """
+        self.presupuesto = presupuesto_segundos
+        self.intervalo = intervalo_segundos
+
+        self.numero_ciclo = 0
+        self.inicio = None
+        self.duracion_ultimo = 0.0
+        self.excesos = 0              # Ciclos que superaron el presupuesto
+        self.aplazadas_ultimo = 0     # Tareas de señales que no cupieron en el último ciclo
+        self.aplazadas_total = 0
+        self._ultima_ejecucion = {}   # clave de la tarea -> timestamp de su último análisis
+        self._claves_ciclo = ()
+        self._finalizado = False
+
+    def iniciar_ciclo(self):
+        self.numero_ciclo += 1
+        self.inicio = time.monotonic()
+        self.aplazadas_ultimo = 0
+        self._finalizado = False
+
+    def transcurrido(self):
+        return time.monotonic() - self.inicio
+
+    def restante(self):
+        return self.presupuesto - self.transcurrido()
+
+    def ejecutar(self, tareas, clave, prioridad):
+        """
+        Itera las tareas de mayor a menor urgencia hasta agotar el presupuesto.
+        Orden: mayor prioridad primero y, a igual prioridad, la que lleva más tiempo sin ejecutarse,
+        de modo que las tareas aplazadas en un ciclo son las primeras del siguiente.
+        clave(tarea) -> (estrategia, simbolo); prioridad(tarea) -> número (mayor = antes)
+        """
+        ordenadas = sorted(tareas, key=lambda t: (-prioridad(t), self._ultima_ejecucion.get(clave(t), 0.0)))
+        self._claves_ciclo = [clave(t) for t in ordenadas]
+        for indice, tarea in enumerate(ordenadas):
+            if self.restante() <= 0:
+                self.aplazadas_ultimo = len(ordenadas) - indice
+                self.aplazadas_total += self.aplazadas_ultimo
+                logging.warning("Presupuesto del ciclo agotado: %d análisis aplazados al siguiente ciclo.", self.aplazadas_ultimo)
+                return
+            yield tarea
+            self._ultima_ejecucion[clave(tarea)] = time.time()
+
+    def finalizar_ciclo(self):
+        """
+        Registra la duración del ciclo y devuelve los segundos a esperar hasta el siguiente.
+        Si el ciclo ya se había cerrado (un error tras el cierre normal) solo devuelve la espera restante.
+        """
+        if self._finalizado:
+            return max(self.intervalo - self.transcurrido(), 0.0)
+        self._finalizado = True
+        self.duracion_ultimo = self.transcurrido()
+        if self.duracion_ultimo > self.presupuesto:
+            self.excesos += 1
+            logging.warning("El ciclo %d duró %.1f s (presupuesto: %s s).", self.numero_ciclo, self.duracion_ultimo, self.presupuesto)
+        return max(self.intervalo - self.duracion_ultimo, 0.0)
+
+    def retraso_por_simbolo(self):
+        """
+        Segundos desde el análisis más antiguo de cada símbolo entre las tareas del último ciclo
+        (None si alguna de sus tareas aún no se ha ejecutado nunca).
+        """
+        ahora = time.time()
+        ultimas = {}
+        for clave in self._claves_ciclo:
+            simbolo = clave[1]
+            ultima = self._ultima_ejecucion.get(clave, 0.0)
+            ultimas[simbolo] = min(ultimas.get(simbolo, ultima), ultima)
+        return {simbolo: round(ahora - ultima, 1) if ultima else None for simbolo, ultima in ultimas.items()}
+
+    def metricas(self):
+        return {
+            'ciclos': self.numero_ciclo,
+            'presupuesto_s': self.presupuesto,
+            'duracion_ultimo_s': round(self.duracion_ultimo, 3),
+            'excesos': self.excesos,
+            'aplazadas_ultimo': self.aplazadas_ultimo,
+            'aplazadas_total': self.aplazadas_total,
+            'retraso_por_simbolo_s': self.retraso_por_simbolo(),
+        }
@@ -0,0 +1,92 @@
+# prefiltro.py
+# Instantánea de mercado al inicio de cada ciclo para descartar pronto los símbolos no operables
+import time
+import MetaTrader5 as mt5
+
+# Modos de negociación que no permiten abrir posiciones nuevas
+MODOS_NO_OPERABLES = (mt5.SYMBOL_TRADE_MODE_DISABLED, mt5.SYMBOL_TRADE_MODE_CLOSEONLY)
+MAX_DESFASE_SERVIDOR_SEG = 14 * 3600  # Husos horarios posibles; una diferencia mayor es una cotización antigua
+
+class InstantaneaSimbolo:
+    """Cotización y estado de negociación de un símbolo en el instante de la instantánea."""
+    __slots__ = ('simbolo', 'tiempo', 'bid', 'ask', 'spread_puntos', 'punto', 'trade_mode', 'valor_tick')
+
+    def __init__(self, simbolo, tiempo, bid, ask, spread_puntos, punto, trade_mode, valor_tick=0.0):
+        self.simbolo = simbolo
+        self.tiempo = tiempo
+        self.bid = bid
+        self.ask = ask
+        self.spread_puntos = spread_puntos
+        self.punto = punto
+        self.trade_mode = trade_mode
+        self.valor_tick = valor_tick  # Valor de un punto por lote en la moneda de la cuenta
+
+def tomar_instantanea(simbolos):
+    """
+    Una sola llamada a symbol_info por símbolo (incluye bid, ask, spread, hora de la última
+    cotización y modo de negociación). Devuelve {simbolo: InstantaneaSimbolo o None}.
+    """
+    instantaneas = {}
+    for simbolo in simbolos:
+        info = mt5.symbol_info(simbolo)
+        if info is None:
+            instantaneas[simbolo] = None
+            continue
+        instantaneas[simbolo] = InstantaneaSimbolo(
+            simbolo=simbolo,
+            tiempo=info.time,
+            bid=info.bid,
+            ask=info.ask,
+            spread_puntos=info.spread,
+            punto=info.point,
+            trade_mode=info.trade_mode,
+            valor_tick=info.trade_tick_value_profit
+        )
+    return instantaneas
+
+def medir_desfase_servidor(simbolos, ahora=None):
+    """
+    Desfase de la hora del servidor respecto a UTC a partir de la cotización más reciente de los símbolos,
+    redondeado a la hora (los brokers usan husos horarios enteros y la cotización puede tener unos minutos).
+    ahora: timestamp UTC de referencia (por defecto, time.time())
+    Devuelve None sin cotizaciones o si la más reciente es de hace horas (mercado cerrado).
+    """
+    tiempos = [tick.time for tick in map(mt5.symbol_info_tick, simbolos) if tick is not None and tick.time]
+    if not tiempos:
+        return None
+    desfase = round((max(tiempos) - (time.time() if ahora is None else ahora)) / 3600) * 3600
+    return desfase if abs(desfase) <= MAX_DESFASE_SERVIDOR_SEG else None
+
+def filtrar_operables(instantaneas, max_spread_puntos, max_antiguedad_segundos, spread_por_simbolo=None,
+                      desfase_servidor_segundos=0, ahora=None):
+    """
+    Separa los símbolos operables de los descartados.
+    La antigüedad de cada cotización se mide respecto a la hora actual llevada a la hora del servidor
+    (MT5 da la hora de la cotización en la hora del broker): así también se detecta un único símbolo
+    parado o que todos lo estén a la vez.
+    desfase_servidor_segundos: hora del servidor del broker menos UTC; None si aún no se conoce, y entonces
+                               no se descarta por antigüedad
+    ahora: timestamp UTC de referencia (por defecto, time.time())
+    Devuelve (set de símbolos operables, {simbolo: motivo del descarte}).
+    """
+    spread_por_simbolo = spread_por_simbolo or {}
+    referencia = None
+    if desfase_servidor_segundos is not None:
+        referencia = (time.time() if ahora is None else ahora) + desfase_servidor_segundos
+
+    operables = set()
+    descartes = {}
+    for simbolo, instantanea in instantaneas.items():
+        if instantanea is None:
+            descartes[simbolo] = "sin información del símbolo"
+        elif instantanea.trade_mode in MODOS_NO_OPERABLES:
+            descartes[simbolo] = f"modo de negociación {instantanea.trade_mode}"
+        elif not instantanea.bid or not instantanea.ask:
+            descartes[simbolo] = "sin cotización"
+        elif instantanea.spread_puntos > spread_por_simbolo.get(simbolo, max_spread_puntos):
+            descartes[simbolo] = f"spread {instantanea.spread_puntos} puntos"
+        elif referencia is not None and referencia - instantanea.tiempo > max_antiguedad_segundos:
+            descartes[simbolo] = f"cotización sin actualizar hace {referencia - instantanea.tiempo:.0f} s"
+        else:
+            operables.add(simbolo)
+    return operables, descartes
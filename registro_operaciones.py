@@ -2,29 +2,137 @@
 import os
 import MetaTrader5 as mt5
 import csv
+import logging
 from datetime import datetime, timedelta
 
 # Ruta del archivo CSV de operaciones
 OPERACIONES_CSV = os.path.join(os.path.dirname(__file__), 'operaciones_trading.csv')
 
-# Diccionario global para mapear tickets de órdenes abiertas a su información
+# Tiempo que una orden puede seguir en la tabla sin posición abierta antes de descartarse
+GRACIA_RECONCILIACION_SEGUNDOS = 3600
+INTERVALO_RECONCILIACION_SEGUNDOS = 300
+
+class OrdenAbierta:
+    """Información de una operación abierta por el agente."""
+    __slots__ = ('ticket', 'posicion', 'simbolo', 'estrategia', 'lote', 'tipo', 'precio_apertura',
+                 'stop_loss', 'take_profit', 'fecha_apertura', 'ultima_vez_abierta')
+
+    def __init__(self, ticket, posicion, simbolo, estrategia, lote, tipo, precio_apertura, stop_loss, take_profit, fecha_apertura):
+        self.ticket = ticket
+        self.posicion = posicion
+        self.simbolo = simbolo
+        self.estrategia = estrategia
+        self.lote = lote
+        self.tipo = tipo  # 'compra' o 'venta'
+        self.precio_apertura = precio_apertura
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.fecha_apertura = fecha_apertura  # timestamp
+        self.ultima_vez_abierta = fecha_apertura
+
+class TablaOrdenesAbiertas:
+    """
+    Tabla de órdenes abiertas indexada por ticket, posición, símbolo y estrategia.
+    Se reconcilia periódicamente con positions_get() para que no crezca sin límite.
+    """
+    def __init__(self, gracia_segundos=GRACIA_RECONCILIACION_SEGUNDOS, intervalo_reconciliacion=INTERVALO_RECONCILIACION_SEGUNDOS):
+        self.gracia_segundos = gracia_segundos
+        self.intervalo_reconciliacion = intervalo_reconciliacion
+        self._por_ticket = {}
+        self._por_posicion = {}
+        self._por_simbolo = {}
+        self._por_estrategia = {}
+        self._ultima_reconciliacion = 0.0
+
+    def agregar(self, orden):
+        if orden.ticket in self._por_ticket:
+            self.eliminar(orden.ticket)
+        self._por_ticket[orden.ticket] = orden
+        self._por_posicion[orden.posicion] = orden
+        self._por_simbolo.setdefault(orden.simbolo, set()).add(orden.ticket)
+        self._por_estrategia.setdefault(orden.estrategia, set()).add(orden.ticket)
+
+    def eliminar(self, ticket):
+        orden = self._por_ticket.pop(ticket, None)
+        if orden is None:
+            return None
+        # La posición puede haberse reasignado a otra orden: solo se borra la entrada que apunta a esta
+        if self._por_posicion.get(orden.posicion) is orden:
+            del self._por_posicion[orden.posicion]
+        for indice, clave in ((self._por_simbolo, orden.simbolo), (self._por_estrategia, orden.estrategia)):
+            tickets = indice.get(clave)
+            if tickets is not None:
+                tickets.discard(ticket)
+                if not tickets:
+                    del indice[clave]
+        return orden
+
+    def get(self, ticket, defecto=None):
+        return self._por_ticket.get(ticket, defecto)
+
+    def por_posicion(self, posicion):
+        return self._por_posicion.get(posicion)
+
+    def por_simbolo(self, simbolo):
+        return [self._por_ticket[t] for t in self._por_simbolo.get(simbolo, ())]
+
+    def por_estrategia(self, estrategia):
+        return [self._por_ticket[t] for t in self._por_estrategia.get(estrategia, ())]
+
+    def __contains__(self, ticket):
+        return ticket in self._por_ticket
+
+    def __len__(self):
+        return len(self._por_ticket)
+
+    def __iter__(self):
+        return iter(list(self._por_ticket.values()))
+
+    def reconciliar(self, posiciones_abiertas, ahora=None, forzar=False):
+        """
+        Descarta las órdenes cuya posición lleva más de gracia_segundos sin aparecer en positions_get().
+        Solo actúa cada intervalo_reconciliacion segundos salvo que se fuerce. Devuelve las órdenes descartadas.
+        """
+        ahora = ahora if ahora is not None else datetime.now().timestamp()
+        if not forzar and ahora - self._ultima_reconciliacion < self.intervalo_reconciliacion:
+            return []
+        self._ultima_reconciliacion = ahora
+
+        abiertas = {p.ticket for p in (posiciones_abiertas or ())}
+        descartadas = []
+        for orden in list(self._por_ticket.values()):
+            if orden.posicion in abiertas:
+                orden.ultima_vez_abierta = ahora
+            elif ahora - orden.ultima_vez_abierta > self.gracia_segundos:
+                descartadas.append(self.eliminar(orden.ticket))
+        for orden in descartadas:
+            logging.warning("Orden %s de %s descartada: su posición ya no está abierta y no se encontró el cierre.", orden.ticket, orden.simbolo)
+        return descartadas
+
+# Tabla global de órdenes abiertas por el agente
 # Esto permite registrar la estrategia y otros detalles una vez que la orden se cierra
-ordenes_en_curso = {}
+ordenes_en_curso = TablaOrdenesAbiertas()
+
+# Tickets ya escritos en el CSV (se carga una sola vez)
+_tickets_registrados = None
 
-def registrar_operacion_abierta(ticket, simbolo, estrategia, lote, tipo, precio_apertura, sl, tp):
+def registrar_operacion_abierta(ticket, simbolo, estrategia, lote, tipo, precio_apertura, sl, tp, posicion=None):
     """
-    Registra una operación recién abierta en una variable global para posterior seguimiento.
+    Registra una operación recién abierta en la tabla global para posterior seguimiento.
+    posicion: identificador de la posición; en MT5 coincide con el ticket de la orden que la abrió.
     """
-    ordenes_en_curso[ticket] = {
-        'simbolo': simbolo,
-        'estrategia': estrategia,
-        'lote': lote,
-        'tipo': tipo,  # Ya viene como 'compra' o 'venta'
-        'precio_apertura': precio_apertura,
-        'stop_loss': sl,
-        'take_profit': tp,
-        'fecha_apertura': datetime.now()
-    }
+    ordenes_en_curso.agregar(OrdenAbierta(
+        ticket=ticket,
+        posicion=posicion if posicion is not None else ticket,
+        simbolo=simbolo,
+        estrategia=estrategia,
+        lote=lote,
+        tipo=tipo,  # Ya viene como 'compra' o 'venta'
+        precio_apertura=precio_apertura,
+        stop_loss=sl,
+        take_profit=tp,
+        fecha_apertura=datetime.now().timestamp()
+    ))
 
 def cargar_tickets_existentes():
     """Carga los tickets de las operaciones ya registradas para evitar duplicados."""
@@ -41,67 +149,85 @@ def cargar_tickets_existentes():
                         continue
     return tickets
 
-def monitorear_y_registrar_operaciones_cerradas(gestor_riesgo_global=None):
+def escribir_operacion_cerrada(operacion_cerrada, ruta=OPERACIONES_CSV):
+    """Añade una operación cerrada al CSV (con la cabecera si el archivo está vacío)."""
+    with open(ruta, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=operacion_cerrada.keys())
+        if f.tell() == 0:  # Escribir la cabecera si el archivo está vacío
+            writer.writeheader()
+        writer.writerow(operacion_cerrada)
+
+def monitorear_y_registrar_operaciones_cerradas(gestor_riesgo_global=None, coordinador=None):
     """
     Monitorea las operaciones cerradas y las registra en el archivo CSV sin duplicados.
     Acepta una instancia del gestor de riesgo para registrar las operaciones.
+    coordinador: en modo trabajador, el coordinador escribe la fila y registra el resultado en una sola
+                 llamada, de modo que los trabajadores nunca escriben a la vez en el mismo CSV.
     """
-    tickets_registrados = cargar_tickets_existentes()
-    
+    global _tickets_registrados
+    if _tickets_registrados is None:
+        _tickets_registrados = cargar_tickets_existentes()
+
+    if len(ordenes_en_curso) == 0:
+        return
+
     # Obtener el historial de deals (cierres) del día para buscar operaciones cerradas
     deals_historial = mt5.history_deals_get(datetime.now() - timedelta(days=1), datetime.now())
-    
+
     if deals_historial is None:
         return
-        
+
     for deal in deals_historial:
-        if deal.order in ordenes_en_curso and deal.order not in tickets_registrados:
-            # Es una operación de nuestro agente que se acaba de cerrar y no ha sido registrada
-            info_operacion = ordenes_en_curso[deal.order]
-            
-            # Calcular resultado y pips
-            precio_cierre = deal.price
-            
-            info_simbolo = mt5.symbol_info(deal.symbol)
-            if info_simbolo is None: continue
-            punto = info_simbolo.point
-            
-            if deal.type == mt5.DEAL_TYPE_BUY:
-                resultado_dinero = (precio_cierre - info_operacion['precio_apertura']) * deal.volume * 100000
-                resultado_pips = (precio_cierre - info_operacion['precio_apertura']) / punto
-            else:  # Venta
-                resultado_dinero = (info_operacion['precio_apertura'] - precio_cierre) * deal.volume * 100000
-                resultado_pips = (info_operacion['precio_apertura'] - precio_cierre) / punto
-
-            operacion_cerrada = {
-                'ticket_mt5': deal.order,
-                'simbolo': deal.symbol,
-                'estrategia': info_operacion['estrategia'],
-                'fecha_apertura': info_operacion['fecha_apertura'].strftime('%Y-%m-%d %H:%M:%S'),
-                'fecha_cierre': datetime.fromtimestamp(deal.time).strftime('%Y-%m-%d %H:%M:%S'),
-                'tipo': info_operacion['tipo'],
-                'precio_apertura': info_operacion['precio_apertura'],
-                'precio_cierre': precio_cierre,
-                'resultado_dinero': resultado_dinero,
-                'resultado_pips': resultado_pips,
-                'stop_loss': info_operacion['stop_loss'],
-                'take_profit': info_operacion['take_profit'],
-                'lote': deal.volume,
-                'comentario': deal.comment
-            }
-            
+        # Solo los deals de cierre, enlazados con su posición de origen
+        if deal.entry not in (mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_OUT_BY):
+            continue
+        info_operacion = ordenes_en_curso.por_posicion(deal.position_id)
+        if info_operacion is None or info_operacion.ticket in _tickets_registrados:
+            continue
+
+        # Es una operación de nuestro agente que se acaba de cerrar y no ha sido registrada
+        # Calcular resultado y pips
+        precio_cierre = deal.price
+
+        info_simbolo = mt5.symbol_info(deal.symbol)
+        if info_simbolo is None: continue
+        punto = info_simbolo.point
+
+        if info_operacion.tipo == 'compra':
+            resultado_dinero = (precio_cierre - info_operacion.precio_apertura) * deal.volume * 100000
+            resultado_pips = (precio_cierre - info_operacion.precio_apertura) / punto
+        else:  # Venta
+            resultado_dinero = (info_operacion.precio_apertura - precio_cierre) * deal.volume * 100000
+            resultado_pips = (info_operacion.precio_apertura - precio_cierre) / punto
+
+        operacion_cerrada = {
+            'ticket_mt5': info_operacion.ticket,
+            'simbolo': deal.symbol,
+            'estrategia': info_operacion.estrategia,
+            'fecha_apertura': datetime.fromtimestamp(info_operacion.fecha_apertura).strftime('%Y-%m-%d %H:%M:%S'),
+            'fecha_cierre': datetime.fromtimestamp(deal.time).strftime('%Y-%m-%d %H:%M:%S'),
+            'tipo': info_operacion.tipo,
+            'precio_apertura': info_operacion.precio_apertura,
+            'precio_cierre': precio_cierre,
+            'resultado_dinero': resultado_dinero,
+            'resultado_pips': resultado_pips,
+            'stop_loss': info_operacion.stop_loss,
+            'take_profit': info_operacion.take_profit,
+            'lote': deal.volume,
+            'comentario': deal.comment
+        }
+
+        if coordinador is not None:
+            coordinador.registrar_operacion_cerrada(operacion_cerrada)
+        else:
             # Escribir en el CSV
-            with open(OPERACIONES_CSV, 'a', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=operacion_cerrada.keys())
-                if f.tell() == 0:  # Escribir la cabecera si el archivo está vacío
-                    writer.writeheader()
-                writer.writerow(operacion_cerrada)
-            
-            print(f"✅ Operación {deal.order} de {deal.symbol} registrada en CSV.")
-            
+            escribir_operacion_cerrada(operacion_cerrada)
             # NUEVO: Registrar la operación en el gestor de riesgo global
             if gestor_riesgo_global:
-                gestor_riesgo_global.registrar_operacion(info_operacion['estrategia'], resultado_dinero)
-                
-            # Eliminar del seguimiento una vez registrada
-            del ordenes_en_curso[deal.order]
\ No newline at end of file
+                gestor_riesgo_global.registrar_operacion(info_operacion.estrategia, resultado_dinero)
+        _tickets_registrados.add(info_operacion.ticket)
+
+        print(f"✅ Operación {info_operacion.ticket} de {deal.symbol} registrada en CSV.")
+
+        # Eliminar del seguimiento una vez registrada
+        ordenes_en_curso.eliminar(info_operacion.ticket)
@@ -0,0 +1,215 @@
+# simulador_montecarlo.py
+# Simulación Monte Carlo vectorizada de las reglas de GestionRiesgo
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from gestion_riesgo import GestionRiesgo
+
+OPERACIONES_CSV = os.path.join(os.path.dirname(__file__), 'operaciones_trading.csv')
+
+# --- DISTRIBUCIONES DE RESULTADOS ---
+def distribucion_bootstrap(resultados):
+    """Remuestrea con reemplazo los resultados históricos."""
+    resultados = np.asarray(resultados, dtype=float)
+    if resultados.size == 0:
+        raise ValueError("No hay resultados para remuestrear.")
+    return lambda rng, forma: rng.choice(resultados, size=forma, replace=True)
+
+def distribucion_normal(media, desviacion):
+    return lambda rng, forma: rng.normal(media, desviacion, size=forma)
+
+def distribucion_ganancia_perdida(prob_ganancia, ganancia_media, perdida_media, dispersion=0.25):
+    """Mezcla paramétrica: ganancia con probabilidad 'prob_ganancia', pérdida en caso contrario."""
+    def muestrear(rng, forma):
+        gana = rng.random(forma) < prob_ganancia
+        ganancia = ganancia_media * rng.lognormal(0.0, dispersion, size=forma)
+        perdida = -abs(perdida_media) * rng.lognormal(0.0, dispersion, size=forma)
+        return np.where(gana, ganancia, perdida)
+    return muestrear
+
+def cargar_resultados_csv(ruta_csv=OPERACIONES_CSV):
+    """Devuelve {estrategia: array de resultados_dinero} a partir del registro de operaciones."""
+    df = pd.read_csv(ruta_csv, usecols=['estrategia', 'resultado_dinero'])
+    return {estrategia: grupo['resultado_dinero'].to_numpy(dtype=float)
+            for estrategia, grupo in df.groupby('estrategia')}
+
+# --- SIMULADOR ---
+class ResultadoSimulacion:
+    def __init__(self, equidad_final, max_drawdown, dias_detenidos, operaciones, operaciones_bloqueadas):
+        self.equidad_final = equidad_final
+        self.max_drawdown = max_drawdown
+        self.dias_detenidos = dias_detenidos
+        self.operaciones = operaciones
+        self.operaciones_bloqueadas = operaciones_bloqueadas
+
+    def resumen(self, percentiles=(5, 50, 95)):
+        filas = {}
+        for nombre in ('equidad_final', 'max_drawdown', 'dias_detenidos', 'operaciones'):
+            valores = getattr(self, nombre)
+            fila = {'media': float(np.mean(valores))}
+            for p, v in zip(percentiles, np.percentile(valores, percentiles)):
+                fila[f'p{p}'] = float(v)
+            filas[nombre] = fila
+        return pd.DataFrame(filas).T
+
+class SimuladorMonteCarlo:
+    def __init__(self, gestion_riesgo, distribuciones, dias=20, operaciones_por_dia=10, minutos_entre_operaciones=30):
+        """
+        gestion_riesgo: instancia de GestionRiesgo cuyas reglas se simulan (no se modifica)
+        distribuciones: dict {nombre_estrategia: distribucion} o una distribución común para todas
+        dias: días de trading por secuencia
+        operaciones_por_dia: rondas por día; en cada ronda cada estrategia intenta una operación
+        minutos_entre_operaciones: tiempo simulado entre rondas (para los cooldowns)
+        """
+        self.riesgo = gestion_riesgo
+        self.dias = dias
+        self.operaciones_por_dia = operaciones_por_dia
+        self.minutos_entre_operaciones = minutos_entre_operaciones
+
+        if callable(distribuciones):
+            nombres = list(gestion_riesgo.limites_estrategias) or ['estrategia']
+            distribuciones = {nombre: distribuciones for nombre in nombres}
+        self.estrategias = list(distribuciones)
+        self.distribuciones = distribuciones
+
+    def _limite_global(self):
+        r = self.riesgo
+        if not r.limite_global:
+            return None
+        return abs(r.capital_inicial * r.limite_global if r.modo_porcentaje else r.limite_global)
+
+    def _limite_estrategia(self, nombre):
+        r = self.riesgo
+        if nombre not in r.limites_estrategias:
+            return None
+        limite = r.limites_estrategias[nombre]
+        return abs(r.capital_inicial * limite / 100 if r.modo_porcentaje else limite)
+
+    def simular(self, n_simulaciones=10000, semilla=None):
+        """Ejecuta n_simulaciones secuencias en paralelo, vectorizando sobre las simulaciones."""
+        r = self.riesgo
+        rng = np.random.default_rng(semilla)
+        n_est = len(self.estrategias)
+        n = n_simulaciones
+
+        limite_global = self._limite_global()
+        limites = [self._limite_estrategia(nombre) for nombre in self.estrategias]
+        # Solo las estrategias con límite propio llevan pérdidas consecutivas (igual que GestionRiesgo)
+        seguidas = [nombre in r.limites_estrategias for nombre in self.estrategias]
+
+        equidad = np.full(n, float(r.capital_inicial))
+        pico = equidad.copy()
+        max_drawdown = np.zeros(n)
+        dias_detenidos = np.zeros(n, dtype=np.int32)
+        operaciones = np.zeros(n, dtype=np.int32)
+        bloqueadas = np.zeros(n, dtype=np.int32)
+        consecutivas = np.zeros((n, n_est), dtype=np.int32)
+        cooldown_hasta = np.full((n, n_est), -np.inf)
+
+        for dia in range(self.dias):
+            # reiniciar_limites(): los cooldowns se mantienen hasta que expiren
+            perdida_global = np.zeros(n)
+            perdidas_est = np.zeros((n, n_est))
+            consecutivas[:] = 0
+            detenido_hoy = np.zeros(n, dtype=bool)
+
+            for ronda in range(self.operaciones_por_dia):
+                minuto = dia * 1440 + ronda * self.minutos_entre_operaciones
+
+                for s, nombre in enumerate(self.estrategias):
+                    # puede_operar(): el límite global se comprueba en cada intento, como en GestionRiesgo,
+                    # así que una pérdida de una estrategia bloquea a las siguientes de la misma ronda
+                    puede = np.ones(n, dtype=bool)
+                    if limite_global is not None:
+                        puede = perdida_global > -limite_global
+                        detenido_hoy |= ~puede
+                    if r.cooldown_activo:
+                        puede &= cooldown_hasta[:, s] <= minuto
+                    if limites[s] is not None:
+                        puede &= perdidas_est[:, s] > -limites[s]
+                    bloqueadas += ~puede
+
+                    # factor_posicion()
+                    factor = np.ones(n)
+                    if r.reducir_posicion_activo:
+                        factor[consecutivas[:, s] >= r.perdidas_consecutivas_reduccion] = r.factor_reduccion
+
+                    resultado = self.distribuciones[nombre](rng, n) * factor
+                    resultado[~puede] = 0.0
+
+                    # registrar_operacion()
+                    perdida_global += resultado
+                    equidad += resultado
+                    operaciones += puede
+                    if seguidas[s]:
+                        perdidas_est[:, s] += resultado
+                        perdio = puede & (resultado < 0)
+                        consecutivas[perdio, s] += 1
+                        consecutivas[puede & ~perdio, s] = 0
+                        if r.limite_perdidas_consecutivas_activo:
+                            en_cooldown = perdio & (consecutivas[:, s] >= r.limite_perdidas_consecutivas)
+                            cooldown_hasta[en_cooldown, s] = minuto + r.cooldown_minutos
+
+                    np.maximum(pico, equidad, out=pico)
+                    np.maximum(max_drawdown, pico - equidad, out=max_drawdown)
+
+            if limite_global is not None:
+                detenido_hoy |= perdida_global <= -limite_global
+            dias_detenidos += detenido_hoy
+
+        return ResultadoSimulacion(equidad, max_drawdown, dias_detenidos, operaciones, bloqueadas)
+
+def comparar_configuraciones(configuraciones, distribuciones, n_simulaciones=10000, semilla=0, **kwargs):
+    """
+    Simula varias configuraciones de GestionRiesgo con la misma semilla.
+    configuraciones: dict {etiqueta: GestionRiesgo}
+    """
+    filas = {}
+    for etiqueta, gestion in configuraciones.items():
+        resultado = SimuladorMonteCarlo(gestion, distribuciones, **kwargs).simular(n_simulaciones, semilla)
+        resumen = resultado.resumen()
+        filas[etiqueta] = {
+            'equidad_final_p50': resumen.loc['equidad_final', 'p50'],
+            'equidad_final_p5': resumen.loc['equidad_final', 'p5'],
+            'max_drawdown_p50': resumen.loc['max_drawdown', 'p50'],
+            'max_drawdown_p95': resumen.loc['max_drawdown', 'p95'],
+            'dias_detenidos_media': resumen.loc['dias_detenidos', 'media'],
+            'operaciones_media': resumen.loc['operaciones', 'media'],
+        }
+    return pd.DataFrame(filas).T
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulación Monte Carlo de los límites de riesgo.")
+    parser.add_argument('--csv', default=OPERACIONES_CSV, help="Registro de operaciones para el bootstrap")
+    parser.add_argument('--simulaciones', type=int, default=20000)
+    parser.add_argument('--dias', type=int, default=20)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if os.path.isfile(args.csv):
+        resultados = cargar_resultados_csv(args.csv)
+        distribuciones = {nombre: distribucion_bootstrap(v) for nombre, v in resultados.items()}
+        print(f"Bootstrap desde '{args.csv}' ({sum(len(v) for v in resultados.values())} operaciones).")
+    else:
+        distribuciones = {nombre: distribucion_ganancia_perdida(0.45, 40, 30) for nombre in ['estrategia1', 'estrategia2']}
+        print("CSV no encontrado. Usando una distribución paramétrica de ejemplo.")
+
+    limites = {nombre: 100 for nombre in distribuciones}
+    configuraciones = {
+        'sin_cooldown': GestionRiesgo(limite_global=300, limites_estrategias=limites.copy()),
+        'cooldown_3': GestionRiesgo(limite_global=300, limites_estrategias=limites.copy(),
+                                    cooldown_activo=True, limite_perdidas_consecutivas_activo=True,
+                                    limite_perdidas_consecutivas=3),
+        'cooldown_3_reduccion': GestionRiesgo(limite_global=300, limites_estrategias=limites.copy(),
+                                              cooldown_activo=True, limite_perdidas_consecutivas_activo=True,
+                                              limite_perdidas_consecutivas=3, reducir_posicion_activo=True,
+                                              perdidas_consecutivas_reduccion=2, factor_reduccion=0.7),
+    }
+    comparacion = comparar_configuraciones(configuraciones, distribuciones, n_simulaciones=args.simulaciones,
+                                           semilla=args.semilla, dias=args.dias)
+    print(comparacion.round(2))
+    return comparacion
+
+if __name__ == "__main__":
+    main()
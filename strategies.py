@@ -1,4 +1,5 @@
 # strategies.py
+import numpy as np
 
 def determinar_senales(df, estrategia):
     """
@@ -64,4 +65,44 @@ def determinar_senales(df, estrategia):
         if cruce_bajista and precio_bajo_ema200:
             return "venta"
 
-    return None
\ No newline at end of file
+    return None
+
+
+def determinar_senales_lote(indicadores, estrategia):
+    """
+    Versión por lotes de determinar_senales sobre el resultado de calcular_indicadores_lote.
+    Devuelve dos vectores booleanos (compra, venta), uno por símbolo.
+    """
+    cierre = indicadores['close']
+    ema_20 = indicadores['EMA_20']
+    es_elefante = indicadores['es_vela_elefante'][:, -1]
+    sin_senal = np.zeros(cierre.shape[0], dtype=bool)
+    if cierre.shape[1] < 2:
+        return sin_senal, sin_senal.copy()
+
+    nombre_estrategia = estrategia.get("nombre")
+
+    if nombre_estrategia == "Cruce EMA + Vela Elefante":
+        ema_9 = indicadores['EMA_9']
+        cruce_alcista = (ema_9[:, -2] < ema_20[:, -2]) & (ema_9[:, -1] > ema_20[:, -1])
+        cruce_bajista = (ema_9[:, -2] > ema_20[:, -2]) & (ema_9[:, -1] < ema_20[:, -1])
+        return cruce_alcista & es_elefante, cruce_bajista & es_elefante
+
+    # El cierre cruza la EMA 20 en la última vela (común a las otras dos estrategias)
+    cruce_alcista = (cierre[:, -2] < ema_20[:, -2]) & (cierre[:, -1] > ema_20[:, -1])
+    cruce_bajista = (cierre[:, -2] > ema_20[:, -2]) & (cierre[:, -1] < ema_20[:, -1])
+
+    if nombre_estrategia == "Rompimiento de la EMA 20":
+        return cruce_alcista & es_elefante, cruce_bajista & es_elefante
+
+    if nombre_estrategia == "Reversión a la Media":
+        precio_sobre_ema200 = np.ones_like(sin_senal)
+        precio_bajo_ema200 = np.ones_like(sin_senal)
+        if estrategia.get("criterios", {}).get("usar_filtro_tendencia_200_ema", False):
+            # Sin 200 velas el filtro de tendencia se desactiva para ese símbolo
+            con_filtro = indicadores['velas_validas'] >= 200
+            precio_sobre_ema200 = ~con_filtro | (cierre[:, -1] > indicadores['EMA_200'][:, -1])
+            precio_bajo_ema200 = ~con_filtro | (cierre[:, -1] < indicadores['EMA_200'][:, -1])
+        return cruce_alcista & precio_sobre_ema200, cruce_bajista & precio_bajo_ema200
+
+    return sin_senal, sin_senal.copy()
@@ -0,0 +1,37 @@
+# test_almacen_caracteristicas.py
+import numpy as np
+from almacen_caracteristicas import AlmacenCaracteristicas, COLUMNAS
+
+def _rates(n, semilla=3):
+    rng = np.random.default_rng(semilla)
+    cierre = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    apertura = cierre + rng.normal(0, 0.0002, n)
+    rates = np.zeros(n, dtype=[('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8')])
+    rates['time'] = 1_700_000_000 + 60 * np.arange(n)
+    rates['open'] = apertura
+    rates['close'] = cierre
+    rates['high'] = np.maximum(apertura, cierre) + 0.0003
+    rates['low'] = np.minimum(apertura, cierre) - 0.0003
+    return rates
+
+def test_dos_procesos_extienden_el_mismo_almacen(tmp_path):
+    rates = _rates(301)
+    referencia = AlmacenCaracteristicas(str(tmp_path / 'referencia'))
+    referencia.extender('EURUSD', rates)
+
+    # Dos instancias sobre el mismo directorio, cada una con su meta en caché (como dos procesos)
+    a = AlmacenCaracteristicas(str(tmp_path / 'compartido'))
+    b = AlmacenCaracteristicas(str(tmp_path / 'compartido'))
+    a.extender('EURUSD', rates[:51])
+    assert b.longitud('EURUSD') == 50
+    a.extender('EURUSD', rates[:201])
+    # b va por detrás: no debe truncar lo que a escribió
+    assert b.extender('EURUSD', rates[:151]) == 0
+    assert b.extender('EURUSD', rates[:251]) == 50
+    assert a.extender('EURUSD', rates) == 50
+
+    compartido = AlmacenCaracteristicas(str(tmp_path / 'compartido'))
+    assert compartido.longitud('EURUSD') == 300
+    esperado, obtenido = referencia.leer('EURUSD'), compartido.leer('EURUSD')
+    for columna in COLUMNAS:
+        np.testing.assert_array_equal(obtenido[columna], esperado[columna])
@@ -0,0 +1,106 @@
+# test_analitica.py
+import csv
+import pytest
+import analitica
+from analitica import exportar_incremental, cargar_operaciones, rendimiento_por, metricas_moviles
+from modo_sombra import COLUMNAS
+
+# (estrategia, simbolo, fecha de cierre, resultado)
+OPERACIONES = [
+    ('A', 'EURUSD', '2026-01-05 10:00:00', 10.0),
+    ('A', 'EURUSD', '2026-01-06 11:00:00', -5.0),
+    ('B', 'EURUSD', '2026-01-07 12:00:00', -8.0),
+    ('A', 'GBPUSD', '2026-02-02 09:00:00', 20.0),
+]
+
+def _fila(ticket, estrategia, simbolo, fecha_cierre, resultado):
+    return {
+        'ticket_mt5': ticket, 'simbolo': simbolo, 'estrategia': estrategia,
+        'fecha_apertura': fecha_cierre[:11] + '08' + fecha_cierre[13:], 'fecha_cierre': fecha_cierre,
+        'tipo': 'compra', 'precio_apertura': 1.1, 'precio_cierre': 1.1, 'resultado_dinero': resultado,
+        'resultado_pips': resultado * 10, 'stop_loss': 1.09, 'take_profit': 1.12, 'lote': 0.1, 'comentario': ''
+    }
+
+def _escribir(ruta, operaciones, primer_ticket=1, modo='w', columnas=COLUMNAS):
+    with open(ruta, modo, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columnas, extrasaction='ignore')
+        if modo == 'w':
+            writer.writeheader()
+        for i, operacion in enumerate(operaciones):
+            writer.writerow(_fila(primer_ticket + i, *operacion))
+
+def test_exportacion_incremental_solo_anade_las_nuevas(tmp_path):
+    ruta_csv, directorio = tmp_path / 'operaciones.csv', str(tmp_path / 'analitica')
+    _escribir(ruta_csv, OPERACIONES[:2])
+    assert exportar_incremental(str(ruta_csv), directorio) == 2
+    assert exportar_incremental(str(ruta_csv), directorio) == 0
+
+    _escribir(ruta_csv, OPERACIONES[2:], primer_ticket=3, modo='a')
+    assert exportar_incremental(str(ruta_csv), directorio) == 2
+    df = cargar_operaciones(directorio, str(ruta_csv))
+    assert sorted(df['ticket_mt5']) == [1, 2, 3, 4]
+    assert len(analitica._partes(directorio, '2026-01')) == 2
+    assert list(cargar_operaciones(directorio, str(ruta_csv), desde_mes='2026-02')['ticket_mt5']) == [4]
+
+    # Una fila a medio escribir se deja para la siguiente exportación
+    with open(ruta_csv, 'a', newline='') as f:
+        f.write('5,EURUSD,A,2026-02-03 08:00:00,2026-02-03')
+    assert exportar_incremental(str(ruta_csv), directorio) == 0
+
+@pytest.mark.parametrize("cambio", ["cabecera", "truncado"])
+def test_cabecera_cambiada_o_csv_truncado_reconstruye(tmp_path, cambio):
+    ruta_csv, directorio = tmp_path / 'operaciones.csv', str(tmp_path / 'analitica')
+    _escribir(ruta_csv, OPERACIONES)
+    exportar_incremental(str(ruta_csv), directorio)
+
+    if cambio == "cabecera":
+        _escribir(ruta_csv, OPERACIONES[:3], primer_ticket=10, columnas=COLUMNAS + ['deslizamiento'])
+    else:
+        _escribir(ruta_csv, OPERACIONES[:1], primer_ticket=10)
+    esperadas = 3 if cambio == "cabecera" else 1
+    assert exportar_incremental(str(ruta_csv), directorio) == esperadas
+    df = cargar_operaciones(directorio, str(ruta_csv))
+    assert sorted(df['ticket_mt5']) == list(range(10, 10 + esperadas))
+
+def test_rendimiento_por_estrategia_y_simbolo(tmp_path):
+    ruta_csv = tmp_path / 'operaciones.csv'
+    _escribir(ruta_csv, OPERACIONES)
+    df = analitica.leer_csv(str(ruta_csv))
+
+    por_estrategia = rendimiento_por(df, 'estrategia')
+    assert list(por_estrategia.index) == ['A', 'B']  # Ordenado por P&L
+    assert por_estrategia.loc['A', 'operaciones'] == 3
+    assert por_estrategia.loc['A', 'pnl'] == pytest.approx(25.0)
+    assert por_estrategia.loc['A', 'win_rate'] == pytest.approx(2 / 3)
+    assert por_estrategia.loc['A', 'profit_factor'] == pytest.approx(30.0 / 5.0)
+    assert por_estrategia.loc['B', 'win_rate'] == 0
+
+    ambas = rendimiento_por(df, ['estrategia', 'simbolo'])
+    assert ambas.loc[('A', 'EURUSD'), 'pnl'] == pytest.approx(5.0)
+    assert ambas.loc[('A', 'EURUSD'), 'win_rate'] == pytest.approx(0.5)
+    assert ambas.loc[('A', 'GBPUSD'), 'esperanza'] == pytest.approx(20.0)
+    assert list(rendimiento_por(df, 'mes').index) == ['2026-02', '2026-01']
+
+def test_metricas_moviles_por_ventana(tmp_path):
+    ruta_csv = tmp_path / 'operaciones.csv'
+    _escribir(ruta_csv, OPERACIONES)
+    moviles = metricas_moviles(analitica.leer_csv(str(ruta_csv)), ventana=2)
+    a = moviles[moviles['estrategia'] == 'A']
+    # Ventana de 2: [10], [10, -5], [-5, 20]
+    assert list(a['win_rate']) == pytest.approx([1.0, 0.5, 0.5])
+    assert list(a['esperanza']) == pytest.approx([10.0, 2.5, 7.5])
+    assert list(a['profit_factor']) == pytest.approx([float('inf'), 2.0, 4.0])
+    assert list(a['pnl_acumulado']) == pytest.approx([10.0, 5.0, 25.0])
+    assert list(a['drawdown']) == pytest.approx([0.0, 5.0, 0.0])
+    assert list(moviles[moviles['estrategia'] == 'B']['drawdown']) == pytest.approx([0.0])
+
+def test_cli_de_punta_a_punta(tmp_path, capsys):
+    ruta_csv = tmp_path / 'operaciones.csv'
+    _escribir(ruta_csv, OPERACIONES)
+    analitica.main(['--csv', str(ruta_csv), '--dir', str(tmp_path / 'analitica'), '--por', 'estrategia', 'estrategia,simbolo',
+                    '--ventana', '2'])
+    salida = capsys.readouterr().out
+    assert "4 operaciones nuevas exportadas" in salida
+    assert "--- Rendimiento por estrategia,simbolo ---" in salida
+    assert "--- Últimas 2 operaciones por estrategia ---" in salida
+    assert (tmp_path / 'analitica' / 'estado.json').is_file()
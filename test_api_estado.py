@@ -0,0 +1,91 @@
+# test_api_estado.py
+import json
+import threading
+import urllib.error
+import urllib.request
+import pandas as pd
+import pytest
+import mt5_simulado
+import registro_operaciones
+import trading_agent
+from api_estado import PublicadorEstado, iniciar_servidor_estado
+
+@pytest.fixture
+def terminal(monkeypatch):
+    mt5_simulado.reiniciar()
+    mt5_simulado.definir_simbolo('EURUSD', 1.1000, 1.1001)
+    monkeypatch.setattr(trading_agent, 'mt5', mt5_simulado)
+    monkeypatch.setattr(trading_agent, 'enviar_notificacion', lambda mensaje: None)
+    monkeypatch.setattr(trading_agent, 'registro_ejecucion', None)
+    # Velas e indicadores mínimos para la gestión de posiciones
+    df = pd.DataFrame({'close': [1.0990, 1.1000], 'ATR': [0.0010, 0.0010]})
+    monkeypatch.setattr(trading_agent, 'obtener_datos', lambda simbolo, timeframe, num_velas: df)
+    monkeypatch.setattr(trading_agent, 'calcular_indicadores', lambda datos, **kwargs: datos)
+    yield mt5_simulado
+    for ticket in list(registro_operaciones.ordenes_en_curso._por_ticket):
+        registro_operaciones.ordenes_en_curso.eliminar(ticket)
+    mt5_simulado.reiniciar()
+
+class _GestorFijo:
+    """Gestor en operación que sugiere un stop fijo para la primera posición y cerrar la segunda."""
+    def actualizar_stops_lote(self, posiciones):
+        return [(1.0995, False), (posiciones[1]['stop_actual'], True)]
+
+def test_posiciones_publicadas_reflejan_los_stops_del_ciclo(terminal):
+    for _ in range(2):
+        trading_agent.ejecutar_orden('EURUSD', terminal.ORDER_TYPE_BUY, 1.0980, 1.1040, 10000, 1, 'estrategia',
+                                     trading_agent.GestionRiesgo())
+    operaciones_abiertas = terminal.positions_get()  # Instantánea previa a la gestión, como en la FASE 1
+
+    cambios = trading_agent.gestionar_operaciones_abiertas(operaciones_abiertas, _GestorFijo())
+    posiciones = trading_agent.describir_posiciones(operaciones_abiertas, cambios)
+
+    assert [p['ticket'] for p in posiciones] == [operaciones_abiertas[0].ticket]
+    assert posiciones[0]['stop_loss'] == 1.0995
+    assert posiciones[0]['estrategia'] == 'estrategia'
+
+def test_estado_detenido_con_motivo():
+    publicador = PublicadorEstado()
+    publicador.publicar(detenido="limite_diario", posiciones=[])
+    assert publicador.instantanea()['estado'] == 'detenido'
+    assert publicador.instantanea()['motivo_detencion'] == "limite_diario"
+    publicador.publicar(posiciones=[])
+    assert publicador.instantanea()['estado'] == 'activo'
+    assert publicador.instantanea()['motivo_detencion'] is None
+
+def _consultar(puerto, ruta):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}{ruta}", timeout=5) as respuesta:
+            return respuesta.status, respuesta.headers['Content-Type'], json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers['Content-Type'], json.loads(e.read())
+
+def test_servidor_http_responde_y_se_detiene():
+    publicador = PublicadorEstado()
+    publicador.publicar(riesgo={'perdida_diaria': 12.5}, posiciones=[{'ticket': 7, 'simbolo': 'EURUSD'}])
+    servidor = iniciar_servidor_estado(publicador, 0)  # Puerto 0: lo elige el sistema
+    puerto = servidor.server_address[1]
+    try:
+        estado, tipo, cuerpo = _consultar(puerto, '/estado')
+        assert estado == 200 and tipo.startswith('application/json')
+        assert cuerpo['estado'] == 'activo' and cuerpo['posiciones'][0]['ticket'] == 7
+
+        estado, _, cuerpo = _consultar(puerto, '/riesgo?x=1')
+        assert estado == 200
+        assert cuerpo == {'publicado': publicador.instantanea()['publicado'], 'riesgo': {'perdida_diaria': 12.5}}
+
+        # Una publicación nueva no sirve la serialización anterior
+        publicador.publicar(riesgo={'perdida_diaria': 20.0})
+        assert _consultar(puerto, '/riesgo')[2]['riesgo'] == {'perdida_diaria': 20.0}
+
+        estado, _, cuerpo = _consultar(puerto, '/desconocida')
+        assert estado == 404 and 'error' in cuerpo
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+    for hilo in threading.enumerate():
+        if hilo.name == 'api_estado':
+            hilo.join(timeout=5)
+            assert not hilo.is_alive()
+    with pytest.raises(urllib.error.URLError):
+        urllib.request.urlopen(f"http://127.0.0.1:{puerto}/estado", timeout=1)
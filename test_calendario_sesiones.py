@@ -0,0 +1,75 @@
+# test_calendario_sesiones.py
+from datetime import datetime, timezone
+import pytest
+import config
+import trading_agent
+from calendario_sesiones import CalendarioSesiones, sesiones_forex, _mascara_semanal, MINUTOS_DIA
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+def test_mascara_por_minuto_de_la_semana():
+    mascara = _mascara_semanal([(0, "09:00", "17:30"), (6, "23:00", "24:00")], pausas_diarias=[("23:50", "00:10")])
+    assert not mascara[9 * 60 - 1] and mascara[9 * 60]
+    assert mascara[17 * 60 + 29] and not mascara[17 * 60 + 30]
+    # La pausa cruza la medianoche del domingo al lunes (vuelta al inicio de la semana)
+    domingo = 6 * MINUTOS_DIA
+    assert mascara[domingo + 23 * 60 + 49] and not mascara[domingo + 23 * 60 + 50]
+    assert not mascara[:10].any()
+
+@pytest.mark.parametrize("apertura, cierre", [
+    (_utc(2026, 1, 11, 22, 0), _utc(2026, 1, 16, 22, 0)),   # Horario estándar de Nueva York (UTC-5)
+    (_utc(2026, 7, 12, 21, 0), _utc(2026, 7, 17, 21, 0)),   # Horario de verano (UTC-4)
+])
+def test_semana_de_forex_sigue_el_horario_de_nueva_york(apertura, cierre):
+    calendario = CalendarioSesiones(sesion_por_defecto=sesiones_forex())
+    un_minuto = apertura.replace(minute=1) - apertura
+    assert not calendario.abierto('EURUSD', apertura - un_minuto)
+    assert calendario.abierto('EURUSD', apertura)
+    assert calendario.abierto('EURUSD', cierre - un_minuto)
+    assert not calendario.abierto('EURUSD', cierre)
+
+@pytest.mark.parametrize("sabado, apertura", [
+    (_utc(2026, 3, 7, 12, 0), _utc(2026, 3, 8, 21, 5)),     # El horario de verano empieza el domingo a las 2:00
+    (_utc(2026, 10, 31, 12, 0), _utc(2026, 11, 1, 22, 5)),  # Y termina el domingo 1 de noviembre
+])
+def test_proxima_apertura_tras_el_cambio_de_horario(sabado, apertura):
+    calendario = CalendarioSesiones(pausas_diarias=[("16:55", "17:05")])
+    assert calendario.proxima_apertura('EURUSD', sabado) == apertura
+    assert calendario.segundos_hasta_apertura(['EURUSD'], sabado) == (apertura - sabado).total_seconds()
+
+def test_festivo_se_salta_en_proxima_apertura():
+    calendario = CalendarioSesiones(festivos=["2026-01-12"])
+    # El lunes festivo en Nueva York empieza a las 05:00 UTC y el mercado vuelve el martes a la misma hora
+    assert calendario.abierto('EURUSD', _utc(2026, 1, 12, 4, 59))
+    assert not calendario.abierto('EURUSD', _utc(2026, 1, 12, 5, 0))
+    assert calendario.proxima_apertura('EURUSD', _utc(2026, 1, 12, 12, 0)) == _utc(2026, 1, 13, 5, 0)
+    assert calendario.proxima_apertura('EURUSD', _utc(2026, 1, 10, 12, 0)) == _utc(2026, 1, 11, 22, 0)
+
+class _CalendarioFijo:
+    """Devuelve los segundos hasta la apertura de una lista (uno por consulta)."""
+    def __init__(self, *segundos):
+        self.segundos = list(segundos)
+
+    def segundos_hasta_apertura(self, simbolos, ahora=None):
+        return self.segundos.pop(0)
+
+@pytest.fixture
+def esperas(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(trading_agent.time, 'sleep', esperas.append)
+    monkeypatch.setattr(trading_agent, 'verificar_y_reconectar_mt5', lambda: True)
+    return esperas
+
+def test_esperar_apertura_lejana_solo_duerme_un_latido(esperas, monkeypatch):
+    monkeypatch.setattr(trading_agent, 'obtener_datos', lambda *args: pytest.fail("no debe precalentar"))
+    trading_agent.esperar_apertura(_CalendarioFijo(config.LATIDO_MERCADO_CERRADO_SEG * 4), ['EURUSD'])
+    assert esperas == [config.LATIDO_MERCADO_CERRADO_SEG]
+
+def test_esperar_apertura_cercana_selecciona_los_simbolos(esperas, monkeypatch):
+    seleccionados = []
+    monkeypatch.setattr(trading_agent.mt5, 'symbol_select', lambda simbolo, habilitar=True: seleccionados.append(simbolo))
+    monkeypatch.setattr(trading_agent, 'obtener_datos', lambda *args: pytest.fail("las velas se piden en el primer ciclo"))
+    trading_agent.esperar_apertura(_CalendarioFijo(config.PRECALENTAMIENTO_SEG + 100, 12), ['EURUSD', 'GBPUSD'])
+    assert esperas == [100, 12]
+    assert seleccionados == ['EURUSD', 'GBPUSD']
@@ -0,0 +1,71 @@
+# test_calidad_ejecucion.py
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import mt5_simulado
+from calidad_ejecucion import RegistroEjecucion, DTYPE_EJECUCION, APERTURA, CIERRE, MODIFICACION
+
+PUNTO = 0.00001
+
+def _ejecutada(precio):
+    return SimpleNamespace(retcode=mt5_simulado.TRADE_RETCODE_DONE, price=precio)
+
+def test_registro_de_32_bytes():
+    assert DTYPE_EJECUCION.itemsize == 32
+
+def test_signo_del_deslizamiento_por_lado():
+    registro = RegistroEjecucion()
+    # Compra ejecutada más cara y venta ejecutada más barata: deslizamiento en contra (+)
+    assert registro.registrar('EURUSD', APERTURA, _ejecutada(1.10003), 10, precio_solicitado=1.10000,
+                              es_compra=True, punto=PUNTO) == pytest.approx(3)
+    assert registro.registrar('EURUSD', APERTURA, _ejecutada(1.09997), 10, precio_solicitado=1.10000,
+                              es_compra=False, punto=PUNTO) == pytest.approx(3)
+    # Y a favor (-) en el caso contrario
+    assert registro.registrar('EURUSD', APERTURA, _ejecutada(1.09998), 10, precio_solicitado=1.10000,
+                              es_compra=True, punto=PUNTO) == pytest.approx(-2)
+    assert registro.registrar('EURUSD', APERTURA, _ejecutada(1.10002), 10, precio_solicitado=1.10000,
+                              es_compra=False, punto=PUNTO) == pytest.approx(-2)
+    # Sin ejecución o sin precio solicitado no hay deslizamiento
+    recotizada = SimpleNamespace(retcode=mt5_simulado.TRADE_RETCODE_REQUOTE, price=0.0)
+    assert np.isnan(registro.registrar('EURUSD', APERTURA, recotizada, 10, precio_solicitado=1.1, punto=PUNTO))
+    assert np.isnan(registro.registrar('EURUSD', MODIFICACION, _ejecutada(0.0), 10))
+
+def test_desviacion_limitada():
+    registro = RegistroEjecucion(factor_atr=0.1, desviacion_min=5, desviacion_max=100, percentil=90)
+    assert registro.desviacion('EURUSD', None, PUNTO) == 5                 # Sin ATR ni historial: el mínimo
+    assert registro.desviacion('EURUSD', 0.0020, PUNTO) == 20              # ATR 200 puntos * 0.1
+    assert registro.desviacion('EURUSD', 0.0200, PUNTO) == 100             # Limitada por el máximo
+    for deslizamiento in range(1, 41):
+        registro.registrar('EURUSD', APERTURA, _ejecutada(1.1 + deslizamiento * PUNTO), 10,
+                           precio_solicitado=1.1, es_compra=True, punto=PUNTO)
+    # El percentil 90 del deslizamiento reciente supera al ATR escalado
+    assert registro.desviacion('EURUSD', 0.0020, PUNTO) == 36
+    assert registro.desviacion('GBPUSD', 0.0020, PUNTO) == 20              # Otro símbolo, sin historial
+
+def test_registros_persistidos_y_ventana_recuperada(tmp_path):
+    ruta = str(tmp_path / 'calidad.bin')
+    registro = RegistroEjecucion(ruta, ventana=3)
+    for precio in (1.10001, 1.10002, 1.10003, 1.10004):
+        registro.registrar('EURUSD', APERTURA, _ejecutada(precio), 12.5, desviacion=20, precio_solicitado=1.1,
+                           es_compra=True, punto=PUNTO)
+    registro.registrar('GBPUSD', CIERRE, None, 80.0, desviacion=70000)
+    registro.registrar('GBPUSD', APERTURA, SimpleNamespace(retcode=mt5_simulado.TRADE_RETCODE_REQUOTE, price=0.0), 5.0)
+    assert (tmp_path / 'calidad.bin').stat().st_size == 6 * DTYPE_EJECUCION.itemsize
+
+    recargado = RegistroEjecucion(ruta, ventana=3, percentil=100, desviacion_min=0)
+    leidos = recargado.leer()
+    assert len(leidos) == 6
+    np.testing.assert_allclose(leidos['deslizamiento'][:4], [1, 2, 3, 4], rtol=1e-3)
+    assert list(leidos['simbolo']) == [0, 0, 0, 0, 1, 1]
+    assert leidos['retcode'][4] == -1 and leidos['desviacion'][4] == 65535
+    assert list(leidos['recotizacion']) == [0, 0, 0, 0, 0, 1]
+    assert list(recargado._recientes['EURUSD']) == pytest.approx([2, 3, 4], rel=1e-3)
+    assert recargado.desviacion('EURUSD', None, PUNTO) == 4
+
+    reporte = recargado.reporte()
+    eurusd = reporte.xs('EURUSD', level='simbolo').iloc[0]
+    gbpusd = reporte.xs('GBPUSD', level='simbolo').iloc[0]
+    assert eurusd['envios'] == 4 and eurusd['coste_puntos'] == pytest.approx(10, rel=1e-3)
+    assert eurusd['tasa_fallo'] == 0
+    assert gbpusd['recotizaciones'] == 1 and gbpusd['tasa_fallo'] == 1
+    assert reporte.index[0][0] == 'EURUSD'  # Ordenado por el coste acumulado en contra
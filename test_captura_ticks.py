@@ -0,0 +1,96 @@
+# test_captura_ticks.py
+import time
+import numpy as np
+import pytest
+import mt5_simulado
+from captura_ticks import CapturaTicks, leer_ticks, DTYPE_INDICE
+
+HOY_MSC = int(time.time()) // 86400 * 86400 * 1000
+
+@pytest.fixture
+def terminal():
+    mt5_simulado.reiniciar()
+    yield mt5_simulado
+    mt5_simulado.reiniciar()
+
+def _generar(desde_msc, hasta_msc, n, semilla):
+    """Ticks ordenados con varios ticks en el mismo milisegundo."""
+    rng = np.random.default_rng(semilla)
+    tiempos = np.sort(rng.integers(desde_msc, hasta_msc, n))
+    tiempos[1::5] = tiempos[0::5][:len(tiempos[1::5])]
+    bid = 1.1 + rng.normal(0, 0.0001, n).cumsum()
+    return tiempos, bid, bid + 0.0001
+
+def _leidos(directorio, desde=None, hasta=None):
+    bloques = list(leer_ticks('EURUSD', desde, hasta, directorio=str(directorio)))
+    return np.concatenate(bloques) if bloques else np.empty(0)
+
+def _captura(directorio):
+    return CapturaTicks(str(directorio), ticks_por_bloque=64, lote=150, nivel_compresion=1)
+
+def test_ida_y_vuelta_y_lectura_por_rango(terminal, tmp_path):
+    # Dos días cerrados (copy_ticks_range) y el día en curso (copy_ticks_from en lotes)
+    tiempos, bid, ask = _generar(HOY_MSC - 2 * 86400 * 1000, int(time.time() * 1000) - 1000, 3000, 1)
+    terminal.definir_ticks('EURUSD', tiempos, bid, ask)
+    captura = _captura(tmp_path)
+    assert captura.capturar('EURUSD', desde=int(tiempos[0])) == len(tiempos)
+    captura.vaciar()
+
+    leidos = _leidos(tmp_path)
+    np.testing.assert_array_equal(leidos['time_msc'], tiempos)
+    np.testing.assert_array_equal(leidos['bid'], bid)
+    np.testing.assert_array_equal(leidos['ask'], ask)
+    assert captura.total('EURUSD') == len(tiempos)
+    assert len(list((tmp_path / 'EURUSD').glob('*.ticks'))) == 3
+
+    # El rango empieza y termina a mitad de bloque y abarca un cambio de día
+    desde, hasta = int(tiempos[700]), int(tiempos[2500])
+    esperados = tiempos[(tiempos >= desde) & (tiempos <= hasta)]
+    np.testing.assert_array_equal(_leidos(tmp_path, desde, hasta)['time_msc'], esperados)
+
+def test_recaptura_sin_duplicados(terminal, tmp_path):
+    tiempos, bid, ask = _generar(HOY_MSC - 86400 * 1000, HOY_MSC + 1000, 1000, 2)
+    terminal.definir_ticks('EURUSD', tiempos, bid, ask)
+    captura = _captura(tmp_path)
+    captura.capturar('EURUSD', desde=int(tiempos[0]))
+    captura.vaciar()
+
+    # Nuevos ticks, el primero en el mismo milisegundo que el último capturado
+    mas_tiempos = np.concatenate([[tiempos[-1]], tiempos[-1] + np.arange(1, 400)])
+    terminal.definir_ticks('EURUSD', mas_tiempos, 1.2, 1.2001)
+    otra = _captura(tmp_path)  # Otro proceso: continúa desde el cursor guardado
+    assert otra.capturar('EURUSD') == len(mas_tiempos)
+    assert otra.capturar('EURUSD') == 0
+    otra.vaciar()
+
+    leidos = _leidos(tmp_path)
+    np.testing.assert_array_equal(leidos['time_msc'], np.concatenate([tiempos, mas_tiempos]))
+    assert otra.total('EURUSD') == len(tiempos) + len(mas_tiempos)
+
+def test_recuperacion_de_un_bloque_cortado(terminal, tmp_path):
+    tiempos, bid, ask = _generar(HOY_MSC, HOY_MSC + 1000 * 1000, 1000, 3)
+    terminal.definir_ticks('EURUSD', tiempos, bid, ask)
+    captura = _captura(tmp_path)
+    captura.capturar('EURUSD', desde=int(tiempos[0]))
+    # Sin vaciar(): el bloque incompleto se pierde con el proceso y se vuelve a descargar
+    escritos = captura.total('EURUSD')
+    assert escritos == len(tiempos) - len(tiempos) % 64
+
+    # Corte a mitad de escritura: bytes de un bloque y media fila de índice sin confirmar en el cursor
+    carpeta = tmp_path / 'EURUSD'
+    ruta_datos = next(carpeta.glob('*.ticks'))
+    ruta_indice = next(carpeta.glob('*.idx'))
+    with open(ruta_datos, 'ab') as f:
+        f.write(b'\x78\x9c' + bytes(range(200)))
+    with open(ruta_indice, 'ab') as f:
+        f.write(b'\x01' * (DTYPE_INDICE.itemsize // 2))
+    # La lectura ignora la fila incompleta
+    np.testing.assert_array_equal(_leidos(tmp_path)['time_msc'], tiempos[:escritos])
+
+    otra = _captura(tmp_path)
+    assert otra.capturar('EURUSD') == len(tiempos) - escritos
+    otra.vaciar()
+    assert ruta_indice.stat().st_size % DTYPE_INDICE.itemsize == 0
+    leidos = _leidos(tmp_path)
+    np.testing.assert_array_equal(leidos['time_msc'], tiempos)
+    np.testing.assert_array_equal(leidos['bid'], bid)
@@ -0,0 +1,153 @@
+# test_coordinador.py
+import csv
+import threading
+import pytest
+import coordinador
+import mt5_simulado
+import registro_operaciones
+import trading_agent
+from coordinador import GestionRiesgoCompartida, VistaTrabajador, posiciones_propias, crear_servidor, conectar_coordinador
+from gestion_riesgo import GestionRiesgo
+
+MAGICO_A, MAGICO_B = 770001, 770002
+
+@pytest.fixture
+def terminal(monkeypatch):
+    """Un único terminal simulado compartido por los trabajadores de la prueba."""
+    mt5_simulado.reiniciar()
+    mt5_simulado.definir_simbolo('EURUSD', 1.1000, 1.1001)
+    monkeypatch.setattr(trading_agent, 'mt5', mt5_simulado)
+    monkeypatch.setattr(registro_operaciones, 'mt5', mt5_simulado)
+    monkeypatch.setattr(trading_agent, 'enviar_notificacion', lambda mensaje: None)
+    monkeypatch.setattr(trading_agent, 'registro_ejecucion', None)
+    monkeypatch.setattr(registro_operaciones, '_tickets_registrados', set())
+    yield mt5_simulado
+    for ticket in list(registro_operaciones.ordenes_en_curso._por_ticket):
+        registro_operaciones.ordenes_en_curso.eliminar(ticket)
+    mt5_simulado.reiniciar()
+
+def _compartida(max_operaciones=2, limite_global=100, ruta_csv=None):
+    return GestionRiesgoCompartida(GestionRiesgo(limite_global=limite_global), max_operaciones, ruta_csv)
+
+def _abrir(monkeypatch, vista, numero_magico):
+    """ejecutar_orden tal y como la llama el trabajador con ese "magic"."""
+    monkeypatch.setattr(trading_agent, '_numero_magico', numero_magico)
+    trading_agent.ejecutar_orden('EURUSD', mt5_simulado.ORDER_TYPE_BUY, 1.0980, 1.1040, 10000, 1,
+                                 'estrategia', vista, coordinador=vista)
+
+def _sincronizar(vista, numero_magico):
+    """Sincronización de la FASE 1 del bucle del trabajador."""
+    vista.sincronizar_posiciones([p.ticket for p in posiciones_propias(mt5_simulado.positions_get(), numero_magico)])
+
+def test_reserva_respeta_el_maximo_entre_trabajadores():
+    compartida = _compartida(max_operaciones=2)
+    a, b = VistaTrabajador(compartida, 'A'), VistaTrabajador(compartida, 'B')
+
+    reserva_a = a.reservar_slot('EURUSD', 'estrategia')
+    reserva_b = b.reservar_slot('GBPUSD', 'estrategia')
+    assert reserva_a and reserva_b
+    assert a.reservar_slot('USDJPY', 'estrategia') is None
+
+    b.liberar_slot(reserva_b)
+    assert a.reservar_slot('USDJPY', 'estrategia') is not None
+
+def test_posicion_cerrada_libera_el_hueco_al_sincronizar():
+    compartida = _compartida(max_operaciones=1)
+    a, b = VistaTrabajador(compartida, 'A'), VistaTrabajador(compartida, 'B')
+
+    a.confirmar_slot(a.reservar_slot('EURUSD', 'estrategia'), 1001)
+    assert b.reservar_slot('GBPUSD', 'estrategia') is None
+    a.sincronizar_posiciones([])  # La posición de A se cerró en su terminal
+    assert b.reservar_slot('GBPUSD', 'estrategia') is not None
+
+def test_reserva_de_un_trabajador_caido_se_descarta_al_sincronizar():
+    compartida = _compartida(max_operaciones=1)
+    a, b = VistaTrabajador(compartida, 'A'), VistaTrabajador(compartida, 'B')
+
+    assert a.reservar_slot('EURUSD', 'estrategia') is not None  # A cae antes de confirmar o liberar
+    assert b.reservar_slot('GBPUSD', 'estrategia') is None
+    b.sincronizar_posiciones([])  # La sincronización de otro trabajador no toca la reserva de A
+    assert compartida.slots_en_uso() == 1
+
+    VistaTrabajador(compartida, 'A').sincronizar_posiciones([])  # A reiniciado
+    assert b.reservar_slot('GBPUSD', 'estrategia') is not None
+
+def test_reserva_sin_confirmar_caduca(monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr(coordinador.time, 'monotonic', lambda: reloj[0])
+    compartida = GestionRiesgoCompartida(GestionRiesgo(limite_global=100), 1, ttl_reserva=120)
+    a, b = VistaTrabajador(compartida, 'A'), VistaTrabajador(compartida, 'B')
+
+    assert a.reservar_slot('EURUSD', 'estrategia') is not None  # A desaparece sin volver a sincronizar
+    reloj[0] += 119
+    assert b.reservar_slot('GBPUSD', 'estrategia') is None
+    reloj[0] += 1
+    assert compartida.resumen()['slots_en_uso'] == 0
+    assert b.reservar_slot('GBPUSD', 'estrategia') is not None
+
+def test_limite_diario_compartido_bloquea_a_todos_los_trabajadores():
+    compartida = _compartida(max_operaciones=5, limite_global=100)
+    a, b = VistaTrabajador(compartida, 'A'), VistaTrabajador(compartida, 'B')
+
+    a.registrar_operacion('estrategia', -60)
+    assert b.puede_operar()
+    b.registrar_operacion('estrategia', -50)
+    assert a.motivo_bloqueo() == "limite_diario"
+    assert a.reservar_slot('EURUSD', 'estrategia') is None
+
+def test_terminal_compartido_no_cuenta_dos_veces_las_posiciones(terminal, monkeypatch):
+    compartida = _compartida(max_operaciones=3)
+    a, b = VistaTrabajador(compartida, 'A'), VistaTrabajador(compartida, 'B')
+
+    _abrir(monkeypatch, a, MAGICO_A)
+    _abrir(monkeypatch, b, MAGICO_B)
+    assert {p.magic for p in terminal.positions_get()} == {MAGICO_A, MAGICO_B}
+
+    _sincronizar(a, MAGICO_A)
+    _sincronizar(b, MAGICO_B)
+    assert compartida.slots_en_uso() == 2
+
+    # Queda un hueco: una tercera orden entra y la cuarta no
+    _abrir(monkeypatch, a, MAGICO_A)
+    _abrir(monkeypatch, b, MAGICO_B)
+    assert terminal.positions_total() == 3
+    assert compartida.resumen()['posiciones_por_trabajador'] == {'A': 2, 'B': 1}
+
+    # Al cerrarse la posición de B, el hueco vuelve al presupuesto común
+    ticket_b = posiciones_propias(terminal.positions_get(), MAGICO_B)[0].ticket
+    terminal.cerrar_posicion(ticket_b, 1.1010)
+    _sincronizar(b, MAGICO_B)
+    assert compartida.slots_en_uso() == 2
+    _abrir(monkeypatch, b, MAGICO_B)
+    assert terminal.positions_total() == 3
+
+def test_operaciones_cerradas_se_escriben_en_el_coordinador(terminal, monkeypatch, tmp_path):
+    ruta_csv = tmp_path / 'operaciones.csv'
+    compartida = _compartida(max_operaciones=3, ruta_csv=str(ruta_csv))
+    a, b = VistaTrabajador(compartida, 'A'), VistaTrabajador(compartida, 'B')
+    # Los trabajadores nunca escriben el CSV
+    monkeypatch.setattr(registro_operaciones, 'escribir_operacion_cerrada', None)
+
+    _abrir(monkeypatch, a, MAGICO_A)
+    _abrir(monkeypatch, b, MAGICO_B)
+    for posicion, precio in zip(terminal.positions_get(), (1.0995, 1.1011)):
+        terminal.cerrar_posicion(posicion.ticket, precio)
+    registro_operaciones.monitorear_y_registrar_operaciones_cerradas(a, coordinador=a)
+
+    with open(ruta_csv, newline='') as f:
+        filas = list(csv.DictReader(f))
+    assert len(filas) == 2
+    assert compartida.riesgo.perdida_global == pytest.approx(sum(float(f['resultado_dinero']) for f in filas))
+
+def test_vistas_remotas_comparten_el_presupuesto():
+    compartida = _compartida(max_operaciones=1)
+    servidor = crear_servidor(compartida, ('127.0.0.1', 0), b'prueba')
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    a = conectar_coordinador('A', servidor.address, b'prueba')
+    b = conectar_coordinador('B', servidor.address, b'prueba')
+    reserva = a.reservar_slot('EURUSD', 'estrategia')
+    assert reserva is not None
+    assert b.reservar_slot('GBPUSD', 'estrategia') is None
+    a.liberar_slot(reserva)
+    assert b.reservar_slot('GBPUSD', 'estrategia') is not None
@@ -0,0 +1,90 @@
+# test_curva_equidad.py
+import os
+import time
+import numpy as np
+from curva_equidad import CurvaEquidad
+from gestion_riesgo import GestionRiesgo
+
+def _curva_con_operaciones(ruta, n=300):
+    curva = CurvaEquidad(ruta=str(ruta), capital_inicial=10000, ventana_horas=24)
+    rng = np.random.default_rng(7)
+    ahora = time.time()
+    # Operaciones de los últimos dos días: parte de ellas queda fuera de la ventana de 24 h
+    for i, resultado in enumerate(rng.normal(0, 50, n)):
+        estrategia = ('A', 'B', 'C')[i % 3]
+        curva.registrar(estrategia, float(resultado), tiempo=ahora - 48 * 3600 + i * (48 * 3600 / n))
+    return curva
+
+def test_carga_reconstruye_el_mismo_estado(tmp_path):
+    curva = _curva_con_operaciones(tmp_path / 'curva.bin')
+    recargada = CurvaEquidad(ruta=str(tmp_path / 'curva.bin'), capital_inicial=10000, ventana_horas=24)
+
+    assert len(recargada) == len(curva)
+    assert recargada.realizada == curva.realizada
+    assert recargada.pico == curva.pico
+    assert recargada.max_drawdown == curva.max_drawdown
+    assert recargada.rachas == curva.rachas
+    assert recargada.drawdown_ventana() == curva.drawdown_ventana()
+    assert list(recargada._maximos_ventana) == list(curva._maximos_ventana)
+
+def test_rachas_al_cargar(tmp_path):
+    curva = CurvaEquidad(ruta=str(tmp_path / 'curva.bin'), capital_inicial=1000)
+    for estrategia, resultado in [('A', 10), ('A', -5), ('B', 3), ('A', -2), ('A', -1), ('B', 4), ('B', 0)]:
+        curva.registrar(estrategia, resultado)
+    recargada = CurvaEquidad(ruta=str(tmp_path / 'curva.bin'), capital_inicial=1000)
+    assert recargada.rachas == {'A': -3, 'B': 3}
+
+def test_flotante_persistido_tras_reiniciar(tmp_path):
+    curva = CurvaEquidad(ruta=str(tmp_path / 'curva.bin'), capital_inicial=1000)
+    curva.registrar('A', 100)
+    curva.actualizar_flotante(300)   # Pico con flotante: 1400
+    curva.actualizar_flotante(-50)   # Equidad 1050: drawdown de 350
+    curva.guardar()                  # Al detener el agente
+
+    recargada = CurvaEquidad(ruta=str(tmp_path / 'curva.bin'), capital_inicial=1000)
+    assert recargada.flotante == -50
+    assert recargada.pico == 1400
+    assert recargada.max_drawdown == 350
+    assert recargada.drawdown_actual == 350
+
+def test_flotante_se_escribe_como_mucho_una_vez_por_intervalo(tmp_path):
+    ruta = str(tmp_path / 'curva.bin')
+    curva = CurvaEquidad(ruta=ruta, capital_inicial=1000, intervalo_guardado=30)
+    flotante_guardado = lambda: CurvaEquidad(ruta=ruta, capital_inicial=1000).flotante
+
+    curva.actualizar_flotante(10, ahora=100)   # Primera escritura
+    curva.actualizar_flotante(20, ahora=110)
+    curva.actualizar_flotante(-5, ahora=125)
+    assert flotante_guardado() == 10
+    curva.actualizar_flotante(-5, ahora=131)   # Sin cambios, pero con el cambio anterior pendiente
+    assert flotante_guardado() == -5
+    os.remove(ruta + '.flotante')
+    curva.actualizar_flotante(-5, ahora=200)   # Nada pendiente: no se reescribe
+    assert not os.path.exists(ruta + '.flotante')
+
+    # Una operación cerrada escribe el flotante pendiente sin esperar al intervalo
+    curva.actualizar_flotante(7, ahora=210)
+    curva.actualizar_flotante(8, ahora=220)
+    assert flotante_guardado() == 7
+    curva.registrar('A', 3)
+    assert flotante_guardado() == 8
+
+    # Y al detener el agente
+    curva.actualizar_flotante(9)
+    assert flotante_guardado() == 8
+    curva.guardar()
+    assert flotante_guardado() == 9
+
+def test_motivo_bloqueo_distingue_drawdown_de_limite_diario():
+    curva = CurvaEquidad(capital_inicial=10000)
+    riesgo = GestionRiesgo(limite_global=500, capital_inicial=10000, curva_equidad=curva, limite_drawdown=300)
+    assert riesgo.motivo_bloqueo() is None
+
+    # Pérdida flotante: drawdown en la ventana sin pérdida realizada en el día
+    riesgo.actualizar_flotante(-400)
+    assert riesgo.motivo_bloqueo() == "drawdown_ventana"
+    assert not riesgo.puede_operar()
+
+    riesgo.actualizar_flotante(0)
+    riesgo.registrar_operacion('A', -600)
+    assert riesgo.motivo_bloqueo() == "limite_diario"
@@ -0,0 +1,73 @@
+# test_gestor_riesgo_en_operacion.py
+import time
+import numpy as np
+from gestor_riesgo_en_operacion import GestorRiesgoEnOperacion
+
+def _posiciones():
+    return [
+        {'ticket': 1, 'precio_entrada': 1.1000, 'stop_actual': 1.0950, 'precio_actual': 1.1040, 'tipo': 'compra', 'atr_value': 0.0010},
+        {'ticket': 2, 'precio_entrada': 1.2000, 'stop_actual': 1.2050, 'precio_actual': 1.1990, 'tipo': 'venta', 'atr_value': 0.0020},
+    ]
+
+def test_lote_sin_modelo_coincide_con_actualizar_stop():
+    gestor = GestorRiesgoEnOperacion()
+    resultados = gestor.actualizar_stops_lote(_posiciones())
+    for p, (stop, cerrar) in zip(_posiciones(), resultados):
+        assert stop == gestor.actualizar_stop(p['precio_entrada'], p['stop_actual'], p['precio_actual'], p['tipo'], p['atr_value'])
+        assert not cerrar
+
+def test_lote_aplica_modelo_ia_por_posicion_sin_modelo_por_lotes():
+    # Solo sugiere en las compras
+    modelo_ia = lambda entrada, stop, precio, tipo: entrada + 0.0005 if tipo == 'compra' else None
+    gestor = GestorRiesgoEnOperacion(modelo_ia=modelo_ia)
+    resultados = gestor.actualizar_stops_lote(_posiciones())
+    assert resultados[0] == (1.1005, False)
+    p = _posiciones()[1]
+    assert resultados[1][0] == gestor.actualizar_stop(p['precio_entrada'], p['stop_actual'], p['precio_actual'], p['tipo'], p['atr_value'])
+
+def test_modelo_por_lotes_fuera_de_plazo_usa_reglas():
+    def modelo_lento(X):
+        time.sleep(0.2)
+        return np.full(len(X), 9.9), np.ones(len(X), dtype=bool)
+    gestor = GestorRiesgoEnOperacion(modelo_ia_lote=modelo_lento, tiempo_limite_ia=0.01)
+    reglas = GestorRiesgoEnOperacion().actualizar_stops_lote(_posiciones())
+    assert gestor.actualizar_stops_lote(_posiciones()) == reglas
+    assert gestor.plazos_incumplidos == 1
+    gestor.cerrar()
+
+def _tres_posiciones():
+    # Tickets desordenados: las sugerencias se asignan por fila, no por número de ticket
+    return [
+        {'ticket': 30, 'precio_entrada': 1.1000, 'stop_actual': 1.0950, 'precio_actual': 1.1040, 'tipo': 'compra', 'atr_value': 0.0010},
+        {'ticket': 10, 'precio_entrada': 1.2000, 'stop_actual': 1.2050, 'precio_actual': 1.1990, 'tipo': 'venta', 'atr_value': 0.0020},
+        {'ticket': 20, 'precio_entrada': 1.3000, 'stop_actual': 1.2900, 'precio_actual': 1.3010, 'tipo': 'compra', 'atr_value': 0.0010},
+    ]
+
+def test_modelo_por_lotes_en_plazo_se_aplica_a_cada_posicion():
+    recibidas = []
+    def modelo(X):
+        # Cada fila se identifica por su precio de entrada: stop a 10 pips de la entrada para las compras,
+        # NaN (sin sugerencia) para la venta, y cerrar solo la posición que entró a 1.3000
+        recibidas.append(X.copy())
+        stops = np.where(X[:, -1] == 1.0, X[:, 1] + 0.0010, np.nan)
+        return stops, np.isclose(X[:, 1], 1.3000)
+    gestor = GestorRiesgoEnOperacion(modelo_ia_lote=modelo, tiempo_limite_ia=1.0)
+    posiciones = _tres_posiciones()
+    reglas = GestorRiesgoEnOperacion().actualizar_stops_lote(posiciones)
+    resultados = dict(zip([p['ticket'] for p in posiciones], gestor.actualizar_stops_lote(posiciones, ahora=0)))
+
+    assert resultados[30] == (1.1010, False)
+    assert resultados[10] == (reglas[1][0], False)  # NaN: se mantiene el stop por reglas
+    assert resultados[20] == (1.3010, True)
+    assert gestor.plazos_incumplidos == 0
+    assert recibidas[0].shape == (3, len(gestor.columnas_caracteristicas))
+    np.testing.assert_array_equal(recibidas[0][:, 1], [1.1000, 1.2000, 1.3000])
+    gestor.cerrar()
+
+def test_modelo_por_lotes_con_tamano_incorrecto_usa_reglas():
+    modelo = lambda X: (np.full(len(X) - 1, 9.9), np.ones(len(X), dtype=bool))
+    gestor = GestorRiesgoEnOperacion(modelo_ia_lote=modelo, tiempo_limite_ia=1.0)
+    reglas = GestorRiesgoEnOperacion().actualizar_stops_lote(_tres_posiciones())
+    assert gestor.actualizar_stops_lote(_tres_posiciones()) == reglas
+    assert all(not cerrar for _, cerrar in reglas)
+    gestor.cerrar()
@@ -0,0 +1,66 @@
+# test_log_estructurado.py
+import json
+import logging
+import pytest
+from log_estructurado import configurar_logging, log_evento, ResumenCiclo
+
+@pytest.fixture
+def raiz():
+    """Restaura los manejadores del logger raíz que configurar_logging sustituye."""
+    logger = logging.getLogger()
+    manejadores, nivel = list(logger.handlers), logger.level
+    yield logger
+    for manejador in list(logger.handlers):
+        logger.removeHandler(manejador)
+    for manejador in manejadores:
+        logger.addHandler(manejador)
+    logger.setLevel(nivel)
+
+def _registros(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f]
+
+def test_modo_silencioso_una_linea_json_por_ciclo(raiz, tmp_path):
+    ruta = tmp_path / 'agente.log'
+    escritor = configurar_logging(str(ruta))
+    resumen = ResumenCiclo(silencioso=True)
+    for _ in range(2):
+        for simbolo in ('EURUSD', 'EURUSD', 'GBPUSD'):
+            resumen.registrar_analisis(simbolo, 'estrategia', None, latencia_ms=1.5)
+        resumen.registrar_analisis('USDJPY', 'estrategia', 'compra')
+        resumen.registrar_descarte('AUDUSD', 'spread 45 > 30')
+        resumen.emitir({'gestion': 2.0, 'senales': 3.5})
+    try:
+        raise ValueError("fallo de prueba")
+    except ValueError:
+        logging.error("Ocurrió un error: %s", "detalle", exc_info=True)
+    log_evento(logging.DEBUG, "no se registra", simbolo='EURUSD')
+    escritor.stop()
+    escritor.stop()  # Detenerlo de nuevo (como hace atexit) no falla
+    assert not escritor.activo
+
+    registros = _registros(ruta)
+    ciclos = [r for r in registros if r.get('fase') == 'ciclo']
+    assert len(ciclos) == 2
+    assert len(registros) == 3
+    assert ciclos[0]['mensaje'] == ("Ciclo: 4 análisis, 1 señales, sin señal: EURUSDx2, GBPUSD, "
+                                    "descartados: AUDUSD (spread 45 > 30) | gestion=2.0ms senales=3.5ms")
+    assert ciclos[0]['latencia_ms'] == 5.5
+    assert ciclos[0]['nivel'] == 'INFO' and 'ts' in ciclos[0]
+    assert 'simbolo' not in ciclos[0]
+    assert registros[2]['mensaje'] == "Ocurrió un error: detalle"
+    assert 'ValueError: fallo de prueba' in registros[2]['excepcion']
+
+def test_modo_detallado_registra_cada_analisis(raiz, tmp_path):
+    ruta = tmp_path / 'agente.log'
+    escritor = configurar_logging(str(ruta))
+    resumen = ResumenCiclo(silencioso=False)
+    resumen.registrar_analisis('EURUSD', 'estrategia', None, latencia_ms=1.5)
+    resumen.registrar_descarte('AUDUSD', 'mercado parado')
+    resumen.emitir()
+    escritor.stop()
+
+    registros = _registros(ruta)
+    assert [r['fase'] for r in registros] == ['senales', 'prefiltro', 'ciclo']
+    assert registros[0]['simbolo'] == 'EURUSD' and registros[0]['estrategia'] == 'estrategia'
+    assert registros[0]['latencia_ms'] == 1.5
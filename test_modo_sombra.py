@@ -0,0 +1,84 @@
+# test_modo_sombra.py
+import time
+import pandas as pd
+import pytest
+import mt5_simulado
+import prefiltro
+import trading_agent
+from gestor_riesgo_en_operacion import GestorRiesgoEnOperacion
+from modo_sombra import CarteraSombra, PosicionSombra
+
+@pytest.fixture
+def terminal(monkeypatch):
+    mt5_simulado.reiniciar()
+    monkeypatch.setattr(prefiltro, 'mt5', mt5_simulado)
+    yield mt5_simulado
+    mt5_simulado.reiniciar()
+
+def _cartera(tmp_path):
+    cartera = CarteraSombra(GestorRiesgoEnOperacion(), ruta_csv=str(tmp_path / 'sombra.csv'))
+    cartera.posiciones[('sombra', 'EURUSD')] = PosicionSombra(
+        ticket=-1, simbolo='EURUSD', estrategia='sombra', tipo='compra', precio_apertura=1.1000,
+        stop_loss=1.0980, take_profit=1.1040, lote=0.1, punto=0.00001, valor_tick=1.0, fecha_apertura=time.time()
+    )
+    return cartera
+
+def test_sombra_se_gestiona_con_el_agente_detenido(terminal, monkeypatch, tmp_path):
+    # La vela del ciclo tocó el stop aunque el precio actual ya esté por encima
+    df = pd.DataFrame({'high': [1.1010, 1.1005], 'low': [1.0995, 1.0975], 'close': [1.1000, 1.0990], 'ATR': [0.0010, 0.0010]},
+                      index=pd.to_datetime([time.time() - 60, time.time()], unit='s'))
+    pedidos = []
+    monkeypatch.setattr(trading_agent, 'obtener_datos', lambda simbolo, timeframe, num_velas: pedidos.append(simbolo) or df)
+    monkeypatch.setattr(trading_agent, 'calcular_indicadores', lambda datos, **kwargs: datos)
+    terminal.definir_simbolo('EURUSD', 1.0990, 1.0991)
+    cartera = _cartera(tmp_path)
+
+    # Ciclo detenido por el límite diario: sin instantáneas ni indicadores del análisis de señales
+    trading_agent.gestionar_sombra(cartera, {'EURUSD'}, {}, {}, obtener_faltantes=True)
+
+    assert pedidos == ['EURUSD']
+    assert not cartera.posiciones
+    assert cartera.cerradas == 1
+    assert cartera.resultados['sombra'] == pytest.approx(-200.0 * 0.1)
+
+def test_sombra_sin_indicadores_no_pide_velas_en_ciclo_normal(terminal, monkeypatch, tmp_path):
+    monkeypatch.setattr(trading_agent, 'obtener_datos', lambda *args: pytest.fail("no debe pedir velas"))
+    terminal.definir_simbolo('EURUSD', 1.1010, 1.1011)
+    cartera = _cartera(tmp_path)
+
+    trading_agent.gestionar_sombra(cartera, {'EURUSD'}, {}, {})
+    assert list(cartera.posiciones) == [('sombra', 'EURUSD')]
+
+class _GestorTrailing:
+    """Sube el stop de todas las posiciones a un nivel fijo."""
+    def __init__(self, stop):
+        self.stop = stop
+
+    def actualizar_stops_lote(self, posiciones):
+        return [(max(p['stop_actual'], self.stop), False) for p in posiciones]
+
+def _velas(*velas):
+    inicio = 1_700_000_000
+    return pd.DataFrame([{'high': h, 'low': l, 'close': c, 'ATR': 0.0010} for h, l, c in velas],
+                        index=pd.to_datetime([inicio + 900 * i for i in range(len(velas))], unit='s'))
+
+def _instantanea(bid):
+    return prefiltro.InstantaneaSimbolo('EURUSD', time.time(), bid, bid + 0.0001, 10, 0.00001, 0, 1.0)
+
+def test_stop_subido_en_la_misma_vela_no_se_toca_con_precios_anteriores(tmp_path):
+    cartera = _cartera(tmp_path)
+    cartera.gestor_riesgo_op = _GestorTrailing(1.1010)
+
+    # Ciclo 1: la vela ya bajó a 1.0985 (por encima del SL 1.0980); el stop se sube a 1.1010
+    cartera.gestionar({'EURUSD': _instantanea(1.1030)}, {'EURUSD': _velas((1.1035, 1.0985, 1.1030))})
+    assert cartera.posiciones[('sombra', 'EURUSD')].stop_loss == 1.1010
+
+    # Ciclo 2, misma vela: su mínimo es anterior a la subida del stop y no debe cerrar la posición
+    cartera.gestionar({'EURUSD': _instantanea(1.1025)}, {'EURUSD': _velas((1.1038, 1.0985, 1.1025))})
+    assert cartera.cerradas == 0
+
+    # Ciclo 3: una vela cerrada entre ciclos bajó hasta 1.1005 y el precio actual ya se recuperó
+    cartera.gestionar({'EURUSD': _instantanea(1.1030)},
+                      {'EURUSD': _velas((1.1038, 1.0985, 1.1025), (1.1028, 1.1005, 1.1020), (1.1032, 1.1018, 1.1030))})
+    assert not cartera.posiciones
+    assert cartera.resultados['sombra'] == pytest.approx(100.0 * 0.1)
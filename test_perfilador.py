@@ -0,0 +1,54 @@
+# test_perfilador.py
+import time
+from perfilador import PerfiladorMuestreo
+
+def _trabajo_del_ciclo(retenidos):
+    limite = time.perf_counter() + 0.15
+    while time.perf_counter() < limite:
+        sum(range(1000))
+    retenidos.append([0] * 50000)
+
+def _espera_entre_ciclos():
+    time.sleep(0.15)
+
+def test_perfila_los_ciclos_pedidos_sin_muestrear_la_espera(tmp_path):
+    perfilador = PerfiladorMuestreo(str(tmp_path), frecuencia_hz=200, ciclos=2)
+    perfilador.solicitar()
+    retenidos = []
+    for _ in range(3):
+        perfilador.inicio_ciclo()
+        _trabajo_del_ciclo(retenidos)
+        perfilador.fin_ciclo()
+        perfilador.fin_ciclo()  # Una salida anticipada que repite la llamada no cuenta otro ciclo
+        _espera_entre_ciclos()
+    assert not perfilador.activo()
+
+    plegado = next(tmp_path.glob('*.folded')).read_text(encoding='utf-8')
+    assert '_trabajo_del_ciclo' in plegado
+    assert '_espera_entre_ciclos' not in plegado
+    for linea in plegado.splitlines():
+        pila, muestras = linea.rsplit(' ', 1)
+        assert pila and int(muestras) > 0
+
+    resumen = next(tmp_path.glob('*_resumen.txt')).read_text(encoding='utf-8')
+    assert resumen.startswith('Muestras: ')
+    assert '_trabajo_del_ciclo' in resumen
+
+    memoria = next(tmp_path.glob('*_memoria.txt')).read_text(encoding='utf-8')
+    assert '--- Ciclo 1:' in memoria and '--- Ciclo 2:' in memoria
+    assert '--- Ciclo 3:' not in memoria
+    assert 'test_perfilador.py' in memoria
+
+def test_archivo_de_control_activa_el_perfilado(tmp_path):
+    control = tmp_path / 'perfilar.ctl'
+    perfilador = PerfiladorMuestreo(str(tmp_path / 'perfiles'), archivo_control=str(control), memoria=False)
+    perfilador.inicio_ciclo()
+    perfilador.fin_ciclo()
+    assert not perfilador.activo()
+
+    control.write_text('1', encoding='utf-8')
+    perfilador.inicio_ciclo()
+    assert perfilador.activo() and not control.exists()
+    perfilador.fin_ciclo()
+    assert not perfilador.activo()
+    assert len(list((tmp_path / 'perfiles').glob('*.folded'))) == 1
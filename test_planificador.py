@@ -0,0 +1,76 @@
+# test_planificador.py
+import pytest
+import planificador
+from planificador import PlanificadorCiclo
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(planificador.time, 'monotonic', reloj)
+    return reloj
+
+def _tareas():
+    return [('sombra', 'EURUSD', -1), ('A', 'EURUSD', 0), ('B', 'EURUSD', 5), ('A', 'GBPUSD', 0)]
+
+def _ejecutar(plan, reloj, tareas, segundos_por_tarea):
+    ejecutadas = []
+    for tarea in plan.ejecutar(tareas, clave=lambda t: (t[0], t[1]), prioridad=lambda t: t[2]):
+        ejecutadas.append(tarea)
+        reloj.ahora += segundos_por_tarea
+    return ejecutadas
+
+def test_orden_por_prioridad(reloj):
+    plan = PlanificadorCiclo(presupuesto_segundos=45, intervalo_segundos=60)
+    plan.iniciar_ciclo()
+    ejecutadas = _ejecutar(plan, reloj, _tareas(), 1)
+    assert [t[2] for t in ejecutadas] == [5, 0, 0, -1]
+    assert plan.aplazadas_ultimo == 0
+
+def test_aplazadas_por_presupuesto_van_primero_en_el_ciclo_siguiente(reloj, monkeypatch):
+    monkeypatch.setattr(planificador.time, 'time', reloj)
+    plan = PlanificadorCiclo(presupuesto_segundos=10, intervalo_segundos=60)
+    plan.iniciar_ciclo()
+    primero = _ejecutar(plan, reloj, _tareas(), 6)
+    assert len(primero) == 2
+    assert plan.aplazadas_ultimo == 2
+    assert plan.aplazadas_total == 2
+    plan.finalizar_ciclo()
+
+    reloj.ahora += 60
+    plan.iniciar_ciclo()
+    segundo = _ejecutar(plan, reloj, _tareas(), 6)
+    # A igual prioridad, la tarea de prioridad 0 que no se ejecutó en el ciclo anterior pasa delante
+    aplazada_prioridad_0 = next(t for t in _tareas() if t[2] == 0 and t not in primero)
+    assert segundo[:2] == [('B', 'EURUSD', 5), aplazada_prioridad_0]
+    assert plan.aplazadas_total == 4
+
+def test_excesos_y_espera(reloj):
+    plan = PlanificadorCiclo(presupuesto_segundos=10, intervalo_segundos=60)
+    plan.iniciar_ciclo()
+    reloj.ahora += 4
+    assert plan.finalizar_ciclo() == 56
+    assert plan.excesos == 0
+
+    plan.iniciar_ciclo()
+    reloj.ahora += 15
+    assert plan.finalizar_ciclo() == 45
+    assert plan.excesos == 1
+    assert plan.metricas()['duracion_ultimo_s'] == 15
+
+    # Un error tras el cierre normal no vuelve a contar el ciclo, solo devuelve la espera restante
+    reloj.ahora += 5
+    assert plan.finalizar_ciclo() == 40
+    assert plan.excesos == 1
+    assert plan.duracion_ultimo == 15
+
+    plan.iniciar_ciclo()
+    reloj.ahora += 70
+    assert plan.finalizar_ciclo() == 0.0
+    assert plan.excesos == 2
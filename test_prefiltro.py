@@ -0,0 +1,50 @@
+# test_prefiltro.py
+from prefiltro import InstantaneaSimbolo, filtrar_operables, medir_desfase_servidor
+import MetaTrader5 as mt5
+import mt5_simulado
+
+AHORA = 1_700_000_000
+DESFASE = 7200  # Servidor en UTC+2
+
+def _instantanea(simbolo, antiguedad, spread=10):
+    return InstantaneaSimbolo(simbolo, AHORA + DESFASE - antiguedad, 1.1000, 1.1001, spread, 0.00001,
+                              mt5.SYMBOL_TRADE_MODE_FULL)
+
+def _filtrar(instantaneas):
+    return filtrar_operables(instantaneas, max_spread_puntos=30, max_antiguedad_segundos=120,
+                             desfase_servidor_segundos=DESFASE, ahora=AHORA)
+
+def test_un_solo_simbolo_parado():
+    operables, descartes = _filtrar({'EURUSD': _instantanea('EURUSD', 600)})
+    assert operables == set()
+    assert 'EURUSD' in descartes
+
+def test_todos_los_simbolos_parados():
+    operables, descartes = _filtrar({s: _instantanea(s, 3600) for s in ('EURUSD', 'GBPUSD', 'USDJPY')})
+    assert operables == set()
+    assert set(descartes) == {'EURUSD', 'GBPUSD', 'USDJPY'}
+
+def test_cotizaciones_recientes_con_desfase_del_servidor():
+    operables, descartes = _filtrar({'EURUSD': _instantanea('EURUSD', 5), 'GBPUSD': _instantanea('GBPUSD', 300),
+                                     'USDJPY': _instantanea('USDJPY', 5, spread=50)})
+    assert operables == {'EURUSD'}
+    assert set(descartes) == {'GBPUSD', 'USDJPY'}
+
+def test_desfase_desconocido_no_descarta_por_antiguedad():
+    operables, _ = filtrar_operables({'EURUSD': _instantanea('EURUSD', 3600)}, max_spread_puntos=30,
+                                     max_antiguedad_segundos=120, desfase_servidor_segundos=None, ahora=AHORA)
+    assert operables == {'EURUSD'}
+
+def test_desfase_medido_con_la_cotizacion_mas_reciente():
+    mt5_simulado.reiniciar()
+    try:
+        assert medir_desfase_servidor(['EURUSD'], ahora=AHORA) is None  # Sin cotizaciones
+        mt5_simulado.definir_simbolo('EURUSD', 1.1000, 1.1001, tiempo=AHORA + DESFASE - 400)
+        mt5_simulado.definir_simbolo('GBPUSD', 1.2500, 1.2502, tiempo=AHORA + DESFASE - 40)
+        assert medir_desfase_servidor(['EURUSD', 'GBPUSD', 'USDJPY'], ahora=AHORA) == DESFASE
+        mt5_simulado.definir_simbolo('USDJPY', 150.0, 150.02, point=0.001, tiempo=AHORA - 5 * 3600 - 100)
+        assert medir_desfase_servidor(['USDJPY'], ahora=AHORA) == -5 * 3600
+        # Mercado cerrado el fin de semana: la última cotización es de hace dos días
+        assert medir_desfase_servidor(['EURUSD'], ahora=AHORA + 2 * 86400) is None
+    finally:
+        mt5_simulado.reiniciar()
@@ -0,0 +1,88 @@
+# test_registro_operaciones.py
+from types import SimpleNamespace
+import pytest
+import mt5_simulado
+import registro_operaciones
+from registro_operaciones import TablaOrdenesAbiertas, OrdenAbierta
+
+INICIO = 1_700_000_000.0
+
+def _orden(ticket, posicion=None, simbolo='EURUSD', estrategia='estrategia', fecha=INICIO):
+    return OrdenAbierta(ticket, posicion if posicion is not None else ticket, simbolo, estrategia, 0.1, 'compra',
+                        1.1000, 1.0980, 1.1040, fecha)
+
+def _posicion(ticket):
+    return SimpleNamespace(ticket=ticket)
+
+def _indices_vacios(tabla):
+    return not (tabla._por_ticket or tabla._por_posicion or tabla._por_simbolo or tabla._por_estrategia)
+
+def test_reconciliar_descarta_las_cerradas_tras_la_gracia():
+    tabla = TablaOrdenesAbiertas(gracia_segundos=600, intervalo_reconciliacion=300)
+    tabla.agregar(_orden(1, simbolo='EURUSD', estrategia='A'))
+    tabla.agregar(_orden(2, simbolo='GBPUSD', estrategia='A'))
+
+    # La posición 2 sigue abierta en el terminal: renueva su gracia
+    assert tabla.reconciliar([_posicion(2)], ahora=INICIO + 500) == []
+    descartadas = tabla.reconciliar([], ahora=INICIO + 900)
+    assert [o.ticket for o in descartadas] == [1]
+    assert tabla.por_simbolo('EURUSD') == [] and 'EURUSD' not in tabla._por_simbolo
+    assert tabla.por_posicion(1) is None
+    assert [o.ticket for o in tabla.por_estrategia('A')] == [2]
+
+    descartadas = tabla.reconciliar([], ahora=INICIO + 1200)
+    assert [o.ticket for o in descartadas] == [2]
+    assert _indices_vacios(tabla)
+
+def test_orden_recien_enviada_no_se_descarta():
+    tabla = TablaOrdenesAbiertas(gracia_segundos=600, intervalo_reconciliacion=300)
+    tabla.agregar(_orden(1, fecha=INICIO + 1000))
+    # Instantánea de posiciones tomada antes de que la orden apareciera en el terminal
+    assert tabla.reconciliar([], ahora=INICIO + 1010, forzar=True) == []
+    assert 1 in tabla
+    # Sin forzar, no se reconcilia antes del intervalo aunque haya pasado la gracia
+    tabla.agregar(_orden(2, fecha=INICIO))
+    assert tabla.reconciliar([], ahora=INICIO + 1200) == []
+    assert [o.ticket for o in tabla.reconciliar([], ahora=INICIO + 1400)] == [2]
+
+def test_indice_de_posicion_reasignado_no_se_borra():
+    tabla = TablaOrdenesAbiertas()
+    tabla.agregar(_orden(1, posicion=9))
+    tabla.agregar(_orden(2, posicion=9))
+    tabla.eliminar(1)
+    assert tabla.por_posicion(9).ticket == 2
+    tabla.eliminar(2)
+    assert _indices_vacios(tabla)
+
+@pytest.fixture
+def terminal(monkeypatch):
+    mt5_simulado.reiniciar()
+    mt5_simulado.definir_simbolo('EURUSD', 1.1000, 1.1001)
+    monkeypatch.setattr(registro_operaciones, 'mt5', mt5_simulado)
+    monkeypatch.setattr(registro_operaciones, '_tickets_registrados', set())
+    monkeypatch.setattr(registro_operaciones, 'ordenes_en_curso', TablaOrdenesAbiertas())
+    escritas = []
+    monkeypatch.setattr(registro_operaciones, 'escribir_operacion_cerrada', escritas.append)
+    yield escritas
+    mt5_simulado.reiniciar()
+
+def test_cierre_enlazado_por_posicion_limpia_los_indices(terminal):
+    escritas = terminal
+    tabla = registro_operaciones.ordenes_en_curso
+    # El ticket de la orden y el identificador de la posición no coinciden
+    registro_operaciones.registrar_operacion_abierta(5001, 'EURUSD', 'A', 0.1, 'compra', 1.1000, 1.0980, 1.1040, posicion=7001)
+    registro_operaciones.registrar_operacion_abierta(5002, 'EURUSD', 'B', 0.1, 'venta', 1.1000, 1.1020, 1.0960, posicion=7002)
+    mt5_simulado._posiciones[7001] = SimpleNamespace(symbol='EURUSD', type=mt5_simulado.ORDER_TYPE_BUY, volume=0.1,
+                                                     magic=0, comment='A')
+    mt5_simulado.cerrar_posicion(7001, 1.1010)
+
+    registro_operaciones.monitorear_y_registrar_operaciones_cerradas()
+    assert [(f['ticket_mt5'], f['estrategia']) for f in escritas] == [(5001, 'A')]
+    assert escritas[0]['resultado_pips'] == pytest.approx(100)
+    assert 5001 not in tabla and tabla.por_posicion(7001) is None
+    assert [o.ticket for o in tabla.por_simbolo('EURUSD')] == [5002]
+    assert tabla.por_estrategia('A') == []
+
+    # El mismo deal en la siguiente consulta del historial no se vuelve a registrar
+    registro_operaciones.monitorear_y_registrar_operaciones_cerradas()
+    assert len(escritas) == 1
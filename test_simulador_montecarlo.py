@@ -0,0 +1,75 @@
+# test_simulador_montecarlo.py
+import numpy as np
+from gestion_riesgo import GestionRiesgo
+import simulador_montecarlo
+from simulador_montecarlo import SimuladorMonteCarlo
+
+def _secuencia(resultados):
+    """Distribución determinista: cada llamada devuelve el siguiente resultado de la lista."""
+    pendientes = list(resultados)
+    return lambda rng, forma: np.full(forma, float(pendientes.pop(0)))
+
+def _crear_riesgo():
+    return GestionRiesgo(limite_global=100, limites_estrategias={'A': 100, 'B': 200},
+                         reducir_posicion_activo=True, perdidas_consecutivas_reduccion=2, factor_reduccion=0.5)
+
+def _reproducir(riesgo, secuencias, dias, rondas):
+    """Aplica la misma secuencia a GestionRiesgo intento a intento, como el bucle del agente."""
+    operaciones, bloqueadas, equidad, dias_detenidos = 0, 0, float(riesgo.capital_inicial), 0
+    ejecutadas = []
+    for dia in range(dias):
+        riesgo.reiniciar_limites()
+        detenido = False
+        for ronda in range(rondas):
+            for nombre in ('A', 'B'):
+                resultado = secuencias[nombre].pop(0)
+                if not riesgo.puede_operar(nombre):
+                    bloqueadas += 1
+                    detenido |= not riesgo.puede_operar()
+                    continue
+                resultado *= riesgo.factor_posicion(nombre)
+                riesgo.registrar_operacion(nombre, resultado, cargar=True)
+                operaciones += 1
+                equidad += resultado
+                ejecutadas.append((dia, ronda, nombre))
+        detenido |= not riesgo.puede_operar()
+        dias_detenidos += detenido
+    return operaciones, bloqueadas, equidad, dias_detenidos, ejecutadas
+
+def test_simulador_bloquea_en_el_mismo_punto_que_gestion_riesgo():
+    # Día 1: en la ronda 2 la pérdida de A alcanza el límite global y B ya no debe operar en esa ronda.
+    # Día 2: A acumula pérdidas seguidas (reducción del lote) y llega a su límite propio.
+    secuencias = {
+        'A': [-30, -65, 10, 40, -40, -40, -40, 20],
+        'B': [-10, 25, 30, 30, 5, -15, 10, 10],
+    }
+    dias, rondas = 2, 4
+    esperado = _reproducir(_crear_riesgo(), {k: list(v) for k, v in secuencias.items()}, dias, rondas)
+    operaciones, bloqueadas, equidad, dias_detenidos, ejecutadas = esperado
+    assert (0, 1, 'B') not in ejecutadas  # El límite global salta con la operación de A de la misma ronda
+
+    simulador = SimuladorMonteCarlo(_crear_riesgo(), {nombre: _secuencia(v) for nombre, v in secuencias.items()},
+                                    dias=dias, operaciones_por_dia=rondas)
+    resultado = simulador.simular(n_simulaciones=1, semilla=0)
+
+    assert resultado.operaciones[0] == operaciones
+    assert resultado.operaciones_bloqueadas[0] == bloqueadas
+    assert resultado.equidad_final[0] == equidad
+    assert resultado.dias_detenidos[0] == dias_detenidos
+
+def test_simulaciones_vectorizadas_independientes():
+    riesgo = GestionRiesgo(limite_global=50)
+    simulador = SimuladorMonteCarlo(riesgo, lambda rng, forma: rng.normal(-5, 20, forma), dias=5, operaciones_por_dia=10)
+    resultado = simulador.simular(n_simulaciones=2000, semilla=1)
+    assert resultado.equidad_final.shape == (2000,)
+    assert (resultado.max_drawdown >= 0).all()
+    assert resultado.dias_detenidos.max() <= 5
+
+def test_bootstrap_desde_csv_de_punta_a_punta(tmp_path):
+    ruta_csv = tmp_path / 'operaciones.csv'
+    ruta_csv.write_text("ticket_mt5,simbolo,estrategia,resultado_dinero\n"
+                        "1,EURUSD,estrategia1,25.0\n"
+                        "2,EURUSD,estrategia1,-40.0\n", encoding='utf-8')
+    comparacion = simulador_montecarlo.main(['--csv', str(ruta_csv), '--simulaciones', '200', '--dias', '3'])
+    assert list(comparacion.index) == ['sin_cooldown', 'cooldown_3', 'cooldown_3_reduccion']
+    assert (comparacion['operaciones_media'] > 0).all()
@@ -0,0 +1,62 @@
+# test_strategies.py
+import numpy as np
+from indicadores import calcular_indicadores, calcular_indicadores_lote, matrices_desde_rates
+from strategies import determinar_senales, determinar_senales_lote
+
+ESTRATEGIAS = [
+    {"nombre": "Cruce EMA + Vela Elefante"},
+    {"nombre": "Rompimiento de la EMA 20"},
+    {"nombre": "Reversión a la Media", "criterios": {"usar_filtro_tendencia_200_ema": True}},
+]
+MULTI = 0.8  # Velas elefante frecuentes para que haya señales en pocas velas
+
+def _rates(n, semilla):
+    rng = np.random.default_rng(semilla)
+    cierre = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    apertura = np.concatenate(([1.1], cierre[:-1])) + rng.normal(0, 0.0001, n)
+    rates = np.zeros(n, dtype=[('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8')])
+    rates['time'] = 1_700_000_000 + 60 * np.arange(n)
+    rates['open'] = apertura
+    rates['close'] = cierre
+    rates['high'] = np.maximum(apertura, cierre) + np.abs(rng.normal(0, 0.0002, n))
+    rates['low'] = np.minimum(apertura, cierre) - np.abs(rng.normal(0, 0.0002, n))
+    return rates
+
+def test_lote_coincide_con_determinar_senales(capsys):
+    # Símbolos con distinto número de velas: los más cortos llevan NaN de relleno a la izquierda,
+    # y uno de ellos no llega a las 200 velas del filtro de tendencia
+    completos = {f'S{i}': _rates(n, i) for i, n in enumerate((260, 240, 150, 230, 3))}
+    senales = {e["nombre"]: [0, 0] for e in ESTRATEGIAS}
+    for fin in range(205, 261, 2):
+        rates = {s: r[:fin - (260 - len(r))] if len(r) > 3 else r for s, r in completos.items()}
+        simbolos, m = matrices_desde_rates(rates)
+        indicadores = calcular_indicadores_lote(m['open'], m['high'], m['low'], m['close'], multi_vela_elefante=MULTI)
+        for estrategia in ESTRATEGIAS:
+            compra, venta = determinar_senales_lote(indicadores, estrategia)
+            for fila, simbolo in enumerate(simbolos):
+                esperado = determinar_senales(calcular_indicadores(rates[simbolo], multi_vela_elefante=MULTI), estrategia)
+                obtenido = "compra" if compra[fila] else "venta" if venta[fila] else None
+                assert obtenido == esperado, (fin, simbolo, estrategia["nombre"])
+                senales[estrategia["nombre"]][0] += esperado == "compra"
+                senales[estrategia["nombre"]][1] += esperado == "venta"
+    capsys.readouterr()  # Avisos de EMA 200 insuficiente del símbolo corto
+    # La comparación solo es útil si todas las estrategias han dado señales en ambos sentidos
+    assert all(compras and ventas for compras, ventas in senales.values()), senales
+
+def test_cribado_del_agente_selecciona_los_pares_con_senal(monkeypatch, capsys):
+    import trading_agent
+    monkeypatch.setattr(trading_agent.config, 'MULTI_VELA_ELEFANTE', MULTI)
+    # La última estrategia solo opera dos de los pares
+    estrategias = [dict(e, pares=['S0', 'S1', 'S2', 'S3']) for e in ESTRATEGIAS[:2]] + [dict(ESTRATEGIAS[2], pares=['S0', 'S1'])]
+    candidatos_vistos = 0
+    for fin in range(205, 261, 5):
+        rates = {f'S{i}': _rates(260, i)[:fin] for i in range(4)}
+        candidatos = trading_agent.cribar_senales(estrategias, rates)
+        esperados = {(e["nombre"], s) for e in estrategias for s, r in rates.items()
+                     if s in e["pares"]
+                     and determinar_senales(calcular_indicadores(r, multi_vela_elefante=MULTI), e)}
+        assert candidatos == esperados, fin
+        candidatos_vistos += len(candidatos)
+    assert candidatos_vistos
+    assert trading_agent.cribar_senales(estrategias, {}) == set()
+    capsys.readouterr()
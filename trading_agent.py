@@ -1,5 +1,6 @@
 import os
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
 import time
 import logging
@@ -8,22 +9,34 @@ from datetime import datetime
 from notificaciones import enviar_notificacion
 from gestor_riesgo_en_operacion import GestorRiesgoEnOperacion
 from gestion_riesgo import GestionRiesgo
+from curva_equidad import CurvaEquidad
 from registro_operaciones import registrar_operacion_abierta, monitorear_y_registrar_operaciones_cerradas, ordenes_en_curso
-from indicadores import calcular_indicadores, es_vela_elefante
-from strategies import determinar_senales
+from indicadores import calcular_indicadores, es_vela_elefante, matrices_desde_rates, calcular_indicadores_lote
+from strategies import determinar_senales, determinar_senales_lote
 from order_calculations import calcular_riesgo_dinamico, calcular_lote
+from log_estructurado import configurar_logging, log_evento, ResumenCiclo
+from almacen_caracteristicas import AlmacenCaracteristicas
+from calidad_ejecucion import RegistroEjecucion, APERTURA, MODIFICACION, CIERRE
+from api_estado import PublicadorEstado, iniciar_servidor_estado
+from prefiltro import tomar_instantanea, filtrar_operables, medir_desfase_servidor
+from calendario_sesiones import CalendarioSesiones, sesiones_forex
+from planificador import PlanificadorCiclo
+from modo_sombra import CarteraSombra
+from coordinador import posiciones_propias
+from perfilador import PerfiladorMuestreo
 import pytz
 
 # --- IMPORTAR CONFIGURACIÓN ---
 import config
 
-# --- CONFIGURACIÓN DEL REGISTRO ---
-logging.basicConfig(
-    filename=config.LOG_FILE_PATH,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    filemode="a"
-)
+# Ruta del terminal MT5 de este proceso (None = terminal por defecto)
+_ruta_terminal = None
+
+# "magic" de las órdenes de este proceso (distinto por trabajador)
+_numero_magico = config.NUMERO_MAGICO
+
+# Registro de calidad de ejecución de este proceso (se crea en main)
+registro_ejecucion = None
 
 # Crear el archivo de operaciones si no existe
 if not os.path.isfile(config.OPERACIONES_CSV):
@@ -36,11 +49,31 @@ if not os.path.isfile(config.OPERACIONES_CSV):
         writer.writeheader()
 
 # --- FUNCIONES AUXILIARES ---
+def iniciar_registro(ruta=None):
+    """
+    Configura el registro con cola + hilo escritor: el bucle de trading nunca espera a la escritura en disco.
+    """
+    configurar_logging(
+        ruta or config.LOG_FILE_PATH,
+        nivel=logging.INFO,
+        formato_json=config.LOG_FORMATO_JSON,
+        rotacion=config.LOG_ROTACION,
+        max_bytes=config.LOG_MAX_BYTES,
+        backups=config.LOG_BACKUPS,
+        cuando=config.LOG_ROTACION_CUANDO
+    )
+
+def inicializar_mt5():
+    """Inicializa MT5 en el terminal asignado a este proceso."""
+    if _ruta_terminal:
+        return mt5.initialize(path=_ruta_terminal)
+    return mt5.initialize()
+
 def conectar_mt5():
     """
     Intenta establecer la conexión inicial con MetaTrader 5.
     """
-    if not mt5.initialize():
+    if not inicializar_mt5():
         logging.error("Fallo al inicializar MetaTrader 5, error code: %s", mt5.last_error())
         return False
     return True
@@ -55,49 +88,80 @@ def obtener_datos(simbolo, timeframe, num_velas):
     timezone = pytz.timezone("Etc/UTC")
     utc_from = datetime.now(timezone) - pd.Timedelta(f"{num_velas + 10}min")
     
-    if not mt5.initialize():
+    if not inicializar_mt5():
         logging.error("initialize() falló al obtener datos: %s", mt5.last_error())
         return None
         
     rates = mt5.copy_rates_from(simbolo, timeframe, utc_from, num_velas)
     if rates is None or len(rates) == 0:
-        logging.warning(f"No se pudieron obtener datos para {simbolo}. Código de error: {mt5.last_error()}")
+        logging.warning("No se pudieron obtener datos para %s. Código de error: %s", simbolo, mt5.last_error())
         return None
     
     return rates
 
+def enviar_y_medir(request, accion, precio_solicitado=None, es_compra=True, punto=None):
+    """Envía la petición a MT5 midiendo la latencia y registra la calidad de ejecución."""
+    inicio = time.perf_counter()
+    resultado = mt5.order_send(request)
+    latencia_ms = (time.perf_counter() - inicio) * 1000
+    if registro_ejecucion is not None:
+        registro_ejecucion.registrar(request["symbol"], accion, resultado, latencia_ms, request.get("deviation", 0),
+                                     precio_solicitado, es_compra, punto)
+    return resultado
+
 def obtener_informacion_operacion(ticket):
-    """Busca en el diccionario global la información de una operación por su ticket."""
-    return ordenes_en_curso.get(ticket)
+    """Busca en la tabla global la información de una operación por el ticket de su posición."""
+    return ordenes_en_curso.por_posicion(ticket)
 
-def ejecutar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_porcentaje, nombre_estrategia, gestor_riesgo_global):
+def ejecutar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_porcentaje, nombre_estrategia, gestor_riesgo_global, coordinador=None, atr_value=None):
     """
     Ejecuta una orden de compra o venta en MetaTrader 5.
     Calcula el tamaño del lote basado en el riesgo, la distancia del SL y el capital.
     Ahora incluye un factor de reducción basado en pérdidas consecutivas y validación de lote.
+    Con coordinador, el hueco de posición se reserva en el coordinador antes de enviar la orden.
     """
-    if mt5.positions_total() >= config.MAX_OPERACIONES_SIMULTANEAS:
-        logging.warning(f"Máximo de operaciones simultáneas ({MAX_OPERACIONES_SIMULTANEAS}) alcanzado. No se puede abrir una nueva orden en {simbolo}.")
-        print(f"⚠️ Máximo de operaciones simultáneas alcanzado. Esperando...")
+    if coordinador is None:
+        if mt5.positions_total() >= config.MAX_OPERACIONES_SIMULTANEAS:
+            logging.warning("Máximo de operaciones simultáneas (%s) alcanzado. No se puede abrir una nueva orden en %s.", config.MAX_OPERACIONES_SIMULTANEAS, simbolo)
+            print(f"⚠️ Máximo de operaciones simultáneas alcanzado. Esperando...")
+            return
+        _enviar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_porcentaje, nombre_estrategia, gestor_riesgo_global, atr_value)
         return
-        
+
+    reserva = coordinador.reservar_slot(simbolo, nombre_estrategia)
+    if reserva is None:
+        logging.warning("El coordinador no concede hueco para %s (límite de riesgo o de operaciones simultáneas).", simbolo)
+        print(f"⚠️ Sin hueco disponible en el coordinador para {simbolo}. Esperando...")
+        return
+    ticket = None
+    try:
+        ticket = _enviar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_porcentaje, nombre_estrategia, gestor_riesgo_global, atr_value)
+    finally:
+        if ticket is None:
+            coordinador.liberar_slot(reserva)
+        else:
+            coordinador.confirmar_slot(reserva, ticket)
+
+def _enviar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_porcentaje, nombre_estrategia, gestor_riesgo_global, atr_value=None):
+    """Calcula el lote y envía la orden. Devuelve el ticket de la orden ejecutada o None."""
     symbol_info = mt5.symbol_info(simbolo)
     if symbol_info is None:
-        logging.error(f"No se pudo obtener información del símbolo {simbolo}.")
+        logging.error("No se pudo obtener información del símbolo %s.", simbolo)
         return
 
     tick = mt5.symbol_info_tick(simbolo)
     if tick is None:
-        logging.error(f"No se pudo obtener el tick para el símbolo {simbolo}.")
+        logging.error("No se pudo obtener el tick para el símbolo %s.", simbolo)
         return
 
-    precio_actual = tick.bid if tipo_orden == mt5.ORDER_TYPE_BUY else tick.ask
+    # Las compras se ejecutan al ask y las ventas al bid
+    precio_actual = tick.ask if tipo_orden == mt5.ORDER_TYPE_BUY else tick.bid
 
     if config.VALIDAR_SPREAD:
-        spread = symbol_info.spread * symbol_info.point
-        beneficio_potencial_en_dinero = abs(take_profit - precio_actual) / symbol_info.point * mt5.symbol_info_tick(simbolo).bid * 100000
-        spread_en_dinero = spread * mt5.symbol_info_tick(simbolo).bid * 100000
-        if spread_en_dinero / beneficio_potencial_en_dinero > config.MAX_SPREAD_PORCENTAJE_BENEFICIO:
+        # Spread y beneficio potencial en unidades de precio, con el mismo tick ya obtenido
+        spread = tick.ask - tick.bid
+        beneficio_potencial = abs(take_profit - precio_actual)
+        if beneficio_potencial == 0 or spread / beneficio_potencial > config.MAX_SPREAD_PORCENTAJE_BENEFICIO:
             print(f"⚠️ Spread demasiado alto en {simbolo}. Operación cancelada.")
             return
 
@@ -123,9 +187,14 @@ def ejecutar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_
     lote_final = round(lote_final, 2)
     
     if lote_final < config.MIN_LOTE:
-        logging.warning(f"El lote final ({lote_final}) es menor que el lote mínimo. No se ejecutará la orden.")
+        logging.warning("El lote final (%s) es menor que el lote mínimo. No se ejecutará la orden.", lote_final)
         return
     
+    # Desviación derivada del ATR y del deslizamiento reciente del símbolo
+    desviacion = 20
+    if registro_ejecucion is not None:
+        desviacion = registro_ejecucion.desviacion(simbolo, atr_value, symbol_info.point)
+
     # --- Código para enviar la orden ---
     request = {
         "action": mt5.TRADE_ACTION_DEAL,
@@ -135,13 +204,14 @@ def ejecutar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_
         "price": precio_actual,
         "sl": stop_loss,
         "tp": take_profit,
-        "deviation": 20,
+        "deviation": desviacion,
+        "magic": _numero_magico,
         "comment": f"Estrategia: {nombre_estrategia}",
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
     
-    resultado = mt5.order_send(request)
+    resultado = enviar_y_medir(request, APERTURA, precio_actual, tipo_orden == mt5.ORDER_TYPE_BUY, symbol_info.point)
 
     # NUEVO: Validar si la variable resultado es None
     if resultado is None:
@@ -150,7 +220,7 @@ def ejecutar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_
         return # Salir de la función para evitar el error
 
     if resultado.retcode == mt5.TRADE_RETCODE_DONE:
-        logging.info(f"Orden ejecutada: {simbolo} {tipo_orden} | Lote: {lote_final:.2f} | SL: {stop_loss} | TP: {take_profit}")
+        logging.info("Orden ejecutada: %s %s | Lote: %.2f | SL: %s | TP: %s", simbolo, tipo_orden, lote_final, stop_loss, take_profit)
         print(f"🚀 Orden ejecutada: {simbolo} | Tipo: {'COMPRA' if tipo_orden == mt5.ORDER_TYPE_BUY else 'VENTA'} | Lote: {lote_final:.2f}")
         
         # Registrar la orden para el seguimiento
@@ -168,13 +238,257 @@ def ejecutar_orden(simbolo, tipo_orden, stop_loss, take_profit, capital, riesgo_
         # Enviar notificación
         mensaje = f"✅ NUEVA OPERACIÓN\nPar: {simbolo}\nTipo: {'COMPRA' if tipo_orden == mt5.ORDER_TYPE_BUY else 'VENTA'}\nLote: {lote_final:.2f}\nEstrategia: {nombre_estrategia}"
         enviar_notificacion(mensaje)
+        return resultado.order
     else:
-        logging.error(f"Fallo al ejecutar la orden: {resultado.retcode} | {resultado.comment}")
+        logging.error("Fallo al ejecutar la orden: %s | %s", resultado.retcode, resultado.comment)
         print(f"❌ Fallo al ejecutar la orden. Código de error: {resultado.retcode}")
         # Enviar notificación de error
         mensaje_error = f"❌ ERROR en OPERACIÓN\nPar: {simbolo}\nError: {resultado.retcode} - {resultado.comment}"
         enviar_notificacion(mensaje_error)
 
+def modificar_stop(operacion, nuevo_stop, info_operacion):
+    """Envía la modificación del stop loss de una posición abierta."""
+    request = {
+        "action": mt5.TRADE_ACTION_SLTP,
+        "symbol": operacion.symbol,
+        "sl": nuevo_stop,
+        "tp": operacion.tp,
+        "position": operacion.ticket,
+        "comment": "Trailing stop actualizado",
+    }
+
+    resultado_mod = enviar_y_medir(request, MODIFICACION)
+    if resultado_mod is not None and resultado_mod.retcode == mt5.TRADE_RETCODE_DONE:
+        logging.info("Stop loss actualizado para el ticket %s de %s a %s", operacion.ticket, operacion.sl, nuevo_stop)
+        print(f"✅ Stop Loss actualizado para el ticket {operacion.ticket}")
+        info_operacion.stop_loss = nuevo_stop # Actualizar la tabla local
+        return True
+    codigo = resultado_mod.retcode if resultado_mod is not None else mt5.last_error()
+    logging.error("Fallo al actualizar SL para el ticket %s. Código: %s", operacion.ticket, codigo)
+    print(f"❌ Fallo al actualizar SL para el ticket {operacion.ticket}. Código: {codigo}")
+    return False
+
+def cerrar_posicion(operacion, comentario="Cierre sugerido por IA"):
+    """Cierra a mercado una posición abierta. Devuelve True si el cierre se ejecutó."""
+    tick = mt5.symbol_info_tick(operacion.symbol)
+    if tick is None:
+        logging.error("No se pudo obtener el tick para cerrar el ticket %s.", operacion.ticket)
+        return False
+    es_compra = operacion.type == mt5.ORDER_TYPE_BUY
+    info_simbolo = mt5.symbol_info(operacion.symbol)
+    punto = info_simbolo.point if info_simbolo is not None else None
+    precio = tick.bid if es_compra else tick.ask
+    request = {
+        "action": mt5.TRADE_ACTION_DEAL,
+        "symbol": operacion.symbol,
+        "volume": operacion.volume,
+        "type": mt5.ORDER_TYPE_SELL if es_compra else mt5.ORDER_TYPE_BUY,
+        "position": operacion.ticket,
+        "price": precio,
+        "deviation": registro_ejecucion.desviacion(operacion.symbol, None, punto) if registro_ejecucion is not None else 20,
+        "comment": comentario,
+        "type_time": mt5.ORDER_TIME_GTC,
+        "type_filling": mt5.ORDER_FILLING_IOC,
+    }
+    # Cerrar una compra es vender (al bid): el deslizamiento se mide con el sentido de la orden de cierre
+    resultado = enviar_y_medir(request, CIERRE, precio, not es_compra, punto)
+    if resultado is not None and resultado.retcode == mt5.TRADE_RETCODE_DONE:
+        logging.info("Posición %s de %s cerrada: %s", operacion.ticket, operacion.symbol, comentario)
+        print(f"✅ Posición {operacion.ticket} cerrada ({comentario}).")
+        return True
+    codigo = resultado.retcode if resultado is not None else mt5.last_error()
+    logging.error("Fallo al cerrar la posición %s. Código: %s", operacion.ticket, codigo)
+    print(f"❌ Fallo al cerrar la posición {operacion.ticket}. Código: {codigo}")
+    return False
+
+def gestionar_operaciones_abiertas(operaciones_abiertas, gestor_riesgo_op):
+    """
+    Actualiza el stop de todas las posiciones abiertas del agente en un solo lote.
+    Los datos y el ATR se obtienen una vez por símbolo.
+    Devuelve {ticket: nuevo stop} de las modificaciones aplicadas, con None para las posiciones cerradas.
+    """
+    datos_por_simbolo = {}
+    posiciones = []
+    operaciones = []
+    for operacion in operaciones_abiertas:
+        info_operacion = obtener_informacion_operacion(operacion.ticket)
+        if info_operacion is None:
+            logging.warning("No se encontró información para el ticket %s. Omitiendo trailing stop.", operacion.ticket)
+            continue
+
+        # Obtener los datos más recientes para el ATR
+        if operacion.symbol not in datos_por_simbolo:
+            datos_operacion = obtener_datos(operacion.symbol, config.TIMEFRAME, config.NUM_VELAS)
+            datos_por_simbolo[operacion.symbol] = None if datos_operacion is None else calcular_indicadores(datos_operacion)
+        df_operacion = datos_por_simbolo[operacion.symbol]
+        if df_operacion is None:
+            logging.warning("No se pudieron obtener datos para el símbolo de la operación %s.", operacion.symbol)
+            continue
+
+        tick = mt5.symbol_info_tick(operacion.symbol)
+        if tick is None:
+            logging.warning("No se pudo obtener el tick para el símbolo de la operación %s.", operacion.symbol)
+            continue
+        es_compra = operacion.type == mt5.ORDER_TYPE_BUY
+
+        posiciones.append({
+            'ticket': operacion.ticket,
+            'precio_entrada': operacion.price_open,
+            'stop_actual': operacion.sl,
+            'precio_actual': tick.bid if es_compra else tick.ask,
+            'tipo': 'compra' if es_compra else 'venta',
+            'atr_value': df_operacion['ATR'].iloc[-1],
+            'cierres': df_operacion['close'].to_numpy(),
+            'tiempo_vela': df_operacion.index[-1],
+            'tiempo_apertura': operacion.time,
+        })
+        operaciones.append((operacion, info_operacion))
+
+    # Llamar al gestor para actualizar los stops de todas las posiciones a la vez
+    sugerencias = gestor_riesgo_op.actualizar_stops_lote(posiciones)
+
+    cambios = {}
+    for (operacion, info_operacion), (nuevo_stop, cerrar) in zip(operaciones, sugerencias):
+        if cerrar:
+            if cerrar_posicion(operacion):
+                cambios[operacion.ticket] = None
+        # Si el stop es diferente, modificar la orden
+        elif abs(nuevo_stop - operacion.sl) > 0.00001:
+            if modificar_stop(operacion, nuevo_stop, info_operacion):
+                cambios[operacion.ticket] = nuevo_stop
+    return cambios
+
+def describir_posiciones(operaciones_abiertas, cambios=None):
+    """
+    Posiciones abiertas con su estrategia y stop actual, para la API de estado.
+    cambios: resultado de gestionar_operaciones_abiertas en este ciclo; las posiciones se obtuvieron
+             antes de actualizar los stops, así que se aplican los nuevos y se omiten las cerradas.
+    """
+    cambios = cambios or {}
+    posiciones = []
+    for operacion in operaciones_abiertas:
+        if operacion.ticket in cambios and cambios[operacion.ticket] is None:
+            continue
+        info_operacion = obtener_informacion_operacion(operacion.ticket)
+        posiciones.append({
+            'ticket': operacion.ticket,
+            'simbolo': operacion.symbol,
+            'tipo': 'compra' if operacion.type == mt5.ORDER_TYPE_BUY else 'venta',
+            'volumen': operacion.volume,
+            'precio_apertura': operacion.price_open,
+            'stop_loss': cambios.get(operacion.ticket, operacion.sl),
+            'take_profit': operacion.tp,
+            'beneficio': operacion.profit,
+            'estrategia': info_operacion.estrategia if info_operacion is not None else None,
+        })
+    return posiciones
+
+def resolver_desfase_servidor(simbolos, configurado=None):
+    """
+    Desfase horario del servidor para el prefiltro. Sin valor configurado se mide con la cotización más
+    reciente de los símbolos; con valor configurado solo se avisa si no coincide con el medido.
+    Devuelve None si aún no se puede medir (mercado cerrado): el prefiltro no descarta por antigüedad hasta medirlo.
+    """
+    medido = medir_desfase_servidor(simbolos)
+    if configurado is None:
+        if medido is None:
+            logging.warning("No se pudo medir el desfase horario del servidor (sin cotizaciones recientes). "
+                            "El prefiltro no descartará cotizaciones antiguas hasta medirlo.")
+        else:
+            logging.info("Desfase horario del servidor medido: %+d s.", medido)
+        return medido
+    if medido is not None and abs(medido - configurado) > config.MAX_ANTIGUEDAD_COTIZACION_SEG:
+        logging.warning("DESFASE_SERVIDOR_SEG (%s s) no coincide con el desfase medido (%+d s). Revise la configuración.",
+                        configurado, medido)
+    return configurado
+
+def cribar_senales(estrategias, rates_por_par):
+    """
+    Cribado del ciclo: los indicadores de todos los pares se calculan en matrices símbolos x velas y las
+    señales de cada estrategia en una sola pasada vectorizada.
+    rates_por_par: {par: velas de MT5} ya descargadas en el ciclo
+    Devuelve {(nombre_estrategia, par)} con señal; solo esos pares pasan después por el DataFrame de
+    calcular_indicadores y determinar_senales, que confirma la señal y calcula los stops.
+    """
+    simbolos, matrices = matrices_desde_rates(rates_por_par)
+    if not simbolos:
+        return set()
+    indicadores = calcular_indicadores_lote(matrices['open'], matrices['high'], matrices['low'], matrices['close'],
+                                            atr_period=config.ATR_PERIOD, multi_vela_elefante=config.MULTI_VELA_ELEFANTE)
+    candidatos = set()
+    for estrategia in estrategias:
+        compra, venta = determinar_senales_lote(indicadores, estrategia)
+        pares = set(estrategia.get("pares", config.PARES_A_OPERAR))
+        candidatos.update((estrategia["nombre"], simbolos[fila]) for fila in np.flatnonzero(compra | venta)
+                          if simbolos[fila] in pares)
+    return candidatos
+
+def gestionar_sombra(cartera_sombra, abiertos, instantaneas, indicadores_ciclo, obtener_faltantes=False, rates_ciclo=None):
+    """
+    Cierres por SL/TP y stops de las posiciones simuladas.
+    obtener_faltantes: pide las velas de los símbolos de sombra sin indicadores en el ciclo. Se usa en los
+                       ciclos detenidos por los límites de riesgo, que no analizan señales: las posiciones de
+                       sombra no arriesgan capital y se siguen gestionando igual que las reales.
+    rates_ciclo: velas ya descargadas en el ciclo ({par: rates}); los símbolos que el cribado descartó
+                 calculan aquí su DataFrame sin volver a pedir las velas
+    """
+    if cartera_sombra is None or not cartera_sombra.posiciones:
+        return
+    simbolos_sombra = {p.simbolo for p in cartera_sombra.posiciones.values()} & abiertos
+    instantaneas.update(tomar_instantanea(simbolos_sombra - instantaneas.keys()))
+    for simbolo in simbolos_sombra - indicadores_ciclo.keys():
+        datos = (rates_ciclo or {}).get(simbolo)
+        if datos is None and obtener_faltantes:
+            datos = obtener_datos(simbolo, config.TIMEFRAME, config.NUM_VELAS)
+        if datos is not None and len(datos) >= 2:
+            indicadores_ciclo[simbolo] = calcular_indicadores(datos, atr_period=config.ATR_PERIOD, multi_vela_elefante=config.MULTI_VELA_ELEFANTE)
+    cartera_sombra.gestionar({s: instantaneas[s] for s in simbolos_sombra}, indicadores_ciclo)
+
+def publicar_estado(publicador_estado, gestor_riesgo_global, posiciones, ciclo, planificador, cartera_sombra, detenido=None):
+    """
+    Publica la instantánea del ciclo en la API de estado.
+    detenido: motivo por el que el ciclo no busca señales ("limite_diario", "drawdown_ventana", "sin_conexion"...)
+    """
+    publicador_estado.publicar(
+        detenido=detenido,
+        riesgo=gestor_riesgo_global.resumen(),
+        posiciones=posiciones,
+        ciclo=ciclo,
+        planificador=planificador.metricas(),
+        sombra=cartera_sombra.resumen() if cartera_sombra is not None else None
+    )
+
+def terminar_ciclo(planificador, perfilador):
+    """
+    Cierra el ciclo en cualquiera de sus salidas (normal, sin conexión, detenido o error): registra su
+    duración en el planificador, pausa el perfilador y devuelve los segundos a esperar hasta el siguiente.
+    """
+    espera = planificador.finalizar_ciclo()
+    if perfilador is not None:
+        perfilador.fin_ciclo()
+    return espera
+
+def esperar_apertura(calendario, simbolos):
+    """
+    Latido lento mientras todos los mercados están cerrados: duerme hasta la próxima apertura
+    (como mucho LATIDO_MERCADO_CERRADO_SEG por ciclo). Justo antes de abrir reconecta y añade los
+    símbolos a la Observación de Mercado para que el terminal ya reciba sus cotizaciones en la apertura.
+    Las velas no se piden aquí: las de antes de la apertura no servirían al primer ciclo de la sesión.
+    """
+    hasta_apertura = calendario.segundos_hasta_apertura(simbolos)
+    if hasta_apertura is None or hasta_apertura - config.PRECALENTAMIENTO_SEG > config.LATIDO_MERCADO_CERRADO_SEG:
+        log_evento(logging.INFO, "Mercados cerrados. Próxima apertura en %s s.",
+                   None if hasta_apertura is None else round(hasta_apertura), fase="sesiones")
+        time.sleep(config.LATIDO_MERCADO_CERRADO_SEG)
+        return
+    time.sleep(max(hasta_apertura - config.PRECALENTAMIENTO_SEG, 0))
+
+    logging.info("Preparando %d símbolos antes de la apertura.", len(simbolos))
+    if verificar_y_reconectar_mt5():
+        for simbolo in simbolos:
+            mt5.symbol_select(simbolo, True)
+    time.sleep(calendario.segundos_hasta_apertura(simbolos) or 0)
+
 def verificar_y_reconectar_mt5():
     """
     Verifica si la conexión con MetaTrader 5 está activa.
@@ -183,7 +497,7 @@ def verificar_y_reconectar_mt5():
     if mt5.account_info() is None:
         logging.warning("Conexión con MetaTrader 5 perdida. Intentando reconectar...")
         print("⚠️ Conexión perdida. Intentando reconectar...")
-        if not mt5.initialize():
+        if not inicializar_mt5():
             logging.error("Fallo al re-inicializar la conexión con MetaTrader 5. Saliendo.")
             print("❌ No se pudo reconectar. Verifique su terminal MT5. Cerrando el agente.")
             return False
@@ -192,168 +506,374 @@ def verificar_y_reconectar_mt5():
             print("✅ Conexión reestablecida.")
     return True
 
-def main():
+def main(estrategias=None, coordinador=None, ruta_terminal=None, nombre_trabajador=None, puerto_api=None, numero_magico=None):
     """
     Función principal del agente de trading que se ejecuta en un bucle.
+    En modo trabajador recibe su subconjunto de estrategias, el proxy del coordinador
+    (que sustituye al gestor de riesgo global local), la ruta de su terminal MT5 y su nombre,
+    que se usa como sufijo de sus archivos propios (log, calidad de ejecución), el puerto de su API de estado
+    y el "magic" de sus órdenes, con el que distingue sus posiciones si comparte terminal con otros trabajadores.
     """
+    global _ruta_terminal, _numero_magico, registro_ejecucion
+    _ruta_terminal = ruta_terminal
+    if numero_magico is not None:
+        _numero_magico = numero_magico
+    sufijo = f".{nombre_trabajador}" if nombre_trabajador else ""
+    iniciar_registro(config.LOG_FILE_PATH + sufijo)
+    registro_ejecucion = RegistroEjecucion(
+        ruta=config.CALIDAD_EJECUCION_PATH + sufijo,
+        factor_atr=config.DEVIATION_ATR_FACTOR,
+        desviacion_min=config.DESVIACION_MIN_PUNTOS,
+        desviacion_max=config.DESVIACION_MAX_PUNTOS
+    )
+
     if not conectar_mt5():
         return
     
-    estrategias_activas = [e for e in config.ESTRATEGIAS if e.get("activa", False)]
+    estrategias = config.ESTRATEGIAS if estrategias is None else estrategias
+    estrategias_activas = [e for e in estrategias if e.get("activa", False)]
     if not estrategias_activas:
         logging.warning("No hay estrategias activas. Deteniendo el agente.")
         print("🛑 No hay estrategias activas. Deteniendo el agente.")
         desconectar_mt5()
         return
 
-    # NUEVO: Inicializar la gestión de riesgo global
-    gestor_riesgo_global = GestionRiesgo(
-        limite_global=config.PERDIDA_MAXIMA_DIARIA,
-        modo_porcentaje=True,
-        capital_inicial=config.CAPITAL_INICIAL,
-        reducir_posicion_activo=config.REDUCIR_POSICION_ACTIVO,
-        perdidas_consecutivas_reduccion=config.PERDIDAS_CONSECUTIVAS_REDUCCION,
-        factor_reduccion=config.FACTOR_REDUCCION_LOTE
-    )
-    # Cargar el historial del CSV para saber si los límites de pérdidas se han alcanzado
-    gestor_riesgo_global.cargar_desde_csv(config.OPERACIONES_CSV)
+    if coordinador is not None:
+        # El coordinador mantiene los contadores de riesgo autoritativos
+        gestor_riesgo_global = coordinador
+        coordinador.sincronizar_posiciones([p.ticket for p in posiciones_propias(mt5.positions_get() or (), _numero_magico)])
+    else:
+        # Curva de equidad persistente para los límites de drawdown móvil
+        curva_equidad = CurvaEquidad(
+            ruta=config.CURVA_EQUIDAD_PATH,
+            capital_inicial=config.CAPITAL_INICIAL,
+            ventana_horas=config.VENTANA_DRAWDOWN_HORAS,
+            intervalo_guardado=config.CURVA_EQUIDAD_INTERVALO_GUARDADO_SEG
+        )
+
+        # NUEVO: Inicializar la gestión de riesgo global
+        gestor_riesgo_global = GestionRiesgo(
+            limite_global=config.PERDIDA_MAXIMA_DIARIA,
+            modo_porcentaje=True,
+            capital_inicial=config.CAPITAL_INICIAL,
+            reducir_posicion_activo=config.REDUCIR_POSICION_ACTIVO,
+            perdidas_consecutivas_reduccion=config.PERDIDAS_CONSECUTIVAS_REDUCCION,
+            factor_reduccion=config.FACTOR_REDUCCION_LOTE,
+            curva_equidad=curva_equidad,
+            limite_drawdown=config.LIMITE_DRAWDOWN_VENTANA
+        )
+        # Cargar el historial del CSV para saber si los límites de pérdidas se han alcanzado
+        gestor_riesgo_global.cargar_desde_csv(config.OPERACIONES_CSV)
     
     gestor_riesgo_op = GestorRiesgoEnOperacion(
         modo_trailing=config.TRAILING_ACTIVO,
         break_even_activo=config.BREAK_EVEN_ACTIVO,
         atr_factor_break_even=config.BREAK_EVEN_ATR_FACTOR,
         atr_factor_trailing=config.TRAILING_ATR_FACTOR,
+        tiempo_limite_ia=config.TIEMPO_LIMITE_IA,
     )
 
+    # Estrategias en modo sombra: mismas velas e indicadores del ciclo, operaciones simuladas sin order_send
+    cartera_sombra = None
+    if any(e.get("sombra", False) for e in estrategias_activas):
+        cartera_sombra = CarteraSombra(
+            GestorRiesgoEnOperacion(
+                modo_trailing=config.TRAILING_ACTIVO,
+                break_even_activo=config.BREAK_EVEN_ACTIVO,
+                atr_factor_break_even=config.BREAK_EVEN_ATR_FACTOR,
+                atr_factor_trailing=config.TRAILING_ATR_FACTOR,
+                tiempo_limite_ia=config.TIEMPO_LIMITE_IA,
+            ),
+            ruta_csv=config.OPERACIONES_SOMBRA_CSV + sufijo,
+            capital=config.CAPITAL_INICIAL,
+            riesgo_porcentaje=config.RIESGO_PORCENTAJE,
+            min_lote=config.MIN_LOTE,
+            max_lote=config.MAX_LOTE
+        )
+
+    resumen_ciclo = ResumenCiclo(silencioso=config.MODO_SILENCIOSO)
+
+    # La gestión de posiciones siempre se completa; las señales se analizan dentro del presupuesto restante
+    planificador = PlanificadorCiclo(
+        presupuesto_segundos=config.PRESUPUESTO_CICLO_SEG,
+        intervalo_segundos=config.INTERVALO_CICLO_SEG
+    )
+
+    # Perfilador bajo demanda: SIGUSR1 (no existe en Windows) o crear el archivo de control
+    perfilador = None
+    if config.PERFILADOR_ACTIVO:
+        perfilador = PerfiladorMuestreo(
+            config.PERFILADOR_DIR,
+            archivo_control=config.PERFILADOR_ARCHIVO_CONTROL + sufijo,
+            frecuencia_hz=config.PERFILADOR_FRECUENCIA_HZ,
+            ciclos=config.PERFILADOR_CICLOS,
+            memoria=config.PERFILADOR_MEMORIA,
+            prefijo=f"perfil{sufijo.replace('.', '_')}"
+        )
+        perfilador.instalar_senal()
+
+    # Símbolos analizados por las estrategias de este proceso (para la instantánea del prefiltro)
+    simbolos_configurados = list(dict.fromkeys(
+        par for e in estrategias_activas for par in e.get("pares", config.PARES_A_OPERAR)
+    ))
+
+    # Desfase horario del servidor para la antigüedad de las cotizaciones en el prefiltro
+    desfase_servidor = resolver_desfase_servidor(simbolos_configurados, config.DESFASE_SERVIDOR_SEG)
+
+    # Calendario de sesiones: los símbolos con el mercado cerrado no se analizan ni se gestionan
+    calendario = None
+    if config.SESIONES_ACTIVO:
+        calendario = CalendarioSesiones(
+            sesiones_simbolos=config.SESIONES_SIMBOLOS,
+            sesion_por_defecto=sesiones_forex(config.FOREX_APERTURA_DOMINGO, config.FOREX_CIERRE_VIERNES),
+            pausas_diarias=config.PAUSAS_DIARIAS,
+            festivos=config.FESTIVOS,
+            zona=config.SESIONES_ZONA
+        )
+
+    # API de estado: el bucle publica una instantánea por ciclo, el servidor solo la lee
+    publicador_estado = PublicadorEstado()
+    servidor_estado = None
+    if config.API_ESTADO_ACTIVA:
+        try:
+            servidor_estado = iniciar_servidor_estado(publicador_estado, puerto_api or config.API_ESTADO_PUERTO)
+        except OSError as e:
+            logging.error("No se pudo iniciar la API de estado: %s", e)
+    numero_ciclo = 0
+
+    # Almacén de características: se extiende con cada vela cerrada para entrenamiento e inferencia
+    almacen_caracteristicas = None
+    if config.ALMACEN_CARACTERISTICAS_ACTIVO:
+        almacen_caracteristicas = AlmacenCaracteristicas(
+            config.ALMACEN_CARACTERISTICAS_DIR,
+            atr_period=config.ATR_PERIOD,
+            multi_vela_elefante=config.MULTI_VELA_ELEFANTE
+        )
+
     logging.info("Agente de trading iniciado. Monitoreando varios pares...")
     
     while True:
         try:
+            numero_ciclo += 1
+            planificador.iniciar_ciclo()
+            if perfilador is not None:
+                perfilador.inicio_ciclo()
+            inicio_ciclo = time.time()
+            inicio_fase = time.perf_counter()
+            latencias_fases = {}
             # Aseguramos que la conexión esté activa al inicio de cada ciclo.
             if not verificar_y_reconectar_mt5():
-                time.sleep(60)
+                # Sin terminal no se pueden leer las posiciones: se mantienen las últimas publicadas
+                espera = terminar_ciclo(planificador, perfilador)
+                publicar_estado(publicador_estado, gestor_riesgo_global, publicador_estado.instantanea().get('posiciones', []),
+                                {'numero': numero_ciclo, 'inicio': inicio_ciclo}, planificador, cartera_sombra,
+                                detenido="sin_conexion")
+                time.sleep(espera)
                 continue
 
+            ahora_utc = datetime.now(pytz.utc)
+            if calendario is None:
+                abiertos = set(simbolos_configurados)
+            else:
+                abiertos = calendario.abiertos(simbolos_configurados, ahora_utc)
+
             # --- FASE 1: Monitorear y gestionar operaciones abiertas ---
+            operaciones_abiertas = ()
+            cambios_stops = {}
             if mt5.positions_total() > 0:
-                logging.info("Monitoreando operaciones abiertas para trailing stop...")
-                print("👀 Monitoreando operaciones abiertas...")
-                operaciones_abiertas = mt5.positions_get()
+                if not config.MODO_SILENCIOSO:
+                    logging.info("Monitoreando operaciones abiertas para trailing stop...")
+                    print("👀 Monitoreando operaciones abiertas...")
+                operaciones_abiertas = mt5.positions_get() or ()
+                if coordinador is not None:
+                    # Cada trabajador solo gestiona, suma y sincroniza sus posiciones (el terminal puede ser compartido)
+                    operaciones_abiertas = posiciones_propias(operaciones_abiertas, _numero_magico)
+                gestor_riesgo_global.actualizar_flotante(sum(operacion.profit for operacion in operaciones_abiertas))
                 
-                for operacion in operaciones_abiertas:
-                    info_operacion = obtener_informacion_operacion(operacion.ticket)
-                    if info_operacion is None:
-                        logging.warning(f"No se encontró información para el ticket {operacion.ticket}. Omitiendo trailing stop.")
-                        continue
-                    
-                    # Obtener los datos más recientes para el ATR
-                    datos_operacion = obtener_datos(operacion.symbol, config.TIMEFRAME, config.NUM_VELAS)
-                    if datos_operacion is None:
-                        logging.warning(f"No se pudieron obtener datos para el símbolo de la operación {operacion.symbol}.")
-                        continue
-                    df_operacion = calcular_indicadores(datos_operacion)
-                    atr_value = df_operacion.iloc[-1]['ATR']
-                    
-                    symbol_info = mt5.symbol_info_tick(operacion.symbol)
-                    precio_actual = symbol_info.bid if operacion.type == mt5.ORDER_TYPE_BUY else symbol_info.ask
-                    
-                    # Llamar al gestor para actualizar el stop
-                    nuevo_stop = gestor_riesgo_op.actualizar_stop(
-                        precio_entrada=operacion.price_open,
-                        stop_actual=operacion.sl,
-                        precio_actual=precio_actual,
-                        tipo='compra' if operacion.type == mt5.ORDER_TYPE_BUY else 'venta',
-                        atr_value=atr_value
-                    )
-                    
-                    # Si el stop es diferente, modificar la orden
-                    if abs(nuevo_stop - operacion.sl) > 0.00001:
-                        request = {
-                            "action": mt5.TRADE_ACTION_SLTP,
-                            "symbol": operacion.symbol,
-                            "sl": nuevo_stop,
-                            "tp": operacion.tp,
-                            "position": operacion.ticket,
-                            "comment": "Trailing stop actualizado",
-                        }
-                        
-                        resultado_mod = mt5.order_send(request)
-                        if resultado_mod.retcode == mt5.TRADE_RETCODE_DONE:
-                            logging.info(f"Stop loss actualizado para el ticket {operacion.ticket} de {operacion.sl} a {nuevo_stop}")
-                            print(f"✅ Stop Loss actualizado para el ticket {operacion.ticket}")
-                            info_operacion['stop_loss'] = nuevo_stop # Actualizar el diccionario local
-                        else:
-                            logging.error(f"Fallo al actualizar SL para el ticket {operacion.ticket}. Código: {resultado_mod.retcode}")
-                            print(f"❌ Fallo al actualizar SL para el ticket {operacion.ticket}. Código: {resultado_mod.retcode}")
+                # Con el mercado cerrado no hay precios nuevos ni se aceptan modificaciones
+                gestionables = [o for o in operaciones_abiertas if calendario is None or calendario.abierto(o.symbol, ahora_utc)]
+                if gestionables:
+                    cambios_stops = gestionar_operaciones_abiertas(gestionables, gestor_riesgo_op)
+            else:
+                gestor_riesgo_global.actualizar_flotante(0.0)
+            if coordinador is not None:
+                # Las posiciones cerradas por SL/TP liberan su hueco en el coordinador
+                coordinador.sincronizar_posiciones([p.ticket for p in operaciones_abiertas])
 
             # NUEVO: Monitorear y registrar operaciones cerradas y sus resultados en el gestor de riesgo global
-            monitorear_y_registrar_operaciones_cerradas(gestor_riesgo_global)
+            monitorear_y_registrar_operaciones_cerradas(gestor_riesgo_global, coordinador)
+            # Descartar órdenes cuya posición ya no existe y cuyo cierre nunca se encontró
+            ordenes_en_curso.reconciliar(operaciones_abiertas)
+            latencias_fases['gestion'] = (time.perf_counter() - inicio_fase) * 1000
+            inicio_fase = time.perf_counter()
             
             # --- FASE 2: Buscar nuevas señales ---
             # NUEVO: Verificar si la pérdida máxima diaria ha sido alcanzada
-            if not gestor_riesgo_global.puede_operar():
-                logging.warning("Límite de pérdida diario alcanzado. Deteniendo la búsqueda de nuevas señales.")
-                print("🛑 ¡Límite de pérdida diario alcanzado! Deteniendo la búsqueda de señales por hoy.")
-                time.sleep(60)
+            motivo_bloqueo = gestor_riesgo_global.motivo_bloqueo()
+            if motivo_bloqueo is not None:
+                if motivo_bloqueo == "drawdown_ventana":
+                    logging.warning("Drawdown máximo de la ventana de %s h alcanzado. Deteniendo la búsqueda de nuevas señales.", config.VENTANA_DRAWDOWN_HORAS)
+                    print("🛑 ¡Drawdown máximo de la ventana móvil alcanzado! Deteniendo la búsqueda de señales.")
+                else:
+                    logging.warning("Límite de pérdida diario alcanzado. Deteniendo la búsqueda de nuevas señales.")
+                    print("🛑 ¡Límite de pérdida diario alcanzado! Deteniendo la búsqueda de señales por hoy.")
+                # Las posiciones (reales y de sombra) se siguen gestionando: la API debe reflejarlas y el motivo
+                gestionar_sombra(cartera_sombra, abiertos, {}, {}, obtener_faltantes=True)
+                espera = terminar_ciclo(planificador, perfilador)
+                publicar_estado(publicador_estado, gestor_riesgo_global, describir_posiciones(operaciones_abiertas, cambios_stops),
+                                {
+                                    'numero': numero_ciclo,
+                                    'inicio': inicio_ciclo,
+                                    'latencias_ms': latencias_fases,
+                                    'duracion_ms': sum(latencias_fases.values()),
+                                    'ordenes_en_seguimiento': len(ordenes_en_curso),
+                                    'mercados_abiertos': sorted(abiertos),
+                                },
+                                planificador, cartera_sombra, detenido=motivo_bloqueo)
+                time.sleep(espera)
                 continue
 
-            # Bucle para cada estrategia activa
+            # Prefiltro: una instantánea por ciclo descarta los símbolos no operables antes de pedir velas
+            instantaneas = {}
+            descartes = {}
+            if config.PREFILTRO_ACTIVO and abiertos:
+                if desfase_servidor is None:
+                    # Sin medir al arrancar (mercado cerrado): se vuelve a intentar en cada ciclo
+                    desfase_servidor = medir_desfase_servidor(simbolos_configurados)
+                    if desfase_servidor is not None:
+                        logging.info("Desfase horario del servidor medido: %+d s.", desfase_servidor)
+                instantaneas = tomar_instantanea([s for s in simbolos_configurados if s in abiertos])
+                _, descartes = filtrar_operables(
+                    instantaneas,
+                    max_spread_puntos=config.MAX_SPREAD_PUNTOS,
+                    max_antiguedad_segundos=config.MAX_ANTIGUEDAD_COTIZACION_SEG,
+                    spread_por_simbolo=config.MAX_SPREAD_PUNTOS_POR_SIMBOLO,
+                    desfase_servidor_segundos=desfase_servidor
+                )
+                for simbolo, motivo in descartes.items():
+                    resumen_ciclo.registrar_descarte(simbolo, motivo)
+
+            # Indicadores de cada par (DataFrame): solo de los pares que pasan el cribado, una vez por ciclo
+            # y compartidos entre estrategias
+            indicadores_ciclo = {}
+
+            # Estrategias que pueden operar en este ciclo
+            estrategias_habilitadas = []
             for estrategia in estrategias_activas:
+                # NUEVO: Verificar si la estrategia puede operar (las de sombra no arriesgan capital)
+                if not estrategia.get("sombra", False) and not gestor_riesgo_global.puede_operar(estrategia["nombre"]):
+                    logging.warning("La estrategia '%s' no puede operar (límite alcanzado o cooldown).", estrategia["nombre"])
+                    print(f"⚠️ La estrategia '{estrategia['nombre']}' no puede operar. Omisión.")
+                    continue
+                estrategias_habilitadas.append(estrategia)
+
+            # Un análisis por (estrategia, par), por prioridad y dentro del presupuesto del ciclo;
+            # los que no caben se aplazan y son los primeros del ciclo siguiente. Las estrategias de
+            # sombra van por defecto detrás de las reales
+            tareas = [(estrategia, par) for estrategia in estrategias_habilitadas
+                      for par in estrategia.get("pares", config.PARES_A_OPERAR)
+                      if par in abiertos and par not in descartes]
+
+            # Velas de cada par (una petición por par y ciclo) y cribado vectorizado de todas las estrategias
+            rates_ciclo = {}
+            for par in dict.fromkeys(par for _, par in tareas):
+                datos = obtener_datos(par, config.TIMEFRAME, config.NUM_VELAS)
+                if datos is None or len(datos) < 2:
+                    logging.warning("No se pudieron obtener datos suficientes para %s.", par)
+                    continue
+                if almacen_caracteristicas is not None:
+                    try:
+                        almacen_caracteristicas.extender(par, datos)
+                    except Exception as e:
+                        logging.error("No se pudo extender el almacén de características de %s: %s", par, e)
+                rates_ciclo[par] = datos
+            candidatos = cribar_senales(estrategias_habilitadas, rates_ciclo)
+
+            for estrategia, par in planificador.ejecutar(tareas, clave=lambda t: (t[0]["nombre"], t[1]),
+                                                         prioridad=lambda t: t[0].get("prioridad", -1 if t[0].get("sombra") else 0)):
                 nombre_estrategia = estrategia["nombre"]
-                pares_a_operar = estrategia.get("pares", config.PARES_A_OPERAR)
+                inicio_par = time.perf_counter()
+                if not config.MODO_SILENCIOSO:
+                    log_evento(logging.INFO, "Analizando '%s' con la estrategia: '%s'", par, nombre_estrategia,
+                               simbolo=par, estrategia=nombre_estrategia, fase="senales")
                 
-                # NUEVO: Verificar si la estrategia puede operar
-                if not gestor_riesgo_global.puede_operar(nombre_estrategia):
-                    logging.warning(f"La estrategia '{nombre_estrategia}' no puede operar (límite alcanzado o cooldown).")
-                    print(f"⚠️ La estrategia '{nombre_estrategia}' no puede operar. Omisión.")
+                if par not in rates_ciclo:
+                    continue
+                if (nombre_estrategia, par) not in candidatos:
+                    resumen_ciclo.registrar_analisis(par, nombre_estrategia, None, (time.perf_counter() - inicio_par) * 1000)
                     continue
 
-                # Bucle para cada par de la estrategia
-                for par in pares_a_operar:
-                    logging.info(f"Analizando '{par}' con la estrategia: '{nombre_estrategia}'")
+                if par not in indicadores_ciclo:
+                    indicadores_ciclo[par] = calcular_indicadores(rates_ciclo[par], atr_period=config.ATR_PERIOD, multi_vela_elefante=config.MULTI_VELA_ELEFANTE)
+                df = indicadores_ciclo[par]
+
+                # Confirmar la señal sobre el DataFrame
+                senal = determinar_senales(df, estrategia)
+
+                resumen_ciclo.registrar_analisis(par, nombre_estrategia, senal, (time.perf_counter() - inicio_par) * 1000)
+
+                if senal and estrategia.get("sombra", False):
+                    if par not in instantaneas:
+                        instantaneas.update(tomar_instantanea([par]))
+                    cartera_sombra.abrir(nombre_estrategia, par, senal, df, instantaneas[par])
+                elif senal:
+                    log_evento(logging.INFO, "¡Señal de %s detectada en %s!", senal.upper(), par,
+                               simbolo=par, estrategia=nombre_estrategia, fase="senales")
+                    print(f"✅ ¡Señal de {senal.upper()} en {par} con la estrategia '{nombre_estrategia}'!")
                     
-                    datos = obtener_datos(par, config.TIMEFRAME, config.NUM_VELAS)
-                    if datos is None or len(datos) < 2:
-                        logging.warning(f"No se pudieron obtener datos suficientes para {par}.")
-                        continue
+                    # Cálculo de riesgo y ejecución de la orden
+                    stop_loss, take_profit = calcular_riesgo_dinamico(df, senal)
+                    tipo_orden = mt5.ORDER_TYPE_BUY if senal == "compra" else mt5.ORDER_TYPE_SELL
                     
-                    df = calcular_indicadores(datos, atr_period=config.ATR_PERIOD, multi_vela_elefante=config.MULTI_VELA_ELEFANTE)
-
-                    # Determinar la señal
-                    senal = determinar_senales(df, estrategia)
-
-                    if senal:
-                        logging.info(f"¡Señal de {senal.upper()} detectada en {par}!")
-                        print(f"✅ ¡Señal de {senal.upper()} en {par} con la estrategia '{nombre_estrategia}'!")
-                        
-                        # Cálculo de riesgo y ejecución de la orden
-                        stop_loss, take_profit = calcular_riesgo_dinamico(df, senal)
-                        tipo_orden = mt5.ORDER_TYPE_BUY if senal == "compra" else mt5.ORDER_TYPE_SELL
-                        
-                        ejecutar_orden(
-                            simbolo=par,
-                            tipo_orden=tipo_orden,
-                            stop_loss=stop_loss,
-                            take_profit=take_profit,
-                            capital=config.CAPITAL_INICIAL,
-                            riesgo_porcentaje=config.RIESGO_PORCENTAJE,
-                            nombre_estrategia=nombre_estrategia,
-                            gestor_riesgo_global=gestor_riesgo_global # NUEVO: Pasamos la instancia
-                        )
-                    else:
-                        logging.info(f"No se detectó ninguna señal para {par} con esta estrategia.")
-                        print(f"❌ No se encontró señal para {par}.")
-            
-            time.sleep(60)
+                    ejecutar_orden(
+                        simbolo=par,
+                        tipo_orden=tipo_orden,
+                        stop_loss=stop_loss,
+                        take_profit=take_profit,
+                        capital=config.CAPITAL_INICIAL,
+                        riesgo_porcentaje=config.RIESGO_PORCENTAJE,
+                        nombre_estrategia=nombre_estrategia,
+                        gestor_riesgo_global=gestor_riesgo_global, # NUEVO: Pasamos la instancia
+                        coordinador=coordinador,
+                        atr_value=df['ATR'].iloc[-1]
+                    )
+
+            gestionar_sombra(cartera_sombra, abiertos, instantaneas, indicadores_ciclo, rates_ciclo=rates_ciclo)
+        
+            latencias_fases['senales'] = (time.perf_counter() - inicio_fase) * 1000
+            resumen_ciclo.emitir(latencias_fases)
+            espera = terminar_ciclo(planificador, perfilador)
+            publicar_estado(publicador_estado, gestor_riesgo_global, describir_posiciones(operaciones_abiertas, cambios_stops),
+                            {
+                                'numero': numero_ciclo,
+                                'inicio': inicio_ciclo,
+                                'latencias_ms': latencias_fases,
+                                'duracion_ms': sum(latencias_fases.values()),
+                                'ordenes_en_seguimiento': len(ordenes_en_curso),
+                                'descartes_prefiltro': descartes,
+                                'mercados_abiertos': sorted(abiertos),
+                            },
+                            planificador, cartera_sombra)
+            simbolos_posiciones = {o.symbol for o in operaciones_abiertas}
+            if calendario is not None and not abiertos and not calendario.abiertos(simbolos_posiciones, ahora_utc):
+                esperar_apertura(calendario, simbolos_configurados)
+            else:
+                time.sleep(espera)
         except KeyboardInterrupt:
             logging.info("Agente detenido por el usuario.")
             print("\n🛑 Agente detenido.")
             break
         except Exception as e:
-            logging.error(f"Ocurrió un error: {e}", exc_info=True)
-            print(f"🚨 ¡Ocurrió un error inesperado! Revisando en 60 segundos.")
-            time.sleep(60)
+            logging.error("Ocurrió un error: %s", e, exc_info=True)
+            espera = terminar_ciclo(planificador, perfilador)
+            print(f"🚨 ¡Ocurrió un error inesperado! Revisando en {espera:.0f} segundos.")
+            time.sleep(espera)
             
+    gestor_riesgo_op.cerrar()
+    if coordinador is None:
+        gestor_riesgo_global.guardar()
+    if servidor_estado is not None:
+        servidor_estado.shutdown()
     desconectar_mt5()
     logging.info("Agente de trading finalizado.")
 